@@ -0,0 +1,68 @@
+"""
+PySurf Module:
+    Surface Point Provider Server
+
+Serve a single SurfacePointProvider over a Unix socket, so that
+many trajectories on one node share the interface, the database
+and the interpolator. In the inputfile of the propagation, set
+the path to the socket as spp inputfile.
+"""
+from colt import Colt
+
+from pysurf.logger import get_logger
+from pysurf.sampling import Sampling
+from pysurf.spp import SurfacePointProvider
+from pysurf.spp.server import SPPServer
+
+
+class SPPServe(Colt):
+
+    _user_input = """
+    # inputfile of the Surface Point Provider
+    spp = spp.inp :: existing_file
+    # database with the initial conditions, defining the system
+    initial condition = init.db :: existing_file
+    # Number of total states
+    n_states = :: int
+    nghost_states = 0 :: int
+    # properties requested by the clients
+    properties = [energy, gradient] :: list
+    # Unix socket the server listens on
+    socket = spp.sock :: str
+    # time in seconds, the server waits to batch concurrent requests
+    batch_window = 0.002 :: float
+    # allow every client to stop the server, by default it is stopped by
+    # terminating this program
+    allow_client_shutdown = False :: bool
+    """
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config)
+
+    def __init__(self, config):
+        self.logger = get_logger('spp_serve.log', 'spp_serve')
+        self.logger.header('SPP SERVER', config)
+        sampling = Sampling.from_db(config['initial condition'], logger=self.logger)
+        #
+        if sampling.model is False:
+            spp = SurfacePointProvider.from_questions(config['properties'], config['n_states'],
+                                                      sampling.natoms,
+                                                      nghost_states=config['nghost_states'],
+                                                      atomids=sampling.atomids,
+                                                      config=config['spp'])
+        else:
+            spp = SurfacePointProvider.from_questions(config['properties'], config['n_states'],
+                                                      sampling.nmodes,
+                                                      nghost_states=config['nghost_states'],
+                                                      config=config['spp'])
+        #
+        self.logger.info(f"Serving SPP on {config['socket']}")
+        self.server = SPPServer(spp, config['socket'], batch_window=config['batch_window'],
+                                logger=self.logger,
+                                allow_client_shutdown=config['allow_client_shutdown'])
+        self.server.serve_forever()
+
+
+if __name__ == '__main__':
+    SPPServe.from_commandline()
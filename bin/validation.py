@@ -5,10 +5,13 @@ PySurf Module:
 Provide infrastructure for the training of interpolators
 and test them against a validation set
 """
+import time
 import numpy as np
 
 from pysurf.database import PySurfDB
 from pysurf.spp import SurfacePointProvider
+from pysurf.spp.neighbors import ExactIndex, recall
+from pysurf.spp.storage import WeightStorage
 from pysurf.logger import get_logger
 from colt import Colt
 
@@ -95,6 +98,55 @@ class Training(Colt):
     def validate(self, filename, properties):
         db = PySurfDB.load_database(filename, read_only=True)
         self._compute(db, properties)
+        self.report_index(db)
+        self.report_storage(db, properties)
+
+    def report_storage(self, db, properties):
+        """report memory footprint, and for reduced precision or out of core storage,
+           the deviation from the interpolator trained and stored in double precision"""
+        storage = self.interpolator.storage
+        usage = self.interpolator.memory_usage()
+        self.logger.info(f"storage precision = {storage.precision}, out of core = {storage.out_of_core}:\n"
+                         f" memory = {usage['memory']/1024**2:.3f} MB\n"
+                         f" memory mapped = {usage['mapped']/1024**2:.3f} MB\n")
+        if storage.precision == 'double' and storage.out_of_core is False:
+            return
+        results, _ = self._compute(db, properties)
+        # retrain in double precision as reference
+        crds = self.interpolator.crds
+        self.interpolator.crds = self.interpolator.descriptor.compute(np.array(self.interpolator.db['crd']))
+        self.interpolator.storage = WeightStorage()
+        self.interpolator.train(always=True)
+        reference, _ = self._compute(db, properties)
+        usage = self.interpolator.memory_usage()
+        #
+        self.interpolator.crds = crds
+        self.interpolator.storage = storage
+        self.interpolator.train(always=True)
+        #
+        self.logger.info(f"reference in double precision:\n memory = {usage['memory']/1024**2:.3f} MB")
+        for prop in properties:
+            diff = np.max([np.max(np.abs(value[0] - ref[0]))
+                           for value, ref in zip(results[prop], reference[prop])])
+            self.logger.info(f" max deviation {prop} = {diff}")
+
+    def report_index(self, db):
+        """compare an approximate nearest neighbor index to the exact search"""
+        index = self.interpolator.index
+        if index.exact is True:
+            return
+        crds = np.reshape(self.interpolator.crds, (len(self.interpolator.crds), -1))
+        queries = self.interpolator.descriptor.compute(np.array(db['crd']))
+        queries = queries.reshape((len(queries), -1))
+        #
+        timings = {}
+        for name, search in (('exact', ExactIndex()), (index.name, index)):
+            search.build(crds)
+            start = time.perf_counter()
+            search.query(queries)
+            timings[name] = time.perf_counter() - start
+        self.logger.info(f"nn_index {index.name}:\n recall = {recall(index, crds, queries)}\n"
+                         f" query time = {timings[index.name]}s (exact: {timings['exact']}s)\n")
 
     def save_graddiff(self, filename, database):
         db = PySurfDB.load_database(database, read_only=True)
@@ -123,14 +175,9 @@ class Training(Colt):
         norm = {prop: [] for prop in properties}
         ndata = len(db)
 
-        for i, crd in enumerate(db['crd']):
-            result = self.spp.request(crd, properties)
-            #
-            for prop in properties:
-                if prop != 'gradient':
-                    norm[prop].append([np.copy(result[prop]), np.copy(db[prop][i])])
-                else:
-                    norm[prop].append([np.copy(result[prop].data), np.copy(db[prop][i])])
+        results = self.spp.request_many(np.array(db['crd']), properties)
+        for prop in properties:
+            norm[prop] = [[result, np.copy(db[prop][i])] for i, result in enumerate(results[prop])]
 
         for name, value in norm.items():
             errors = self.compute_errors(name, value, ndata)
@@ -167,7 +214,7 @@ class Training(Colt):
             'maxiter': 25, 'disp': True, 'xatol': 0.0001})
         print(res)
         self.interpolator.epsilon = res.x[0]
-        self.interpolator.train(self.weightsfile)
+        self.interpolator.train(self.weightsfile, always=True)
 
 
 def eucl_norm(x, y):
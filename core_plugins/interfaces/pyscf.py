@@ -8,13 +8,17 @@ from pysurf.spp import AbinitioBase
 
 
 #has to be adapted according to Max's new implementation
-from pyscf import gto, dft, tddft, grad
+from pyscf import gto, dft, tddft, grad, lib
 
 class DFT(Colt):
     """ class which executes the DFT and TDDFT calculations using the PySCF package """
 
     _user_input = """
     functional = :: str :: ['pbe0']
+    # use density fitting for the coulomb and exchange integrals
+    density_fitting = False :: bool
+    # auxiliary basis for the density fitting, chosen by PySCF if not set
+    auxbasis = :: str, optional
     """
 
     implemented = ['energy', 'gradient']
@@ -24,10 +28,11 @@ class DFT(Colt):
     def from_config(cls, config, mol, nstates):
         """ """
         functional = config['functional']
-        return cls(functional, mol, nstates)
+        return cls(functional, mol, nstates, density_fitting=config['density_fitting'],
+                   auxbasis=config['auxbasis'])
         
 
-    def __init__(self, functional, mol, nstates):
+    def __init__(self, functional, mol, nstates, density_fitting=False, auxbasis=None):
         """
             Parameters:
             -----------
@@ -40,31 +45,34 @@ class DFT(Colt):
                 nstates: int
                     number of states
 
+                density_fitting: bool, optional
+                    use density fitting
+
+                auxbasis: str, optional
+                    auxiliary basis for the density fitting
+
         """
         self.mol = mol
         self.nstates = nstates
         
         mydft = dft.RKS(mol).x2c().set(xc=functional)
+        if density_fitting is True:
+            mydft = mydft.density_fit(auxbasis=auxbasis)
         
+        # the scanners keep the converged density of the previous geometry as guess
         self.dft_scanner = mydft.as_scanner()
-        self.dft_grad = mydft.nuc_grad_method().as_scanner()
 
         if self.nstates > 1:
             # Switch to xcfun because 3rd order GGA functional derivative is not
             # available in libxc
-            mydft._numint.libxc = dft.xcfun
-            mytddft = tddft.TDDFT(mydft)
+            self.dft_scanner._numint.libxc = dft.xcfun
+            mytddft = tddft.TDDFT(self.dft_scanner)
+            mytddft.nstates = self.nstates - 1
             self.tddft_scanner = mytddft.as_scanner()
-            self.tddft_scanner.nstates = self.nstates - 1
-            
-            # PySCF-1.6.1 and newer supports the .Gradients method to create a grad
-            # object after grad module was imported. It is equivalent to call the
-            # .nuc_grad_method method.
-            self.tddft_grad = mytddft.Gradients().as_scanner()
 
+    def compute(self, request, mol):
+        """ computes all requested properties from a single SCF and TDDFT solution
 
-    def do_energy(self, request, mol):
-        """ function to calculate the energies 
             Parameters:
             -----------
                 request:
@@ -73,49 +81,47 @@ class DFT(Colt):
                     mol object with the correct coordinates
             Return:
             -------
-                request where the energies are filled in
+                request where the properties are filled in
         """
         if self.nstates == 1:
-            en = [self.dft_scanner(mol)]
+            scf = self.dft_scanner
+            scf(mol)
+            energies = [scf.e_tot]
         else:
-            en = self.tddft_scanner(mol)
+            self.tddft_scanner(mol)
+            scf = self.tddft_scanner._scf
+            energies = [scf.e_tot] + list(self.tddft_scanner.e_tot)
+        #
+        if 'energy' in request:
+            request.set('energy', np.array(energies))
+        if 'gradient' in request:
+            grad = {}
+            for state in request.states:
+                if state == 0:
+                    grad[0] = scf.nuc_grad_method().kernel()
+                else:
+                    # PySCF-1.6.1 and newer supports the .Gradients method to create a grad
+                    # object after grad module was imported. It reuses the TDDFT solution
+                    # of the scanner.
+                    grad[state] = self.tddft_scanner.Gradients().kernel(state=state)
+            request.set('gradient', grad)
+        return request
 
-        request.set('energy', en)
-   
-    def do_gradient(self, request, mol):
-        """ function to calculate the gradients 
-            Parameters:
-            -----------
-                request:
-                    request object
-                mol: 
-                    mol object with the correct coordinates
-            Return:
-            -------
-                request where the gradients are filled in
-        """
-        grad = {}
-        for state in request.states:
-            if state == 0:
-                e_gs, grad_gs = self.dft_grad(mol)
-                grad[0] = grad_gs
-            else:
-                e, grad_tddft = self.tddft_grad(mol, state=state)
-                grad[state] = grad_tddft
-        request.set('gradient', grad)
 
 class PySCF(AbinitioBase):
     """ Interface for the PySCF code, which is free available 
 
         The communication with the SPP is the get function with the request object.
         The actual calculations are performed in separate classes. The classes need to have
-        a function for each property with the name do_prop, e.g. do_energy for energy calculations.
+        a compute function, that fills all requested properties of the request.
         All properties which are implemented have to be stored in the implemented property of the 
         corresponding classes
     """
 
     _user_input = """
     basis = 631g*
+    # number of threads used by PySCF, by default all available threads
+    nthreads = :: int, optional
     # Calculation Method
     method = DFT/TDDFT :: str :: [DFT/TDDFT]
     """
@@ -138,10 +144,10 @@ class PySCF(AbinitioBase):
         method = config['method'].value
         basis = config['basis']
         config_method = config['method']
-        return cls(basis, method, atomids, nstates, config_method)
+        return cls(basis, method, atomids, nstates, config_method, nthreads=config['nthreads'])
 
 
-    def __init__(self, basis, method, atomids, nstates, config_method):
+    def __init__(self, basis, method, atomids, nstates, config_method, nthreads=None):
         """
             Parameters:
             -----------
@@ -159,7 +165,12 @@ class PySCF(AbinitioBase):
 
                 config_method:
                     Colt config for the individual method
+
+                nthreads: int, optional
+                    number of threads used by PySCF
         """
+        if nthreads is not None:
+            lib.num_threads(nthreads)
         self.mol = self._generate_pyscf_mol(basis, atomids)
         self.nstates = nstates
         self.atomids = atomids
@@ -186,13 +197,10 @@ class PySCF(AbinitioBase):
                     request instance of the Request class where the desired information has been
                     filled in
         """
-        # update coordinates
-        self.mol = self._generate_pyscf_mol(self.basis, self.atomids, request.crd)
-        for prop in request:
-            func = getattr(self.calculator, 'do_' + prop)
-            func(request, self.mol)
-        #
-        return request
+        # update the coordinates in place, the basis is kept and the
+        # scanners start from the density of the previous geometry
+        self.mol.set_geom_(request.crd, unit='Bohr')
+        return self.calculator.compute(request, self.mol)
 
     @staticmethod
     def _generate_pyscf_mol(basis, atomids, crds=None):
@@ -1,15 +1,12 @@
 import numpy as np
 #
-from scipy.spatial import cKDTree
-#
 from pysurf import Interpolator
-from pysurf.spp import internal
 
 
 class NearestNeighborInterpolator(Interpolator):
     """Nearest Neighbor Interpolator"""
 
-    _questions = """
+    _user_input = """
         trust_radius_general = 0.75 :: float
         trust_radius_ci = 0.25 :: float
         energy_threshold = 0.02 :: float
@@ -17,28 +14,31 @@ class NearestNeighborInterpolator(Interpolator):
     """
 
     @classmethod
-    def from_config(cls, config, db, properties, logger, energy_only, weightsfile, crdmode, fit_only):
+    def from_config(cls, config, db, properties, logger, energy_only, weightsfile, crdmode, fit_only,
+                    nn_index=None, model_cache=None, storage=None):
         trust_radius_general = config['trust_radius_general']
         trust_radius_CI = config['trust_radius_ci']
         energy_threshold = config['energy_threshold']
         #
-        # convert input for norm in corresponding input (p-Norm) for the cKDTree
+        # convert input for norm in corresponding input (p-Norm) for the neighbor search
         # for more information go to the cKDTree.query documentation
         if config['norm'] == 'manhattan':
             norm = 1
         elif config['norm'] == 'max':
-            norm = 'infinity'
+            norm = np.inf
         else:
             norm = 2
         #
         return cls(db, properties, logger, energy_only=energy_only, weightsfile=weightsfile,
                    crdmode=crdmode, trust_radius_general=trust_radius_general,
                    trust_radius_CI=trust_radius_CI, energy_threshold=energy_threshold,
-                   fit_only=fit_only, norm=norm)
+                   fit_only=fit_only, norm=norm, nn_index=nn_index, model_cache=model_cache,
+                   storage=storage)
 
     def __init__(self, db, properties, logger, energy_only=False, weightsfile=None,
                  crdmode='cartesian', fit_only=False, trust_radius_general=0.75,
-                 trust_radius_CI=0.25, energy_threshold=0.02, norm='euclidean'):
+                 trust_radius_CI=0.25, energy_threshold=0.02, norm=2, nn_index=None, model_cache=None,
+                 storage=None):
         """ Storing user input as internal variables and call the init method of the 
             interpolator factory
 
@@ -80,24 +80,34 @@ class NearestNeighborInterpolator(Interpolator):
                 energy_threshold: float, optional
                     Threshold to distinguish regions of small and large energy gaps.
 
-                norm: str, optional
-                    Determining the norm for the nearest neighbor search. 'manhattan' corresponds
+                norm: float, optional
+                    p-norm for the nearest neighbor search. The input 'manhattan' corresponds
                     to the 1-norm, 'euclidean' is the 2-norm, and 'max' is the infinity norm. 
+
+                nn_index: NeighborIndex, optional
+                    index used for the nearest neighbor search, by default the exact cKDTree
+
+                model_cache: str, optional
+                    folder, in which the model is stored under the fingerprint of the database
+
+                storage: WeightStorage, optional
+                    precision and location of the stored descriptors
         """
         #
         self.trust_radius_general = trust_radius_general
         self.trust_radius_CI = trust_radius_CI
         self.energy_threshold = energy_threshold
-        self.tree = None
         self.norm = norm
+        self.masks = {}
         #
         super().__init__(db, properties, logger, energy_only, weightsfile, crdmode=crdmode,
-                         fit_only=fit_only)
+                         fit_only=fit_only, nn_index=nn_index, model_cache=model_cache,
+                         storage=storage)
 
     def get_interpolators(self, db, properties):
         """ For each property a separate interpolator is set up to be consistent with the
-            PySurf Interpolator Framework. To avoid setting up several cKDTrees the same 
-            tree is used for all interpolators.
+            PySurf Interpolator Framework. To avoid setting up several neighbor indices the
+            index of the interpolator is used for all of them.
 
             Parameters:
             -----------
@@ -115,36 +125,10 @@ class NearestNeighborInterpolator(Interpolator):
                 interpolator as value.
         """
         #
-        if self.tree is None:
-            self.tree = cKDTree(self.crds)
-        return {prop_name: NNInterpolator(db, self.tree, prop_name, norm=self.norm)
+        return {prop_name: NNInterpolator(db, self, prop_name, norm=self.norm)
                 for prop_name in properties}, len(db)
 
 
-    def get_interpolators_from_file(self, filename, properties):
-        """ Specifically for Machine Learning algorithms interpolators can be loaded from a file.
-            However, in the case of NearestNeighborInterpolation that is not used and implemented.
-            To be consistent, the get_interpolators method is called
-            
-            Parameters:
-            -----------
-                filename: string
-                    filepath where information of interpolators is stored. Not used here!
-
-                properties: list
-                    properties (e.g. ['energy', 'gradient']) that should be fitted 
-            
-
-            Returns
-            --------
-                dictionary containing the property name as key and the corresponding
-                interpolator as value.
-        """
-
-        self.logger.warning("NearestNeighborInterpolator cannot be started from a file. " +
-                            "Interpolators are set up from database")
-        return self.get_interpolators(self.db, properties)
-
 #    @Timer(name="get")
     def get(self, request):
         """ Fill request and return request and if data is trustworthy or not
@@ -163,13 +147,10 @@ class NearestNeighborInterpolator(Interpolator):
         """
         #
         # Convert coordinate into desired format
-        if self.crdmode == 'internal':
-            crd = internal(request.crd)
-        else:
-            crd = request.crd
+        crd = self.descriptor(request.crd)
         #
         # Make nearest neighbor search once and pass it to all interpolators
-        dist, idx = self.tree.query(crd, p=self.norm)
+        dist, idx = self.neighbors(crd, p=self.norm)
         for prop in request:
             request.set(prop, self.interpolators[prop](crd, request, idx))
         #
@@ -177,69 +158,92 @@ class NearestNeighborInterpolator(Interpolator):
         diffmin = np.min(np.diff(request['energy']))
         is_trustworthy = False
         if diffmin < self.energy_threshold:
-            if dist < self.trust_radius_CI: is_trustworthy = True
+            radius = self.trust_radius_CI
         else:
-            if dist < self.trust_radius_general: is_trustworthy = True
+            radius = self.trust_radius_general
+        if dist < radius: is_trustworthy = True
+        #
+        # for partial frames, entries no frame within the radius stores are not trustworthy
+        if is_trustworthy and not self.covered(request, crd, radius, p=self.norm):
+            is_trustworthy = False
         #
         return request, is_trustworthy
 
-    def loadweights(self, filename):
-        """ Weights are loaded for the interpolators from a file. As the
-            NearestNeighborInterpolator is not using the save option, also
-            here, interpolators are just set up from the database
+    def predict_energy(self, crds):
+        """ Energies of the nearest neighbors for a batch of descriptors
 
             Parameters:
             -----------
-                filename, str:
-                    filepath of the file containing the weights. Not used here!
+                crds:
+                    descriptors, shape (ngeom, ndescriptor)
+
+            Returns:
+            --------
+                energies of the nearest neighbors, shape (ngeom, nstates)
         """
-        #
-        self.logger.warning("NearestNeighborInterpolator cannot load weights, interpolators are " +
-                            "set up from DB")
-        # As saving is not used, interpolators are set up from the database
-        self.get_interpolators(self.db, self.properties)
+        _, idx = self.neighbors(np.reshape(crds, (len(crds), -1)), p=self.norm)
+        return np.array([self.db.get('energy', i) for i in idx])
+
+    @property
+    def hyperparameters(self):
+        """ p-norm of the neighbor search, saved in the model file """
+        return {'norm': self.norm}
+
+    def get_weights(self):
+        """ The NearestNeighborInterpolator has no weights, the properties are taken from the
+            database. Only the metadata (descriptor, fingerprint of the database) is saved.
+
+            Returns:
+            --------
+                empty dictionary
+        """
+        return {}
+
+    def set_weights(self, arrays, metadata):
+        """ As there are no weights, the interpolators are just set up from the database
 
-    def save(self, filename):
-        """ Method to save the interpolators to a file. Not used here!
-            
             Parameters:
             -----------
-                filename:
-                    filepath where to save the information. Not used here!
+                arrays, dict:
+                    arrays of the model file. Not used here!
+
+                metadata, dict:
+                    metadata of the model file. Not used here!
         """
-        #
-        self.logger.warning("NearestNeighborInterpolator cannot be saved to a file")
+        self._train()
 
 #    @Timer(name="train")
     def _train(self):
         """ Method to train the interpolators. In the case of the NearestNeighborInterpolator
-            the cKDTree has to be updated.
+            only the neighbor index has to be updated, which is done on the next query.
+            For partial frames, the masks of the stored entries are read.
         """
-        #update cKDTree
-        self.tree = cKDTree(self.crds)
+        self.crds = self.get_crd()
+        self.masks = {prop: self.property_mask(prop) for prop in self.interpolators
+                      if isinstance(self.interpolators[prop], NNInterpolator)}
 
 class NNInterpolator():
     """ NearestNeighborInterpolator for one property. """
-    def __init__(self, db, ckdtree, prop, norm=2):
+    def __init__(self, db, parent, prop, norm=2):
         """ 
             Parameters:
             -----------
                 db: 
                     database containing the datasets on which the interpolation is based on
 
-                ckdtree:
-                    cKDTree of the coordinates for the interpolation
+                parent:
+                    NearestNeighborInterpolator, whose neighbor index is used
 
                 prop: str
                     property that should be fitted. No sanity check with the database
                     is made!
 
                 norm: 
-                    norm for the cDKTree.query
+                    p-norm for the nearest neighbor search
         """
         #
         self.db = db
-        self.tree = ckdtree
+        self.parent = parent
         self.prop = prop
         self.norm = norm
 
@@ -250,7 +254,7 @@ class NNInterpolator():
             -----------
                 crd:
                     coordinates where the property is requested. The shape has to be consistent
-                    with the shape of the coordinates in the cKDTree
+                    with the shape of the descriptors of the interpolator
 
                 request:
                     Instance of the SPP request. Not used here, but needed for consistency.
@@ -265,5 +269,17 @@ class NNInterpolator():
         """
         #
         if idx is None:
-            dist, idx = self.tree.query(crd, p=self.norm)
-        return self.db.get(self.prop, idx)
+            _, idx = self.parent.neighbors(crd, p=self.norm)
+        mask = self.parent.masks.get(self.prop)
+        if mask is None or mask[idx].all():
+            return self.db.get(self.prop, idx)
+        # partial frames: each entry is taken from the closest frame storing it
+        _, order = self.parent.neighbors(crd, k=len(mask), p=self.norm)
+        order = np.atleast_1d(order)
+        first = order[mask[order].argmax(axis=0)]
+        value = np.array(self.db.get(self.prop, idx), dtype=np.double)
+        flat = value.reshape(-1)
+        for iframe in np.unique(first):
+            columns = first == iframe
+            flat[columns] = np.reshape(self.db.get(self.prop, iframe), -1)[columns]
+        return value
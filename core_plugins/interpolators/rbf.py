@@ -4,9 +4,6 @@ from scipy.linalg import lu_factor, lu_solve
 from scipy.spatial.distance import cdist, pdist, squareform
 #
 from pysurf import Interpolator
-from pysurf.spp import within_trust_radius, internal
-from pysurf.database.dbtools import DBVariable
-from pysurf.database.database import Database
 #
 #from codetiming import Timer
 
@@ -21,7 +18,8 @@ class RbfInterpolator(Interpolator):
     """
 
     @classmethod
-    def from_config(cls, config, db, properties, logger, energy_only, weightsfile, crdmode, fit_only):
+    def from_config(cls, config, db, properties, logger, energy_only, weightsfile, crdmode, fit_only,
+                    nn_index=None, model_cache=None, storage=None):
         trust_radius_general = config['trust_radius_general']
         trust_radius_CI = config['trust_radius_ci']
         energy_threshold = config['energy_threshold']
@@ -29,10 +27,12 @@ class RbfInterpolator(Interpolator):
         #
         return cls(db, properties, logger, energy_only=energy_only, weightsfile=weightsfile,
                    crdmode=crdmode, trust_radius_general=trust_radius_general,
-                   trust_radius_CI=trust_radius_CI, energy_threshold=energy_threshold, fit_only=fit_only, epsilon=epsilon)
+                   trust_radius_CI=trust_radius_CI, energy_threshold=energy_threshold, fit_only=fit_only, epsilon=epsilon,
+                   nn_index=nn_index, model_cache=model_cache, storage=storage)
 
     def __init__(self, db, properties, logger, energy_only=False, weightsfile=None, crdmode='cartesian', fit_only=False,
-            trust_radius_general=0.75, trust_radius_CI=0.25, energy_threshold=0.02, epsilon=None):
+            trust_radius_general=0.75, trust_radius_CI=0.25, energy_threshold=0.02, epsilon=None, nn_index=None,
+            model_cache=None, storage=None):
 
         self.trust_radius_general = trust_radius_general
         self.trust_radius_CI = trust_radius_CI
@@ -42,28 +42,20 @@ class RbfInterpolator(Interpolator):
             self.epsilon = epsilon
         else:
             self.epsilon = trust_radius_CI
-        super().__init__(db, properties, logger, energy_only, weightsfile, crdmode=crdmode, fit_only=fit_only)
+        super().__init__(db, properties, logger, energy_only, weightsfile, crdmode=crdmode, fit_only=fit_only,
+                         nn_index=nn_index, model_cache=model_cache, storage=storage)
 
     def get_interpolators(self, db, properties):
         """ """
-        A = self._compute_a(self.crds)
-        lu_piv = lu_factor(A)
-        return {prop_name: Rbf.from_lu_factors(lu_piv, db[prop_name], self)
+        lu_piv = lu_factor(self._compute_a(self.crds), overwrite_a=True)
+        return {prop_name: Rbf(*self._solve(lu_piv, prop_name), self)
                 for prop_name in properties}, len(db)
 
     def get_interpolators_from_file(self, filename, properties):
-        db = Database.load_db(filename)
-        out = {}
-        for prop_name in db.keys():
-            if prop_name.endswith('_shape'):
-                continue
-            if prop_name == 'rbf_epsilon':
-                self.epsilon = np.copy(db['rbf_epsilon'])[0]
-                continue
-            out[prop_name] = Rbf(np.copy(db[prop_name]), tuple(np.copy(db[prop_name+'_shape'])), self)
-        if not all(prop in out for prop in properties):
-            raise Exception("Cannot fit all properties")
-        return out
+        """setup empty interpolators, the weights are set in loadweights"""
+        if not self.check_model_file(filename, properties):
+            return None
+        return {prop_name: Rbf(None, self.db[prop_name].shape[1:], self) for prop_name in properties}
 
 #    @Timer(name="get")
     def get(self, request):
@@ -71,12 +63,9 @@ class RbfInterpolator(Interpolator):
 
            Return request and if data is trustworthy or not
         """
-        if self.crdmode == 'internal':
-            crd = internal(request.crd)
-        else:
-            crd = request.crd
+        crd = self.descriptor(request.crd)
         #
-        _, trustworthy = within_trust_radius(crd, self.crds, radius=self.trust_radius_general, radius_ci=self.trust_radius_CI)
+        _, trustworthy = self.within_trust_radius(crd, radius=self.trust_radius_general, radius_ci=self.trust_radius_CI)
 
         for prop in request:
             request.set(prop, self.interpolators[prop](crd, request))
@@ -85,117 +74,111 @@ class RbfInterpolator(Interpolator):
         #compare energy differences with threshold from user
         if diffmin < self.energy_threshold:
             self.logger.info(f"Small energy gap of {diffmin}. Within CI radius: " + str(trustworthy[1]))
-            is_trustworthy = trustworthy[1]
+            is_trustworthy, radius = trustworthy[1], self.trust_radius_CI
         else:
             self.logger.info('Large energy diffs. Within general radius: ' + str(trustworthy[0]))
-            is_trustworthy = trustworthy[0]
+            is_trustworthy, radius = trustworthy[0], self.trust_radius_general
+        # for partial frames, entries no frame within the radius stores are not trustworthy
+        if is_trustworthy and not self.covered(request, crd, radius):
+            is_trustworthy = False
         return request, is_trustworthy
 
-    def loadweights(self, filename):
-        """Load existing weights"""
-        db = Database.load_db(filename)
-        for prop, rbf in self.interpolators.items():
-            if prop == 'gradient' and self.energy_only is True:
-                continue
-            if prop not in db:
-                raise Exception("property needs to be implemented")
-            rbf.nodes = np.copy(db[prop])
-            rbf.shape = np.copy(db[prop+'_shape'])
-        self.epsilon = np.copy(db['rbf_epsilon'])
+    def predict_energy(self, crds):
+        return self.interpolators['energy'].predict(crds)
 
-    def save(self, filename):
-        settings = {'dimensions': {}, 'variables': {}}
-        dimensions = settings['dimensions']
-        variables = settings['variables']
+    @property
+    def hyperparameters(self):
+        return {'epsilon': self.epsilon}
 
+    def get_weights(self):
+        return {prop: rbf.nodes for prop, rbf in self.interpolators.items() if isinstance(rbf, Rbf)}
+
+    def set_weights(self, arrays, metadata):
+        """Load existing weights"""
         for prop, rbf in self.interpolators.items():
             if not isinstance(rbf, Rbf):
                 continue
-            lshape = len(rbf.shape)
-            dimensions[str(lshape)] = lshape
-            for num in rbf.nodes.shape:
-                dimensions[str(num)] = num
-            variables[prop] = DBVariable(np.double, tuple(str(num) for num in rbf.nodes.shape))
-            variables[prop+'_shape'] = DBVariable(np.int, tuple(str(lshape)))
-        dimensions['1'] = 1
-        variables['rbf_epsilon'] = DBVariable(np.double, ('1',))
-        #
-        db = Database(filename, settings)
-        #
-        for prop, rbf in self.interpolators.items():
-            if not isinstance(rbf, Rbf):
-                continue
-            db[prop] = rbf.nodes
-            db[prop+'_shape'] = rbf.shape
-        #
-        db['rbf_epsilon'] = self.epsilon
+            rbf.nodes = arrays[prop]
+            rbf.shape = tuple(metadata['properties'][prop])
 
 #    @Timer(name="train")
     def _train(self):
         """set rbf weights, based on the current crds"""
 #       self.crds = self.get_crd()
-        A = self._compute_a(self.crds)
-        lu_piv = lu_factor(A)
+        lu_piv = lu_factor(self._compute_a(self.crds), overwrite_a=True)
         #
         for name, interpolator in self.interpolators.items():
             if isinstance(interpolator, Rbf):
-                interpolator.update(lu_piv, self.db[name])
+                interpolator.update(*self._solve(lu_piv, name))
+
+    def _solve(self, lu_piv, prop):
+        """nodes of a property, solving for all components at once
+
+           For partial frames, each group of components is solved using only the
+           frames that store it, the nodes of the other frames are zero
+        """
+        values = np.array(self.db[prop]).astype(np.double, copy=False)
+        shape = values.shape[1:]
+        values = values.reshape((len(values), -1))
+        groups = self.column_groups(prop)
+        if groups is None:
+            return lu_solve(lu_piv, values), shape
+        nodes = np.zeros_like(values)
+        for frames, columns in groups:
+            if not frames.any():
+                continue
+            if frames.all():
+                lu_group = lu_piv
+            else:
+                lu_group = lu_factor(self._compute_a(self.crds[frames]), overwrite_a=True)
+            nodes[np.ix_(frames, columns)] = lu_solve(lu_group, values[np.ix_(frames, columns)])
+        return nodes, shape
 
     def _compute_a(self, x):
-        #
-        shape = x.shape
-        if len(shape) == 3:
-            dist = pdist(x.reshape((shape[0], shape[1]*shape[2])))
-        else:
-            dist = pdist(x)
-        A = squareform(dist)
-        return weight(A, self.epsilon)
+        """rbf matrix, computed in place to keep only a single N x N array in memory"""
+        A = squareform(pdist(np.reshape(x, (len(x), -1))))
+        A *= 1.0/self.epsilon
+        A **= 2
+        A += 1
+        return np.sqrt(A, out=A)
 
 
 class Rbf:
+    """Rbf interpolation of a single property
+
+       The nodes are stored by the storage of the parent, the prediction
+       loops over chunks of nodes and accumulates in double precision,
+       so single precision or memory mapped nodes are never copied as a whole
+    """
+
+    chunk_size = 16384
 
     def __init__(self, nodes, shape, parent):
-        self.nodes = nodes
         self.shape = shape
         self.parent = parent
+        # without nodes, they are set when the weights are loaded
+        self.nodes = None if nodes is None else parent.storage.store(nodes)
 
-    def update(self, lu_piv, prop):
-        self.nodes, self.shape = self._setup(lu_piv, prop)
+    def update(self, nodes, shape):
+        self.nodes = self.parent.storage.store(nodes)
+        self.shape = shape
 
-    @classmethod
-    def from_lu_factors(cls, lu_piv, prop, parent):
-        nodes, shape = cls._setup(lu_piv, prop)
-        return cls(nodes, shape, parent)
+    def predict(self, crds):
+        """interpolate the property for a batch of descriptors"""
+        crds = np.reshape(crds, (len(crds), -1)).astype(np.double, copy=False)
+        centers = self.parent.crds.reshape((len(self.parent.crds), -1))
+        res = np.zeros((len(crds), self.nodes.shape[1]), dtype=np.double)
+        for start in range(0, len(centers), self.chunk_size):
+            end = start + self.chunk_size
+            dist = cdist(crds, centers[start:end].astype(np.double, copy=False))
+            res += weight(dist, self.parent.epsilon) @ self.nodes[start:end].astype(np.double, copy=False)
+        return res.reshape((len(crds), *self.shape))
 
     def __call__(self, crd, request):
-        shape = self.parent.crds.shape
-        if len(shape) == 3:
-            dist = cdist([np.array(crd).flatten()], self.parent.crds.reshape((shape[0], shape[1]*shape[2])))
-        else:
-            dist = cdist([np.array(crd).flatten()], self.parent.crds)
-        crd = weight(dist, self.parent.epsilon)
+        res = self.predict(np.asarray(crd)[np.newaxis])[0]
         if len(self.shape) == 1 and self.shape[0] == 1:
-            return np.dot(crd, self.nodes).reshape(self.shape)[0]
-        return np.dot(crd, self.nodes).reshape(self.shape)
-
-    @staticmethod
-    def _setup(lu_piv, prop):
-        prop = np.array(prop)
-        shape = prop.shape
-        size = shape[0]
-        dim = 1
-        for i in shape[1:]:
-            dim *= i
-        #
-        prop = prop.reshape((size, dim))
-        #
-        if dim == 1:
-            nodes = lu_solve(lu_piv, prop)
-        else:
-            nodes = np.zeros((size, dim), dtype=prop.dtype)
-            for i in range(dim):
-                nodes[:,i] = lu_solve(lu_piv, prop[:,i])
-        return nodes, shape[1:]
+            return res[0]
+        return res
 
 
 def weight(r, epsilon):
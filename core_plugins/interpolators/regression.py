@@ -1,23 +1,33 @@
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
-from scipy.spatial.distance import cdist
+import numpy as np
+#
+from scipy.linalg import cho_factor, cho_solve
 #
 from pysurf import Interpolator
-from pysurf.spp import within_trust_radius, internal
+from pysurf.spp.storage import WeightStorage, nbytes
 
 
 class RegInterpolator(Interpolator):
-    """Basic Rbf interpolator"""
+    """Polynomial regression interpolator
+
+       The weights are obtained from the normal equations and are updated
+       with recursive least squares, whenever a new point is appended.
+    """
 
-    _questions = """
+    _user_input = """
         trust_radius_general = 0.75 :: float
         trust_radius_ci = 0.25 :: float
         energy_threshold = 0.02 :: float
         regression_order = 2 :: int
+        # highest order of monomials coupling different coordinates,
+        # if not set, all monomials up to regression_order are used
+        cross_order = :: int, optional
+        # ridge parameter used to stabilize the normal equations
+        regularization = 1e-8 :: float
     """
 
     @classmethod
-    def from_config(cls, config, db, properties, logger, energy_only, weightsfile, crdmode, fit_only):
+    def from_config(cls, config, db, properties, logger, energy_only, weightsfile, crdmode, fit_only,
+                    nn_index=None, model_cache=None, storage=None):
         trust_radius_general = config['trust_radius_general']
         trust_radius_CI = config['trust_radius_ci']
         energy_threshold = config['energy_threshold']
@@ -25,85 +35,273 @@ class RegInterpolator(Interpolator):
         #
         return cls(db, properties, logger, energy_only=energy_only, weightsfile=weightsfile,
                    crdmode=crdmode, trust_radius_general=trust_radius_general,
-                   trust_radius_CI=trust_radius_CI, energy_threshold=energy_threshold, order=order, fit_only=fit_only)
+                   trust_radius_CI=trust_radius_CI, energy_threshold=energy_threshold, order=order,
+                   fit_only=fit_only, cross_order=config['cross_order'],
+                   regularization=config['regularization'], nn_index=nn_index, model_cache=model_cache,
+                   storage=storage)
 
     def __init__(self, db, properties, logger, energy_only=False, weightsfile=None, crdmode='cartesian',
-                 trust_radius_general=0.75, trust_radius_CI=0.25, energy_threshold=0.02, order=2, fit_only=False):
+                 trust_radius_general=0.75, trust_radius_CI=0.25, energy_threshold=0.02, order=2, fit_only=False,
+                 cross_order=None, regularization=1e-8, nn_index=None, model_cache=None,
+                 storage=None):
 
         self.trust_radius_general = trust_radius_general
         self.trust_radius_CI = trust_radius_CI
         self.energy_threshold = energy_threshold
         self.order = order
-        super().__init__(db, properties, logger, energy_only, weightsfile, crdmode=crdmode, fit_only=fit_only)
-
+        self.cross_order = cross_order
+        self.regularization = regularization
+        self.features = None
+        # geometrically grown buffer of the crds appended since the last training
+        self._crd_buffer = None
+        super().__init__(db, properties, logger, energy_only, weightsfile, crdmode=crdmode, fit_only=fit_only,
+                         nn_index=nn_index, model_cache=model_cache, storage=storage)
 
     def get_interpolators(self, db, properties):
-        return {prop_name: Regression(self.crds, db[prop_name], self.order)
+        self.features = MonomialFeatures(int(np.prod(self.crds.shape[1:])), self.order, self.cross_order)
+        return {prop_name: Regression(self.features, db[prop_name].shape[1:], self.regularization,
+                                      storage=self.storage)
                 for prop_name in properties}, len(db['crd'])
 
-    def get_interpolators_from_file(self, filename, properties):
-        pass
-
     def get(self, request):
         """fill request
 
            Return request and if data is trustworthy or not
         """
-        if self.crdmode == 'internal':
-            crd = internal(request.crd)
-        else:
-            crd = request.crd
+        crd = self.descriptor(request.crd)
         #
-        _, trustworthy = within_trust_radius(crd, self.crds, radius=self.trust_radius_general, radius_ci=self.trust_radius_CI)
-#       crd = crd[:self.size]
+        _, trustworthy = self.within_trust_radius(crd, radius=self.trust_radius_general, radius_ci=self.trust_radius_CI)
+        # the monomials are shared by all properties
+        features = self.features(crd)
         for prop in request:
-            request.set(prop, self.interpolators[prop](crd, request))
+            interpolator = self.interpolators[prop]
+            if isinstance(interpolator, Regression):
+                request.set(prop, interpolator.predict(features)[0])
+            else:
+                request.set(prop, interpolator(crd, request))
         #
         diffmin = np.min(np.diff(request['energy']))
         #compare energy differences with threshold from user
         if diffmin < self.energy_threshold:
             self.logger.info(f"Small energy gap of {diffmin}. Within CI radius: " + str(trustworthy[1]))
-            is_trustworthy = trustworthy[1]
+            is_trustworthy, radius = trustworthy[1], self.trust_radius_CI
         else:
             self.logger.info('Large energy diffs. Within general radius: ' + str(trustworthy[0]))
-            is_trustworthy = trustworthy[0]
+            is_trustworthy, radius = trustworthy[0], self.trust_radius_general
+        # for partial frames, entries no frame within the radius stores are not trustworthy
+        if is_trustworthy and not self.covered(request, crd, radius):
+            is_trustworthy = False
         return request, is_trustworthy
 
+    def predict_energy(self, crds):
+        return self.interpolators['energy'].predict(self.features(crds))
+
+    def append(self, request):
+        """add a new point to the regression using recursive least squares"""
+        super().append(request)
+        if self.store is not None and len(self.store) == self.size + 1:
+            # the descriptor was already computed by the store
+            self.crds = self.store.data
+            self.size = len(self.crds)
+        else:
+            self._append_crd(self.descriptor(request.crd))
+        # the same (storage precision) descriptor as used in the training
+        features = self.features(self.crds[-1].astype(np.double))[0]
+        for prop, value in request.iter_data():
+            interpolator = self.interpolators.get(prop, None)
+            # partial fits are updated on the next training
+            if isinstance(interpolator, Regression) and interpolator.partial is False:
+                interpolator.update(features, value)
 
-    def save(self, filename):
-        pass
+    def _append_crd(self, crd):
+        """append a descriptor, the buffer is grown geometrically"""
+        if self._crd_buffer is None or self.size == len(self._crd_buffer):
+            buffer = np.empty((max(2*self.size, 1), *crd.shape), dtype=self.storage.dtype)
+            if self.size > 0:
+                buffer[:self.size] = self.crds
+            self._crd_buffer = buffer
+        self._crd_buffer[self.size] = crd
+        self.size += 1
+        self.crds = self._crd_buffer[:self.size]
+
+    @property
+    def hyperparameters(self):
+        return {'order': self.order, 'cross_order': self.cross_order,
+                'regularization': self.regularization}
+
+    def get_weights(self):
+        weights = {}
+        for prop, interpolator in self.interpolators.items():
+            if isinstance(interpolator, Regression) and interpolator.coefficients is not None:
+                weights[prop] = interpolator.coefficients
+                if interpolator.inverse is not None:
+                    weights[prop + '.inverse'] = interpolator.inverse
+        return weights
+
+    def set_weights(self, arrays, metadata):
+        # the arrays are copy-on-write maps, so recursive updates do not change the file
+        for prop, interpolator in self.interpolators.items():
+            if isinstance(interpolator, Regression) and prop in arrays:
+                interpolator.load(arrays[prop], arrays.get(prop + '.inverse'))
+
+    def memory_usage(self):
+        arrays = [self.crds]
+        for interpolator in self.interpolators.values():
+            if isinstance(interpolator, Regression):
+                arrays += [interpolator.coefficients, interpolator.inverse]
+                if interpolator.weights is not interpolator.coefficients:
+                    arrays.append(interpolator.weights)
+        return nbytes(arrays)
 
     def _train(self):
         self.crds = self.get_crd()
+        self.size = len(self.crds)
+        self._crd_buffer = None
+        if self.size == 0:
+            return
+        features = self.features(self.crds)
         #
         for name, interpolator in self.interpolators.items():
             if isinstance(interpolator, Regression):
-                interpolator.train()
-    
-    def loadweights(self, filename):
-        pass
+                interpolator.train(features, np.array(self.db[name]), self.column_groups(name))
+
 
+class MonomialFeatures:
+    """Polynomial feature map based on precomputed monomial index tables
+
+       Every monomial of degree d is stored as the product of a monomial of
+       degree d-1 (its parent) and a single coordinate, so the complete
+       feature map is evaluated with a single vectorized product per degree.
+    """
+
+    def __init__(self, ncrds, order, cross_order=None):
+        if cross_order is None:
+            cross_order = order
+        self.ncrds = ncrds
+        self.order = order
+        self.cross_order = cross_order
+        self.tables = self._setup_tables(ncrds, order, cross_order)
+        self.nfeatures = 1 + sum(len(parents) for parents, _ in self.tables)
+
+    @staticmethod
+    def _setup_tables(ncrds, order, cross_order):
+        """For each degree d, store the index of the parent monomial and the
+           coordinate it is multiplied with"""
+        tables = []
+        # monomials are stored as tuples of (non decreasing) coordinate indices
+        previous = [()]
+        offset = 0
+        for degree in range(1, order+1):
+            parents, variables, current = [], [], []
+            for iparent, monomial in enumerate(previous):
+                start = monomial[-1] if len(monomial) > 0 else 0
+                for i in range(start, ncrds):
+                    new = monomial + (i,)
+                    if degree > cross_order and len(set(new)) > 1:
+                        continue
+                    parents.append(offset + iparent)
+                    variables.append(i)
+                    current.append(new)
+            offset += len(previous)
+            tables.append((np.array(parents, dtype=int), np.array(variables, dtype=int)))
+            previous = current
+        return tables
+
+    def __call__(self, crds):
+        """compute the features for a single geometry or a set of geometries"""
+        crds = np.asarray(crds, dtype=np.double).reshape((-1, self.ncrds))
+        features = np.empty((len(crds), self.nfeatures), dtype=np.double)
+        features[:, 0] = 1.0
+        start = 1
+        for parents, variables in self.tables:
+            end = start + len(parents)
+            features[:, start:end] = features[:, parents] * crds[:, variables]
+            start = end
+        return features
 
 
 class Regression:
-    def __init__(self, crds, values, order):
-#       self.crds = np.copy(crds)
-        self.crds = crds
-        self.shape_crds = self.crds.shape
-        self.crds.resize(self.shape_crds[0], int(self.crds.size/self.shape_crds[0]))
-        self.values = np.copy(values)
-        self.shape_values = values.shape
-        self.values.resize(self.shape_values[0], int(self.values.size/self.shape_values[0]))
-        self.poly = PolynomialFeatures(degree=order)
-
-    def train(self):
-        self.crds_poly = self.poly.fit_transform(self.crds)
-        self.regr = LinearRegression()
-        self.regr.fit(self.crds_poly, self.values)
+    """Linear regression of a single property in the monomial features
+
+       Stores the inverse of the (regularized) normal matrix, so that new
+       points can be added in O(p**2) using recursive least squares.
+       The inverse and the coefficients updated by recursive least squares
+       are kept in double precision, only the weights used for prediction
+       are kept in the precision of the storage.
+    """
+
+    def __init__(self, features, shape, regularization=1e-8, storage=None):
+        self.features = features
+        self.shape = tuple(shape)
+        self.regularization = regularization
+        if storage is None:
+            storage = WeightStorage()
+        self.storage = storage
+        self.coefficients = None
+        self.weights = None
+        self.inverse = None
+        # fitted to partial frames, no recursive updates possible
+        self.partial = False
+
+    def train(self, features, values, groups=None):
+        """solve the normal equations for all data points
+
+           For partial frames, each group of columns is fitted to the frames
+           that store it, see `Interpolator.column_groups`
+        """
+        values = np.asarray(values).reshape((len(features), -1))
+        if groups is None:
+            factor = self._factorize(features)
+            self.load(cho_solve(factor, features.T @ values),
+                      cho_solve(factor, np.identity(features.shape[1])))
+            return
+        coefficients = np.zeros((features.shape[1], values.shape[1]), dtype=np.double)
+        for frames, columns in groups:
+            factor = self._factorize(features[frames])
+            coefficients[:, columns] = cho_solve(factor, features[frames].T @ values[np.ix_(frames, columns)])
+        self.load(coefficients, None)
+
+    def load(self, coefficients, inverse=None):
+        """set the coefficients and the inverse, without the inverse no recursive updates are possible"""
+        self.coefficients = self.storage.store(coefficients, dtype=np.double)
+        self.inverse = None if inverse is None else self.storage.store(inverse, dtype=np.double)
+        self.partial = self.inverse is None
+        self.weights = None
+        self._store_weights()
+
+    def _store_weights(self):
+        """weights used for prediction in the precision of the storage"""
+        if self.storage.dtype == np.double:
+            self.weights = self.coefficients
+        elif self.weights is None:
+            self.weights = self.storage.store(self.coefficients)
+        else:
+            self.weights[...] = self.coefficients
+
+    def _factorize(self, features):
+        """cholesky factors of the regularized normal matrix"""
+        normal = features.T @ features
+        normal[np.diag_indices_from(normal)] += self.regularization
+        return cho_factor(normal)
+
+    def update(self, features, value):
+        """add a single point using the Sherman-Morrison formula"""
+        value = np.asarray(value, dtype=np.double).flatten()
+        if self.inverse is None:
+            self.load(np.zeros((features.size, value.size), dtype=np.double),
+                      np.identity(features.size)/self.regularization)
+        pfeat = self.inverse @ features
+        gain = pfeat/(1.0 + features @ pfeat)
+        self.coefficients += np.outer(gain, value - features @ self.coefficients)
+        self.inverse -= np.outer(gain, pfeat)
+        self._store_weights()
+
+    def predict(self, features):
+        """predict the property for an array of features"""
+        res = features @ self.weights
+        if self.shape == (1,):
+            return res[:, 0]
+        return res.reshape((len(features), *self.shape))
 
     def __call__(self, crd, request):
-        crd = np.copy(crd)
-        crd = self.poly.fit_transform(crd.reshape((1,crd.size)))
-        res = self.regr.predict(crd)
-        res.resize(self.shape_values[1:])
-        return res
+        return self.predict(self.features(crd))[0]
@@ -1,74 +1,194 @@
+import numpy as np
+#
 from pysurf import Interpolator
+from pysurf.spp.storage import nbytes
+from pysurf.spp.request import StateData
 
 
 class ShepardInterpolator(Interpolator):
+    """Zeroth order Shepard interpolator (inverse distance weighting)
 
-    def __init__(self, db, properties, logger, energy_only=False, weightsfile=None, crdmode='cartesian', fit_only=False):
-        super().__init__(db, properties, logger, energy_only, weightsfile, crdmode=crdmode, fit_only=fit_only)
-        self.crds = self.get_crd()
+       Only the `nneighbors` geometries closest to the requested one
+       contribute to the weighted sum, they are obtained from the
+       nearest neighbor index of the interpolator.
+    """
+
+    _user_input = """
+        # squared distance to the closest geometry, below which a result is trustworthy
+        trust_radius = 0.2 :: float
+        # number of nearest neighbors used in the weighted sum
+        nneighbors = 8 :: int
+        # weights are computed as 1/r**power
+        power = 2 :: int
+    """
+
+    @classmethod
+    def from_config(cls, config, db, properties, logger, energy_only, weightsfile, crdmode, fit_only,
+                    nn_index=None, model_cache=None, storage=None):
+        return cls(db, properties, logger, energy_only=energy_only, weightsfile=weightsfile,
+                   crdmode=crdmode, fit_only=fit_only, trust_radius=config['trust_radius'],
+                   nneighbors=config['nneighbors'], power=config['power'], nn_index=nn_index,
+                   model_cache=model_cache, storage=storage)
+
+    def __init__(self, db, properties, logger, energy_only=False, weightsfile=None, crdmode='cartesian',
+                 fit_only=False, trust_radius=0.2, nneighbors=8, power=2, nn_index=None, model_cache=None,
+                 storage=None):
+        self.trust_radius = trust_radius
+        self.nneighbors = nneighbors
+        self.power = power
+        self._values = {}
+        self._masks = {}
+        super().__init__(db, properties, logger, energy_only, weightsfile, crdmode=crdmode, fit_only=fit_only,
+                         nn_index=nn_index, model_cache=model_cache, storage=storage)
 
     def get(self, request):
-        """fill request and return True
+        """fill request
+
+           Return request and if data is trustworthy or not
         """
-        #
-        weights, is_trustworthy = self._get_weights(request.crd)
+        requests, is_trustworthy = self.get_batch([request])
+        return requests[0], bool(is_trustworthy[0])
+
+    def get_batch(self, requests):
+        """fill a list of requests using a single neighbor search
+
+           Return requests and an array stating if the data is trustworthy
+        """
+        if len(requests) == 0:
+            return requests, np.zeros(0, dtype=bool)
+        crds = self._convert_crds([request.crd for request in requests])
+        weights, idx, is_trustworthy = self._get_weights(crds)
         # no entries in db...
         if weights is None:
-            return request, False
-        #
-        for prop in request:
-            request.set(prop, self._get_property(weights, prop))
+            return requests, np.zeros(len(requests), dtype=bool)
         #
-        return request, is_trustworthy
+        properties = set(prop for request in requests for prop in request)
+        results = {prop: self._get_property(weights, idx, prop) for prop in properties
+                   if prop in self._values}
+        # for partial frames, entries no neighbor stores are not trustworthy
+        covered = {prop: self._covered(idx, prop) for prop in results if self._masks[prop] is not None}
+        for i, request in enumerate(requests):
+            for prop, entries in covered.items():
+                if prop in request and not self._request_covered(request, request[prop], entries[i]):
+                    is_trustworthy[i] = False
+        for i, request in enumerate(requests):
+            for prop in request:
+                if prop in results:
+                    request.set(prop, results[prop][i])
+                else:
+                    request.set(prop, self.interpolators[prop](crds[i], request))
+        return requests, is_trustworthy
+
+    def interpolate(self, crds, properties):
+        """interpolate properties for many geometries at once
+
+           Parameters
+           ----------
+               crds: array
+                   geometries, shape (ngeom, *crd.shape)
+
+               properties: list
+                   names of the properties
+
+           Returns
+           -------
+               dict containing the stacked results for each property and an
+               array stating which of the results are trustworthy
+        """
+        weights, idx, is_trustworthy = self._get_weights(self._convert_crds(crds))
+        if weights is None:
+            return None, np.zeros(len(crds), dtype=bool)
+        return {prop: self._get_property(weights, idx, prop, squeeze=False)
+                for prop in properties}, is_trustworthy
+
+    def predict_energy(self, crds):
+        weights, idx, _ = self._get_weights(np.reshape(crds, (len(crds), -1)))
+        if weights is None:
+            return np.zeros((len(crds), self.nstates))
+        return self._get_property(weights, idx, 'energy', squeeze=False)
 
     def get_interpolators(self, db, properties):
         return {prop_name: db[prop_name].shape[1:] for prop_name in properties}, len(db)
 
-    def save(self, filename):
-        """Do nothing"""
+    @property
+    def hyperparameters(self):
+        return {'nneighbors': self.nneighbors, 'power': self.power}
+
+    def get_weights(self):
+        """the values are taken from the database, nothing to store"""
+        return {}
 
-    def loadweights(self, filename):
-        """Do nothing"""
+    def set_weights(self, arrays, metadata):
+        """cache the values of the database"""
+        self._train()
+
+    def memory_usage(self):
+        return nbytes([self.crds, *self._values.values()])
 
     def _train(self):
-        pass
+        """cache coordinates and values, the neighbor index is rebuild on the next query"""
+        self.size = len(self.db)
+        if self.crds is None or len(self.crds) != self.size:
+            self.crds = self.get_crd()
+        self._values = {prop: self.storage.store(np.array(self.db[prop]).reshape((self.size, -1)))
+                        for prop in self.interpolators if prop != 'gradient' or not self.energy_only}
+        self._masks = {prop: self.property_mask(prop) for prop in self._values}
 
-    def get_interpolators_from_file(self, filename, properties):
-        return {prop_name: self.db[prop_name].shape[1:] for prop_name in properties}
+    def _convert_crds(self, crds):
+        """convert a list of geometries into flattened descriptors"""
+        crds = self.descriptor.compute(crds)
+        return crds.reshape((len(crds), -1))
 
-    def _get_property(self, weights, prop):
-        entries = db[prop]
+    def _get_property(self, weights, idx, prop, squeeze=True):
+        """weighted sum over the neighbors, for all requested geometries"""
+        values = self._values[prop][idx].astype(np.double, copy=False)
+        mask = self._masks.get(prop)
+        if mask is None:
+            res = np.einsum('ik,ikj->ij', weights, values)
+        else:
+            # only the neighbors storing an entry contribute to it
+            mask = mask[idx]
+            norm = np.einsum('ik,ikj->ij', weights, mask)
+            res = np.einsum('ik,ikj->ij', weights, np.where(mask, values, 0.0))
+            res = np.divide(res, norm, out=np.zeros_like(res), where=norm > 0)
         shape = self.interpolators[prop]
-        res = np.zeros(shape, dtype=np.double)
-        for i, value in enumerate(entries):
-            res += weights[i]*value
-        res = res/np.sum(weights)
-        if shape == (1,):
-            return res[0]
-        return res
-
-    def _get_weights(self, crd, trust_radius=0.2):
-        """How to handle zero division error"""
-        exact_agreement = False
-        crds = db['crd']
-        size = len(crds)
-        if size == 0:
-            return None, False
+        if squeeze is True and shape == (1,):
+            return res[:, 0]
+        return res.reshape((len(res), *shape))
+
+    def _covered(self, idx, prop):
+        """entries of a property stored by at least one of the neighbors"""
+        covered = self._masks[prop][idx].any(axis=1)
+        return covered.reshape((len(covered), *self.interpolators[prop]))
+
+    @staticmethod
+    def _request_covered(request, value, covered):
+        if isinstance(value, StateData):
+            return bool(covered[request.states].all())
+        return bool(covered.all())
+
+    def _get_weights(self, crds):
+        """Compute the normalized weights of the nearest neighbors
+
+           geometries that agree exactly with an entry of the database
+           get exactly the value of that entry
+        """
+        if self.size == 0:
+            return None, None, None
         #
-        weights = np.zeros(size, dtype=np.double)
+        k = min(self.nneighbors, self.size)
+        dist, idx = self.neighbors(crds, k=k)
+        if k == 1:
+            dist = dist[:, np.newaxis]
+            idx = idx[:, np.newaxis]
         #
-        is_trustworthy = False
-        for i in range(size):
-            diff = np.linalg.norm((crd-crds[i]))**2
-            if diff < trust_radius:
-                is_trustworthy = True
-            if round(diff, 6) == 0:
-                exact_agreement = i
-            else:
-                weights[i] = 1./diff
-        if exact_agreement is False:
-            return weights, is_trustworthy
+        diff = dist**2
+        is_trustworthy = diff[:, 0] < self.trust_radius
+        exact = np.round(diff, 6) == 0
         #
-        weights.fill(0.0)
-        weights[exact_agreement] = 1.0
-        return weights, is_trustworthy
+        with np.errstate(divide='ignore'):
+            weights = 1.0/dist**self.power
+        has_exact = exact.any(axis=1)
+        weights[has_exact] = exact[has_exact]
+        weights /= np.sum(weights, axis=1)[:, np.newaxis]
+        return weights, idx, is_trustworthy
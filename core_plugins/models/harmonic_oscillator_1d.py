@@ -90,6 +90,16 @@ class HarmonicOscillator1D(Model):
         for i in range(self.npes):
             gradient[i] = np.array(self.w[i]*(x - self.x[i]))
         return gradient
+
+    def compute_batch(self, crds, properties, states):
+        """ energies and gradients at many positions crds (ngeom, 1) at once """
+        shift = np.asarray(crds, dtype=np.double) - np.array(self.x)
+        results = {}
+        if 'energy' in properties:
+            results['energy'] = 0.5*np.array(self.w)*shift**2 + np.array(self.e)
+        if 'gradient' in properties:
+            results['gradient'] = (np.array(self.w)*shift)[:, states, np.newaxis]
+        return results
          
 
     def get(self, request):
@@ -137,6 +137,11 @@ class Database(object):
         else:
             variable[:] = value
 
-    def __del__(self):
+    def close(self):
+        """close the underlying netCDF file"""
         if self._closed is False:
             self._db.close()
+            self._closed = True
+
+    def __del__(self):
+        self.close()
@@ -53,6 +53,12 @@ class PySurfDB(Database):
         epot      = double :: (frame, one)
         etot      = double :: (frame, one)
         nacs      = double :: (frame, nstates, nstates, natoms, three)
+        # masks of partial frames, 1 if the entry is stored
+        energy_mask   = int :: (frame, one)
+        gradient_mask = int :: (frame, nactive)
+        fosc_mask     = int :: (frame, one)
+        transmom_mask = int :: (frame, one)
+        nacs_mask     = int :: (frame, one)
     """)['variables']
 
     _variables_model = DatabaseGenerator("""
@@ -75,6 +81,11 @@ class PySurfDB(Database):
         epot      = double :: (frame, one)
         etot      = double :: (frame, one)
         nacs      = double :: (frame, nstates, nstates, nmodes)
+        # masks of partial frames, 1 if the entry is stored
+        energy_mask   = int :: (frame, one)
+        gradient_mask = int :: (frame, nactive)
+        fosc_mask     = int :: (frame, one)
+        nacs_mask     = int :: (frame, one)
     """)['variables']
 
     properties = ['energy', 'gradient', 'fosc',
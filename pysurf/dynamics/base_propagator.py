@@ -4,6 +4,7 @@ import numpy as np
 import time
 
 from ..spp import SurfacePointProvider
+from ..spp.server import SPPClient, is_server_socket
 from ..utils import exists_and_isfile
 from ..logger import get_logger
 
@@ -64,8 +65,10 @@ class PropagatorBase(PropagatorFactory):
 #               self.properties += [prop]
 
         self.init = sampling.get_condition(0)
-        # setup SPP
-        if sampling.model is False:
+        # setup SPP, or connect to a running SPP server
+        if is_server_socket(spp_inp):
+            self.spp = SPPClient(spp_inp)
+        elif sampling.model is False:
             self.spp = SurfacePointProvider.from_questions(self.properties, nstates, 
                                                            sampling.natoms,
                                                            nghost_states=nghost_states,
@@ -90,6 +93,8 @@ class PropagatorBase(PropagatorFactory):
             self.restart = False
 
         if restart is False: self.restart = False
+        # requests recycled between steps, by properties and states
+        self._requests = {}
 
         if self.restart is True:
             self.masses =  np.array(self.db['masses'])
@@ -101,6 +106,18 @@ class PropagatorBase(PropagatorFactory):
         self.t_converter = time_converter.get_converter(tin='au', tout='fs')
         self.output = get_logger('prop.out', 'propagator_output', mode=mode_output)
 
+    def request(self, crd, properties, states=None, same_crd=False):
+        """request data from the SPP, recycling the request of the previous step
+
+           The returned request is overwritten by the next call with the same
+           properties and states, copy data that has to be kept longer
+        """
+        key = (tuple(properties), None if states is None else tuple(states))
+        result = self.spp.request(crd, properties, states=states, same_crd=same_crd,
+                                  out=self._requests.get(key))
+        self._requests[key] = result
+        return result
+
     def create_new_db(self):
         name = 'prop.db'
         if exists_and_isfile(name): os.remove(name)
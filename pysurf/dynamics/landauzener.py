@@ -83,7 +83,7 @@ class LandauZener(PropagatorBase):
             crd = self.crd
         if gradstate is None:
             gradstate = self.iactive
-        res = self.spp.request(crd, self.properties, states=[gradstate], same_crd=same_crd)
+        res = self.request(crd, self.properties, states=[gradstate], same_crd=same_crd)
         return res
 
     def setup_new(self):
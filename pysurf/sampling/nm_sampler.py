@@ -161,6 +161,16 @@ class NMSampler(CrdSamplerBase):
         model = ModelFactory.plugin_from_config(config['from']['model'])
         return cls(config, system=model, modes=model.modes, start=start)
 
+    @classmethod
+    def from_spp(cls, config, spp, molecule, state=0, step=1e-3, from_gradient=True, start=0):
+        """Create the sampler from the finite-difference hessian of the SPP at the
+           geometry of the molecule"""
+        # imported here, as the finite differences use the normal modes of the sampling
+        from ..spp.finite_difference import FiniteDifference
+        modes = FiniteDifference(spp, step).normal_modes(molecule.crd, molecule.masses, state=state,
+                                                         from_gradient=from_gradient)
+        return cls(config, molecule, modes, start=start)
+
     def _check_modes(self):
         img = [mode.freq for mode in self.modes if mode.freq < 0.0]
         nimg_freq = len(img)
@@ -117,6 +117,16 @@ class Wigner(DynSamplerBase):
         """Create Wigner class from a analytic model"""
         return cls(model, model.modes, True)
 
+    @classmethod
+    def from_spp(cls, spp, molecule, state=0, step=1e-3, from_gradient=True):
+        """Create Wigner class from the finite-difference hessian of the SPP at the
+           geometry of the molecule"""
+        # imported here, as the finite differences use the normal modes of the sampling
+        from ..spp.finite_difference import FiniteDifference
+        modes = FiniteDifference(spp, step).normal_modes(molecule.crd, molecule.masses, state=state,
+                                                         from_gradient=from_gradient)
+        return cls(molecule, modes, True, is_massweighted=True)
+
     def to_mass_weighted(self):
         """transform normalmodes to massweighted"""
         if self.is_massweighted is True:
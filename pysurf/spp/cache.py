@@ -0,0 +1,236 @@
+"""Cache the results of an interface, keyed by the geometry
+
+The crds are rounded to a fixed number of decimals and hashed, all
+results computed at a geometry are kept in a single entry. Properties
+that are computed per state, e.g. the gradient, are cached per state,
+so a request is served partially from the cache and only the missing
+properties and states are computed by the interface.
+
+Entries are kept in an in-memory LRU and, optionally, in a folder on
+disk with one file per geometry, so that restarts and repeated runs
+reuse results of previous runs.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+#
+import numpy as np
+#
+from .request import Request, StateData
+
+
+class ResultCache:
+    """Cache in front of an interface, provides the same `get` method"""
+
+    def __init__(self, interface, size=1000, decimals=8, folder=None):
+        """
+            Parameters
+            ----------
+
+                interface:
+                    interface used to compute the requests
+
+                size: int, optional
+                    number of geometries kept in memory
+
+                decimals: int, optional
+                    crds are rounded to this number of decimals to form the key
+
+                folder: str, optional
+                    if set, the entries are also stored in this folder
+        """
+        self.interface = interface
+        self.size = size
+        self.decimals = decimals
+        self.folder = folder
+        if folder is not None:
+            os.makedirs(folder, exist_ok=True)
+        #
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        #
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # only provide a batch method, if the interface can compute batches
+        if hasattr(interface, 'get_batch'):
+            self.get_batch = self._get_batch
+
+    @property
+    def implemented(self):
+        return self.interface.implemented
+
+    @property
+    def hit_rate(self):
+        """fraction of requests served completely from the cache"""
+        nrequests = self.hits + self.partial_hits + self.misses
+        if nrequests == 0:
+            return 0.0
+        return self.hits / nrequests
+
+    def statistics(self):
+        return {'hits': self.hits, 'partial_hits': self.partial_hits, 'misses': self.misses,
+                'hit_rate': self.hit_rate}
+
+    def get(self, request):
+        """fill the request from the cache, compute missing properties"""
+        key = self.key(request.crd)
+        entry = self._lookup(key)
+        missing = self._missing(request, entry)
+        if missing is None:
+            self._count(request, entry, hit=True)
+            return self._fill(request, entry)
+        self._count(request, entry, hit=False)
+        result = self.interface.get(missing)
+        return self._fill(request, self._update(key, result))
+
+    def _get_batch(self, requests):
+        """fill all requests, missing properties are computed in a single batch"""
+        keys = [self.key(request.crd) for request in requests]
+        entries = [self._lookup(key) for key in keys]
+        missing = [self._missing(request, entry) for request, entry in zip(requests, entries)]
+        todo = [i for i, sub in enumerate(missing) if sub is not None]
+        for i, (request, entry) in enumerate(zip(requests, entries)):
+            self._count(request, entry, hit=(missing[i] is None))
+        if len(todo) != 0:
+            results = self.interface.get_batch([missing[i] for i in todo])
+            for i, result in zip(todo, results):
+                entries[i] = self._update(keys[i], result)
+        return [self._fill(request, entry) for request, entry in zip(requests, entries)]
+
+    def key(self, crd):
+        """hash of the rounded crds"""
+        crd = np.round(np.asarray(crd, dtype=np.double), self.decimals)
+        # adding zero removes negative zeros
+        crd = np.ascontiguousarray(crd + 0.0)
+        return hashlib.sha1(str(crd.shape).encode('utf-8') + crd.tobytes()).hexdigest()
+
+    def _count(self, request, entry, hit):
+        with self._lock:
+            if hit is True:
+                self.hits += 1
+            elif any(self._is_cached(prop, value, entry) for prop, value in request.items()):
+                self.partial_hits += 1
+            else:
+                self.misses += 1
+
+    @staticmethod
+    def _is_cached(prop, value, entry):
+        if prop not in entry:
+            return False
+        if isinstance(value, StateData):
+            return any(state in entry[prop] for state in value._states)
+        return True
+
+    def _missing(self, request, entry):
+        """request of the missing properties and states, None if everything is cached"""
+        properties = []
+        # state resolved properties are computed for the union of their missing states
+        missing_states = set()
+        for prop, value in request.items():
+            if isinstance(value, StateData):
+                missing = [state for state in request.states if state not in entry.get(prop, {})]
+                if len(missing) != 0:
+                    properties.append(prop)
+                    missing_states.update(missing)
+            elif prop not in entry:
+                properties.append(prop)
+        if len(properties) == 0:
+            return None
+        states = request.states
+        if len(missing_states) != 0:
+            states = [state for state in request.states if state in missing_states]
+        return Request(request.crd, properties, states, same_crd=request.same_crd)
+
+    def _fill(self, request, entry):
+        for prop, value in request.items():
+            # properties the interface did not provide are left untouched
+            if prop not in entry:
+                continue
+            if isinstance(value, StateData):
+                request.set(prop, {state: entry[prop][state] for state in request.states
+                                   if state in entry[prop]})
+            else:
+                # copied, so that changes of the request do not change the cache
+                request.set(prop, np.array(entry[prop]))
+        return request
+
+    def _update(self, key, result):
+        """add the results of a computed request to the entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load(key)
+            for prop, value in result.items():
+                if value is None:
+                    continue
+                if isinstance(value, StateData):
+                    states = entry.setdefault(prop, {})
+                    for state in result.states:
+                        states[state] = np.array(value[state])
+                else:
+                    entry[prop] = np.array(value)
+            self._insert(key, entry)
+        if self.folder is not None:
+            self._save(key, entry)
+        return entry
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+            entry = self._load(key)
+            if len(entry) != 0:
+                self._insert(key, entry)
+            return entry
+
+    def _insert(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def _filename(self, key):
+        return os.path.join(self.folder, f'{key}.npz')
+
+    def _load(self, key):
+        """load an entry from disk, state resolved properties are stored as `prop:state`"""
+        if self.folder is None or not os.path.isfile(self._filename(key)):
+            return {}
+        entry = {}
+        with np.load(self._filename(key)) as data:
+            for name in data.files:
+                prop, _, state = name.partition(':')
+                if state == '':
+                    entry[prop] = data[name]
+                else:
+                    entry.setdefault(prop, {})[int(state)] = data[name]
+        return entry
+
+    def _save(self, key, entry):
+        arrays = {}
+        for prop, value in entry.items():
+            if isinstance(value, dict):
+                for state, data in value.items():
+                    arrays[f'{prop}:{state}'] = data
+            else:
+                arrays[prop] = value
+        # write to a temporary file first, so that other processes never see a partial entry
+        tmpfile = f"{self._filename(key)}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmpfile, **arrays)
+        os.replace(tmpfile, self._filename(key))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state.pop('get_batch', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        if hasattr(self.interface, 'get_batch'):
+            self.get_batch = self._get_batch
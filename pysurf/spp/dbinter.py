@@ -1,3 +1,6 @@
+import os
+import json
+import hashlib
 from abc import abstractmethod
 #
 from scipy.spatial.distance import cdist, pdist
@@ -5,6 +8,11 @@ import numpy as np
 
 from ..database.pysurf_db import PySurfDB
 from ..utils.osutils import exists_and_isfile
+from .descriptors import descriptors, get_descriptor, DistanceDescriptor, DescriptorStore
+from .neighbors import indices, get_neighbor_index
+from .storage import WeightStorage, nbytes
+from .request import StateData
+from .modelfile import save_model, load_model, read_header, fingerprint, ModelFileError
 # logger
 from ..logger import get_logger
 #
@@ -18,7 +26,7 @@ def internal(crd):
 
 
 def internal_coordinates(crds):
-    return np.array([internal(crd) for crd in crds])
+    return DistanceDescriptor().compute(crds)
 
 
 class InterpolatorFactory(Plugin):
@@ -36,7 +44,19 @@ class Interpolator(InterpolatorFactory):
     interpolator = RbfInterpolator :: str
     # if true: compute gradient numerically
     energy_only = False :: bool
-    crdmode = internal :: str :: [internal, cartesian]
+    # descriptor used for the interpolation: [internal, cartesian, inverse, cutoff, sorted, symmetric]
+    # sorted and symmetric are invariant under the exchange of identical atoms
+    crdmode = internal :: str
+    # nearest neighbor search used for the neighbor and trust radius queries: [exact, rpforest]
+    # rpforest is an approximate search, that scales better for large descriptors
+    nn_index = exact :: str
+    # folder, in which trained models are stored under the fingerprint of the training set,
+    # a matching model is loaded instead of training the interpolator
+    model_cache = :: folder, optional
+    # precision used to store weights and descriptors, computations are done in double precision
+    precision = double :: str :: [double, single]
+    # folder for memory mapped weights, if set the weights are kept out of core
+    out_of_core = :: folder, optional
     """
 
     _register_plugin = False
@@ -46,22 +66,35 @@ class Interpolator(InterpolatorFactory):
         questions.generate_cases("interpolator",
                                  {name: interpolator.colt_user_input
                                   for name, interpolator in cls.plugins.items()})
+        questions.generate_cases("crdmode",
+                                 {name: descriptor.colt_user_input
+                                  for name, descriptor in descriptors.items()})
+        questions.generate_cases("nn_index",
+                                 {name: index.colt_user_input
+                                  for name, index in indices.items()})
     
     @classmethod
-    def setup_from_config(cls, config, db, properties, logger):
+    def setup_from_config(cls, config, db, properties, logger, atomids=None):
         return InterpolatorFactory.plugin_from_config(config['interpolator'], db,
                                                     properties,
                                                     logger=logger,
                                                     energy_only=config['energy_only'],
                                                     weightsfile=config['weights_file'],
-                                                    crdmode=config['crdmode'],
-                                                    fit_only=config['fit_only'])
+                                                    crdmode=get_descriptor(config['crdmode'], atomids),
+                                                    fit_only=config['fit_only'],
+                                                    nn_index=get_neighbor_index(config['nn_index']),
+                                                    model_cache=config['model_cache'],
+                                                    storage=WeightStorage(config['precision'],
+                                                                          config['out_of_core']))
     
     @classmethod
-    def from_config(cls, config, db, properties, logger, energy_only, weightsfile, crdmode, fit_only):
-        return cls(db, properties, logger, energy_only, weightsfile, crdmode, fit_only)
+    def from_config(cls, config, db, properties, logger, energy_only, weightsfile, crdmode, fit_only,
+                    nn_index=None, model_cache=None, storage=None):
+        return cls(db, properties, logger, energy_only, weightsfile, crdmode, fit_only, nn_index, model_cache,
+                   storage)
 
-    def __init__(self, db, properties, logger, energy_only=False, weightsfile=None, crdmode=False, fit_only=False):
+    def __init__(self, db, properties, logger, energy_only=False, weightsfile=None, crdmode=False, fit_only=False,
+                 nn_index=None, model_cache=None, storage=None):
         """important for ShepardInterpolator to set db first!"""
         #
         self.crds = None
@@ -72,18 +105,42 @@ class Interpolator(InterpolatorFactory):
         self.fit_only = fit_only
         self.weightsfile = weightsfile
         self.properties = properties
+        if storage is None:
+            storage = WeightStorage()
+        self.storage = storage
         #
-        self.crdmode = crdmode
+        # atomids are only needed for permutation invariant descriptors
+        # given as string, they are taken from the database
+        atomids = np.copy(db['atomids']) if 'atomids' in db else None
+        self.descriptor = get_descriptor(crdmode, atomids)
+        self.crdmode = self.descriptor.name
+        if self.crdmode == 'cartesian':
+            self.store = None
+        else:
+            self.store = DescriptorStore(db, self.descriptor, dtype=storage.dtype)
         self.crds = self.get_crd()
+        # the index is (re)build lazily, when the number of crds changed
+        self.index = get_neighbor_index(nn_index)
+        self._index_size = None
+        self._fingerprint = None
+        self._coverage = None
         #
         if energy_only is True:
             properties = [prop for prop in properties if prop != 'gradient']
+        # without weights file, the model is stored in the cache
+        self.model_cache = model_cache
+        if weightsfile in (None, '') and model_cache is not None:
+            weightsfile = self.cached_model_file(properties)
         #
         if exists_and_isfile(weightsfile):
-            print('weightsfile', weightsfile)
             self.interpolators = self.get_interpolators_from_file(weightsfile, properties)
         else:
+            self.interpolators = None
+        #
+        if self.interpolators is None:
             self.interpolators, self.size = self.get_interpolators(db, properties)
+        else:
+            self.size = len(db)
         #
         if energy_only is True:
             self.interpolators['gradient'] = self.finite_difference_gradient
@@ -91,11 +148,10 @@ class Interpolator(InterpolatorFactory):
         self.train(weightsfile)
 
     def get_crd(self):
-        if self.crdmode == 'internal':
-            crds = internal_coordinates(np.copy(self.db['crd']))
-        else:
-            crds = np.copy(self.db['crd'])
-        return crds
+        """descriptors of all geometries in the database"""
+        if self.store is not None:
+            return self.store.update()
+        return np.array(self.db['crd']).astype(self.storage.dtype)
 
     @abstractmethod
     def get(self, request):
@@ -104,35 +160,219 @@ class Interpolator(InterpolatorFactory):
            Return request and if data is trustworthy or not
         """
 
+    def get_batch(self, requests):
+        """fill a list of requests
+
+           Return requests and an array stating if the data is trustworthy or not
+        """
+        results = [self.get(request) for request in requests]
+        return ([request for request, _ in results],
+                np.array([is_trustworthy for _, is_trustworthy in results], dtype=bool))
+
     @abstractmethod
     def get_interpolators(self, db, properties):
         """ """
 
     @abstractmethod
-    def save(self, filename):
-        """Save weights"""
+    def get_weights(self):
+        """Return dict of the arrays that define the trained interpolators"""
 
     @abstractmethod
-    def get_interpolators_from_file(self, filename, properties):
-        """setup interpolators from file"""
+    def set_weights(self, arrays, metadata):
+        """set trained interpolators from the arrays and metadata of a model file"""
 
     @abstractmethod
     def _train(self):
         """train the interpolators using the existing data"""
 
-    @abstractmethod
+    @property
+    def hyperparameters(self):
+        """settings that change the trained interpolators, saved in the model file"""
+        return {}
+
+    @property
+    def fitted_properties(self):
+        """properties that are not computed by finite differences"""
+        return [prop for prop in self.interpolators
+                if not (prop == 'gradient' and self.energy_only is True)]
+
+    def property_mask(self, prop):
+        """entries of a property stored in the database, shape (nframes, ncolumns)
+
+           Returns None, if the database stores complete frames
+        """
+        name = mask_name(prop)
+        if name not in self.db:
+            return None
+        mask = np.array(self.db[name]).astype(bool)
+        if mask.all():
+            return None
+        # masks are stored per frame or per state
+        ncolumns = int(np.prod(self.db[prop].shape[1:]))
+        return np.repeat(mask, ncolumns // mask.shape[1], axis=1)
+
+    def covered(self, request, crd, radius, p=2):
+        """check that every requested entry is stored by a frame within the radius
+
+           Only relevant for partial frames, entries that no frame close to
+           the descriptor crd stores are not interpolated, but zero
+        """
+        masks = self._coverage_masks()
+        properties = [prop for prop in request if prop in masks]
+        if len(properties) == 0:
+            return True
+        centers = self.crds.reshape((len(self.crds), -1)).astype(np.double, copy=False)
+        close = np.linalg.norm(centers - np.ravel(crd), ord=p, axis=1) < radius
+        for prop in properties:
+            covered = masks[prop][:len(centers)][close].any(axis=0).reshape(self.db[prop].shape[1:])
+            if isinstance(request[prop], StateData):
+                covered = covered[request.states]
+            if not covered.all():
+                return False
+        return True
+
+    def _coverage_masks(self):
+        """masks of the fitted properties stored in partial frames, cached until the database grows"""
+        if self._coverage is None or self._coverage[0] != len(self.db):
+            masks = {prop: self.property_mask(prop) for prop in self.fitted_properties}
+            self._coverage = (len(self.db), {prop: mask for prop, mask in masks.items()
+                                             if mask is not None})
+        return self._coverage[1]
+
+    def column_groups(self, prop):
+        """group the columns of a property by the frames that store them
+
+           Returns None, if the database stores complete frames,
+           else a list of the frames (bool mask) and the indices of their columns
+        """
+        mask = self.property_mask(prop)
+        if mask is None:
+            return None
+        groups = {}
+        for icolumn, frames in enumerate(mask.T):
+            groups.setdefault(frames.tobytes(), (frames, []))[1].append(icolumn)
+        return [(frames, np.array(columns)) for frames, columns in groups.values()]
+
+    def training_fingerprint(self):
+        """fingerprint of the training set, cached until the size of the database changes"""
+        if self._fingerprint is None or self._fingerprint['nframes'] != len(self.db):
+            self._fingerprint = fingerprint(self.db)
+        return self._fingerprint
+
+    def model_metadata(self, properties=None):
+        """metadata stored in the model file"""
+        if properties is None:
+            properties = self.fitted_properties
+        metadata = {'interpolator': self.__class__.__name__,
+                    'properties': {prop: list(self.db[prop].shape[1:]) for prop in properties},
+                    'hyperparameters': self.hyperparameters,
+                    'descriptor': {'name': self.descriptor.name, 'tag': self.descriptor.tag},
+                    'precision': self.storage.precision,
+                    'fingerprint': self.training_fingerprint()}
+        # compare metadata after the json round trip
+        return json.loads(json.dumps(metadata))
+
+    def memory_usage(self):
+        """bytes of descriptors and weights held in memory and memory mapped"""
+        return nbytes([self.crds, *self.get_weights().values()])
+
+    def model_key(self, properties=None):
+        """hash of the interpolator, its hyperparameters, the descriptor and the training set"""
+        metadata = json.dumps(self.model_metadata(properties), sort_keys=True)
+        return hashlib.sha256(metadata.encode('utf-8')).hexdigest()
+
+    def cached_model_file(self, properties=None):
+        """name of the model in the cache, that belongs to the current training set"""
+        os.makedirs(self.model_cache, exist_ok=True)
+        return os.path.join(self.model_cache,
+                            f"{self.__class__.__name__}_{self.model_key(properties)}.model")
+
+    def check_model_file(self, filename, properties=None):
+        """check that a model file belongs to the interpolator and its training set
+
+           Return True if the file can be used, else False
+        """
+        try:
+            header, _ = read_header(filename)
+        except ModelFileError as error:
+            self.logger.warning(f"Cannot use weights file: {error}")
+            return False
+        metadata = header['metadata']
+        expected = self.model_metadata(properties)
+        for key in ('interpolator', 'hyperparameters', 'descriptor', 'precision', 'fingerprint'):
+            if metadata.get(key) != expected[key]:
+                self.logger.warning(f"Weights file '{filename}' does not fit the current setup, "
+                                    f"different {key}")
+                return False
+        if any(metadata['properties'].get(prop) != shape for prop, shape in expected['properties'].items()):
+            self.logger.warning(f"Weights file '{filename}' does not contain all properties")
+            return False
+        return True
+
+    def save(self, filename):
+        """Save weights to a model file"""
+        save_model(filename, self.get_weights(), self.model_metadata())
+
+    def get_interpolators_from_file(self, filename, properties):
+        """setup interpolators, whose weights are loaded from file
+
+           Returns None, if the file does not fit to the interpolator
+        """
+        if not self.check_model_file(filename, properties):
+            return None
+        return self.get_interpolators(self.db, properties)[0]
+
     def loadweights(self, filename):
-        """load weights from file"""
+        """load weights from a model file
+
+           Return True if the weights were loaded, else False
+        """
+        if not self.check_model_file(filename):
+            return False
+        arrays, metadata = load_model(filename)
+        self.set_weights(arrays, metadata)
+        return True
+
+    def neighbors(self, crds, k=1, p=2):
+        """k nearest neighbors of descriptors among the crds of the interpolator
+
+           Returns distances and indices, same conventions as `scipy.spatial.cKDTree.query`
+        """
+        if self._index_size != len(self.crds):
+            self.index.build(self.crds)
+            self._index_size = len(self.crds)
+        return self.index.query(crds, k=k, p=p)
+
+    def within_trust_radius(self, crd, radius, radius_ci=None):
+        """same as `within_trust_radius`, but using the nearest neighbor index
+
+           Return distance to the closest crd and if the crd is within the trust radius
+        """
+        dist, _ = self.neighbors(np.ravel(crd))
+        if radius_ci is not None:
+            return dist, (bool(dist < radius), bool(dist < radius_ci))
+        return dist, bool(dist < radius)
 
     def train(self, filename=None, always=False):
+        """train the interpolators, if the weights can not be loaded from file
+
+           Parameters
+           ----------
+               filename: str, optional
+                   model file, to load the weights from and save them to
+
+               always: bool, optional
+                   if True, do not load weights, but always train
+        """
+        self._index_size = None
         if filename == '':
             filename = None
-        # train normally
-        if exists_and_isfile(filename):
-            self.loadweights(filename)
-            return
-        else:
-            self._train()
+        # load weights, if they belong to the current training set
+        if always is False and exists_and_isfile(filename):
+            if self.loadweights(filename) is True:
+                self.logger.info(f"Weights loaded from '{filename}'")
+                return
+        self._train()
         # save weights
         if filename is not None:
             self.save(filename)
@@ -141,41 +381,38 @@ class Interpolator(InterpolatorFactory):
         """update weights of the interpolator"""
         self.train()
 
+    def append(self, request):
+        """add a newly computed point to the interpolator,
+           by default only its descriptor is stored and the point
+           is used after the next training"""
+        if self.store is not None:
+            self.store.update()
+
+    def predict_energy(self, crds):
+        """energies for a batch of descriptors, shape (ngeom, nstates)
+
+           Plugins overwrite this with a vectorized version, the
+           default calls the energy interpolator for each descriptor
+        """
+        energy = self.interpolators['energy']
+        return np.array([energy(crd, None) for crd in crds])
+
     def finite_difference_gradient(self, crd, request, dq=0.01):
         """compute the gradient of the energy  with respect to a crd
            displacement using finite difference method
+
+           All displaced geometries are interpolated in a single batch,
+           the request is not modified
         """
-        crd = request.crd
-        grad = np.zeros((self.nstates, crd.size), dtype=float)
-        #
-        shape = crd.shape
-        crd.resize(crd.size)
-        #
-        energy = self.interpolators['energy']
-        # do loop
-        for i in range(crd.size):
-            # first add dq
-            crd[i] += dq
-            if self.crdmode == 'internal':
-                crd_here = internal(crd.reshape(shape))
-            else:
-                crd_here = crd
-            en1 = energy(crd_here, request)
-            # first subtract 2*dq
-            crd[i] -= 2*dq
-            if self.crdmode == 'internal':
-                crd_here = internal(crd.reshape(shape))
-            else:
-                crd_here = crd
-            en2 = energy(crd_here, request)
-            # add dq to set crd to origional
-            crd[i] += dq
-            # compute gradient
-            grad[:,i] = (en1 - en2)/(2.0*dq)
-        # return gradient
-        crd.resize(shape)
-        grad.resize((self.nstates, *shape))
-        return grad
+        ref = np.array(request.crd, dtype=np.double)
+        ncrd = ref.size
+        # geometries displaced by +dq and -dq along every coordinate
+        displacement = dq*np.identity(ncrd)
+        crds = np.concatenate((ref.ravel() + displacement, ref.ravel() - displacement))
+        energies = self.predict_energy(self.descriptor.compute(crds.reshape((2*ncrd, *ref.shape))))
+        energies = np.reshape(energies, (2*ncrd, self.nstates))
+        grad = (energies[:ncrd] - energies[ncrd:]).T/(2.0*dq)
+        return grad.reshape((self.nstates, *ref.shape))
 
 
 class DataBaseInterpolation(Colt):
@@ -187,6 +424,9 @@ class DataBaseInterpolation(Colt):
     _user_input = """
         # additional properties to be fitted
         properties = :: list, optional
+        # store partial frames: only the requested properties and states are computed,
+        # masks in the database mark the stored entries
+        partial_frames = False :: bool
         # only write
         write_only = yes :: str :: [yes, no]
         # name of the database
@@ -203,10 +443,13 @@ class DataBaseInterpolation(Colt):
 #        questions.generate_block("interpolator", Interpolator.questions)
 
     @classmethod
-    def from_config(cls, config, interface, natoms, nstates, properties, model=False, logger=None):
-        return cls(interface, config, natoms, nstates, properties, model=model, logger=logger)
+    def from_config(cls, config, interface, natoms, nstates, properties, model=False, logger=None,
+                    atomids=None):
+        return cls(interface, config, natoms, nstates, properties, model=model, logger=logger,
+                   atomids=atomids)
 
-    def __init__(self, interface, config, natoms, nstates, properties, model=False, logger=None):
+    def __init__(self, interface, config, natoms, nstates, properties, model=False, logger=None,
+                 atomids=None):
         """ """
         self.config = config
         if logger is None:
@@ -215,7 +458,7 @@ class DataBaseInterpolation(Colt):
             self.logger = logger
         #
         self.write_only = config['write_only']
-
+        self.partial_frames = config['partial_frames']
         #
         self._interface = interface
         #
@@ -225,20 +468,24 @@ class DataBaseInterpolation(Colt):
         if config['properties'] is not None:
             properties += config['properties']
         properties += ['crd']
+        if self.partial_frames is True:
+            properties += [mask_name(prop) for prop in properties if prop != 'crd']
         # setup database
         self._db = self._create_db(properties, natoms, nstates, model=model, filename=config['database'])
         self._parameters = get_fitting_size(self._db)
-        properties = [prop for prop in properties if prop != 'crd']
+        properties = [prop for prop in properties if prop != 'crd' and not prop.endswith('_mask')]
         self.properties = properties
         if config['write_only'] == 'no':
             self.interpolator = Interpolator.setup_from_config(config['write_only'], self._db,
                                                     properties,
-                                                    logger=self.logger)
+                                                    logger=self.logger,
+                                                    atomids=atomids)
             self.fit_only = self.interpolator.fit_only
             #
             if self.write_only is True and self.fit_only is True:
                 raise Exception("Can only write or fit")
         else:
+            self.interpolator = None
             self.write_only = True
             self.fit_only = False
 
@@ -247,13 +494,66 @@ class DataBaseInterpolation(Colt):
         """Get result of request and append it to the database"""
         #
         result = self._interface.get(request)
-        #
-        for prop, value in result.iter_data():
-            self._db.append(prop, value)
+        self._append(result)
+        return result
+
+    def get_qm_batch(self, requests):
+        """Get results of many requests and append them to the database"""
+        get_batch = getattr(self._interface, 'get_batch', None)
+        if get_batch is None:
+            return [self.get_qm(request) for request in requests]
+        results = get_batch(requests)
+        for result in results:
+            self._append(result)
+        return results
+
+    def _append(self, result):
+        """append a computed result to the database"""
+        if self.partial_frames is True:
+            self._append_partial(result)
+        else:
+            for prop, value in result.iter_data():
+                self._db.append(prop, value)
         self._db.append('crd', result.crd)
         #
         self._db.increase
-        return result
+        if self.interpolator is not None:
+            self.interpolator.append(result)
+
+    def _append_partial(self, result):
+        """append the computed entries of a result, missing entries are masked"""
+        for prop in self.properties:
+            value = np.zeros(self._db[prop].shape[1:], dtype=np.double)
+            mask = np.zeros(self._db[mask_name(prop)].shape[1:], dtype=int)
+            data = result[prop] if prop in result else None
+            if isinstance(data, StateData):
+                for state in result.states:
+                    value[state] = data[state]
+                    mask[state] = 1
+            elif data is not None:
+                value[...] = np.reshape(data, value.shape)
+                mask[...] = 1
+            self._db.append(prop, value)
+            self._db.append(mask_name(prop), mask)
+
+    def get_batch(self, requests):
+        """answer many requests, all interpolations are done in a single batch"""
+        if self.write_only is True:
+            return self.get_qm_batch(requests)
+        results, is_trustworthy = self.interpolator.get_batch(requests)
+        if self.fit_only is True:
+            if not np.all(is_trustworthy):
+                self.logger.warning(f'{np.sum(~is_trustworthy)} interpolated results not trustworthy, '
+                                    'but used as fit_only is True')
+            return results
+        # do qm calculations
+        untrusted = np.flatnonzero(~is_trustworthy)
+        if len(untrusted) > 0:
+            self.logger.info(f'{len(untrusted)} of {len(results)} interpolated results are not '
+                             'trustworthy and QM calculations are started')
+            for i, result in zip(untrusted, self.get_qm_batch([requests[i] for i in untrusted])):
+                results[i] = result
+        return results
 
     def get(self, request):
         """answer request"""
@@ -291,6 +591,11 @@ class DataBaseInterpolation(Colt):
         return PySurfDB.generate_database(filename, data=data, dimensions={'nmodes': natoms, 'nstates': nstates, 'nactive': nstates}, model=model)
 
 
+def mask_name(prop):
+    """name of the mask of a property in the database"""
+    return f'{prop}_mask'
+
+
 def get_fitting_size(db):
     """We only fit unlimeted data"""
     out = {}
@@ -311,14 +616,7 @@ def get_fitting_size(db):
 def within_trust_radius(crd, crds, radius, metric='euclidean', radius_ci=None):
     is_trustworthy_general = False
     is_trustworthy_CI = False
-    shape = crds.shape
-    crd_shape = crd.shape
-    crd.resize((1, crd.size))
-    if len(shape) == 3:
-        crds.resize((shape[0], shape[1]*shape[2]))
-    dist = cdist(crd, crds, metric=metric)
-    crds.resize(shape)
-    crd.resize(crd_shape)
+    dist = cdist(np.reshape(crd, (1, -1)), np.reshape(crds, (len(crds), -1)), metric=metric)
     if np.min(dist) < radius:
         is_trustworthy_general = True
     if radius_ci is not None:
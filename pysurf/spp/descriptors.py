@@ -0,0 +1,295 @@
+"""Descriptors (coordinate transformations) used by the interpolators
+
+The descriptors of the geometries in the database are computed in
+vectorized batches and stored next to the database, so that they only
+need to be computed once for every frame.
+"""
+from abc import abstractmethod
+import os
+#
+import numpy as np
+#
+from colt import Colt
+#
+from ..database.database import Database
+from ..database.dbtools import DBVariable
+
+
+class Descriptor(Colt):
+    """Base class of all descriptors"""
+
+    _user_input = ""
+    #
+    name = None
+    # descriptors that need to know which atoms are identical
+    needs_atomids = False
+
+    @classmethod
+    def from_config(cls, config, atomids=None):
+        if cls.needs_atomids is True:
+            return cls(atomids)
+        return cls()
+
+    @property
+    def tag(self):
+        """unique identifier of the descriptor and its settings"""
+        return self.name
+
+    @abstractmethod
+    def compute(self, crds):
+        """compute the descriptors for a set of geometries
+
+           Parameters
+           ----------
+               crds: array
+                   geometries, shape (ngeom, *crd.shape)
+
+           Returns
+           -------
+               array of shape (ngeom, ndescriptor)
+        """
+
+    def __call__(self, crd):
+        """compute the descriptor of a single geometry"""
+        return self.compute(np.asarray(crd)[np.newaxis])[0]
+
+
+class CartesianDescriptor(Descriptor):
+    """Use the coordinates as they are"""
+
+    name = 'cartesian'
+
+    def compute(self, crds):
+        return np.array(crds, dtype=np.double)
+
+
+class DistanceDescriptor(Descriptor):
+    """All interatomic distances, in the same order as `scipy.spatial.distance.pdist`"""
+
+    name = 'internal'
+
+    def compute(self, crds):
+        crds = np.asarray(crds, dtype=np.double)
+        i, j = np.triu_indices(crds.shape[1], k=1)
+        return np.linalg.norm(crds[:, i] - crds[:, j], axis=-1)
+
+
+class InverseDistanceDescriptor(DistanceDescriptor):
+    """All inverse interatomic distances"""
+
+    name = 'inverse'
+
+    def compute(self, crds):
+        return 1.0/super().compute(crds)
+
+
+class CutoffDescriptor(DistanceDescriptor):
+    """Inverse interatomic distances, smoothly switched off at the cutoff radius
+
+       Pairs further apart than the cutoff do not contribute, which keeps the
+       descriptor local for larger systems.
+    """
+
+    name = 'cutoff'
+
+    _user_input = """
+        # cutoff radius in the units of the coordinates
+        cutoff = 10.0 :: float
+    """
+
+    @classmethod
+    def from_config(cls, config, atomids=None):
+        return cls(config['cutoff'])
+
+    def __init__(self, cutoff=10.0):
+        self.cutoff = cutoff
+
+    @property
+    def tag(self):
+        return f"{self.name}{self.cutoff}"
+
+    def compute(self, crds):
+        dist = super().compute(crds)
+        switch = 0.5*(np.cos(np.pi*np.minimum(dist, self.cutoff)/self.cutoff) + 1.0)
+        return switch/dist
+
+
+class PermutationInvariantDescriptor(DistanceDescriptor):
+    """Base class for descriptors that are invariant under the exchange of identical atoms
+
+       The atom pairs are grouped into classes of the same pair of elements,
+       e.g. all C-H distances, and every class is mapped independently of
+       the ordering of its pairs.
+    """
+
+    needs_atomids = True
+
+    def __init__(self, atomids):
+        if atomids is None:
+            raise ValueError(f"Descriptor '{self.name}' needs the atomids of the molecule")
+        self.atomids = [str(atomid) for atomid in atomids]
+        self.classes = self._setup_classes(self.atomids)
+
+    @property
+    def tag(self):
+        composition = ''.join(f"{atomid}{self.atomids.count(atomid)}"
+                              for atomid in sorted(set(self.atomids)))
+        return f"{self.name}_{composition}"
+
+    @staticmethod
+    def _setup_classes(atomids):
+        """indices of the atom pairs (in pdist order) for each pair of elements"""
+        classes = {}
+        i, j = np.triu_indices(len(atomids), k=1)
+        for ipair, (iatom, jatom) in enumerate(zip(i, j)):
+            key = tuple(sorted((atomids[iatom], atomids[jatom])))
+            classes.setdefault(key, []).append(ipair)
+        return [np.array(classes[key], dtype=int) for key in sorted(classes)]
+
+
+class SortedDistanceDescriptor(PermutationInvariantDescriptor):
+    """Interatomic distances, sorted within every class of element pairs"""
+
+    name = 'sorted'
+
+    def compute(self, crds):
+        dist = super().compute(crds)
+        return np.concatenate([np.sort(dist[:, idx], axis=1) for idx in self.classes], axis=1)
+
+
+class SymmetricPolynomialDescriptor(PermutationInvariantDescriptor):
+    """Power sums of the inverse interatomic distances within every class of element pairs
+
+       Contrary to sorting, the power sums are smooth functions of the coordinates.
+    """
+
+    name = 'symmetric'
+
+    _user_input = """
+        # highest power used for the power sums
+        order = 3 :: int
+    """
+
+    @classmethod
+    def from_config(cls, config, atomids=None):
+        return cls(atomids, config['order'])
+
+    def __init__(self, atomids, order=3):
+        super().__init__(atomids)
+        self.order = order
+
+    @property
+    def tag(self):
+        return f"{super().tag}_{self.order}"
+
+    def compute(self, crds):
+        inverse = 1.0/super().compute(crds)
+        powers = np.arange(1, self.order+1)
+        return np.concatenate([np.sum(inverse[:, idx, np.newaxis]**powers, axis=1)
+                               for idx in self.classes], axis=1)
+
+
+descriptors = {descriptor.name: descriptor
+               for descriptor in (DistanceDescriptor, CartesianDescriptor,
+                                  InverseDistanceDescriptor, CutoffDescriptor,
+                                  SortedDistanceDescriptor, SymmetricPolynomialDescriptor)}
+
+
+def get_descriptor(crdmode, atomids=None):
+    """get descriptor from a crdmode, which can be a name, a config or a Descriptor"""
+    if isinstance(crdmode, Descriptor):
+        return crdmode
+    if crdmode in (None, False):
+        return CartesianDescriptor()
+    if isinstance(crdmode, str):
+        descriptor = descriptors[crdmode]
+        if descriptor.needs_atomids is True:
+            return descriptor(atomids)
+        return descriptor()
+    return descriptors[crdmode.value].from_config(crdmode, atomids)
+
+
+class DescriptorStore:
+    """Descriptors of all frames of a database, persisted in a separate file
+
+       The descriptors are appended incrementally, only frames that were added
+       to the database since the last update are computed.
+    """
+
+    batch_size = 10000
+
+    def __init__(self, db, descriptor, filename=None, dtype=np.double):
+        self.db = db
+        self.descriptor = descriptor
+        # precision of the descriptors in memory, on file they are stored in double precision
+        self.dtype = dtype
+        if filename is None:
+            filename = f"{db.filename}.{descriptor.tag}.desc"
+        self.filename = filename
+        self._store = None
+        self._data = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def data(self):
+        """descriptors of all frames in the database"""
+        return self.update()
+
+    def update(self):
+        """compute the descriptors of all frames, that are not yet stored"""
+        ndb = len(self.db)
+        if self._store is None:
+            if ndb == 0:
+                return np.empty((0, 0), dtype=self.dtype)
+            self._load(self._compute(0, 1).shape[1])
+        #
+        if self._size > ndb:
+            self._reset()
+        for start in range(self._size, ndb, self.batch_size):
+            end = min(start + self.batch_size, ndb)
+            self._append(self._compute(start, end))
+        return self._data[:self._size]
+
+    def _compute(self, start, end):
+        return self.descriptor.compute(np.array(self.db['crd'][start:end]))
+
+    def _load(self, ndescriptor):
+        """load descriptors from file, if they agree with the database"""
+        settings = {'dimensions': {'frame': 'unlimited', 'ndescriptor': ndescriptor},
+                    'variables': {'descriptor': DBVariable(np.double, ('frame', 'ndescriptor'))}}
+        try:
+            self._store = Database(self.filename, settings)
+        except Exception:
+            os.remove(self.filename)
+            self._store = Database(self.filename, settings)
+        self._data = np.array(self._store['descriptor']).astype(self.dtype, copy=False)
+        self._size = len(self._data)
+        # check that the last stored descriptor belongs to the database
+        if self._size > 0:
+            if (self._size > len(self.db)
+                    or not np.allclose(self._data[-1], self._compute(self._size-1, self._size)[0])):
+                self._reset()
+
+    def _reset(self):
+        """remove all stored descriptors"""
+        settings = {'variables': self._store.dbrep.variables,
+                    'dimensions': self._store.dbrep.dimensions}
+        self._store.close()
+        os.remove(self.filename)
+        self._store = Database(self.filename, settings)
+        self._data = np.empty((0, settings['dimensions']['ndescriptor']), dtype=self.dtype)
+        self._size = 0
+
+    def _append(self, values):
+        """append descriptors to the file and the in memory buffer"""
+        start, end = self._size, self._size + len(values)
+        self._store.set('descriptor', values, slice(start, end))
+        if end > len(self._data):
+            buffer = np.empty((max(end, 2*len(self._data)), values.shape[1]), dtype=self.dtype)
+            buffer[:start] = self._data[:start]
+            self._data = buffer
+        self._data[start:end] = values
+        self._size = end
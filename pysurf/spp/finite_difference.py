@@ -0,0 +1,188 @@
+"""Finite-difference gradients, hessians and normal modes through the SurfacePointProvider
+
+All displaced geometries are generated at once and computed with
+`SurfacePointProvider.request_many`, so interfaces with a `get_batch`
+method compute them in a single call and all others distribute them
+over the executor of the SPP.
+
+The normal modes are returned in the mass-weighted format used by
+`Wigner` and `NMSampler`.
+"""
+import numpy as np
+#
+from ..sampling.normalmodes import Mode
+
+
+class FiniteDifference:
+    """Central finite differences of the properties of a SurfacePointProvider"""
+
+    def __init__(self, spp, step=1e-3):
+        """
+            Parameters
+            ----------
+
+                spp: SurfacePointProvider
+                    provider used to compute the displaced geometries
+
+                step: float, optional
+                    displacement of a single coordinate
+        """
+        self.spp = spp
+        self.step = step
+
+    def displacements(self, crd):
+        """all 2*ncrd geometries displaced by +step and -step along a single coordinate
+
+           Returns
+           -------
+               np.ndarray (2*ncrd, *crd.shape), ordered +step, -step for each coordinate
+        """
+        crd = np.asarray(crd, dtype=np.double)
+        ncrd = crd.size
+        shifts = np.zeros((ncrd, 2, ncrd))
+        shifts[:, 0] = np.eye(ncrd) * self.step
+        shifts[:, 1] = -np.eye(ncrd) * self.step
+        return crd.reshape(-1) + shifts.reshape((2*ncrd, ncrd))
+
+    def gradient(self, crd, states=None):
+        """gradients of the energies of the states
+
+           Returns
+           -------
+               np.ndarray (nstates, *crd.shape)
+        """
+        crd = np.asarray(crd, dtype=np.double)
+        energies = self._energies(self.displacements(crd).reshape((-1,) + crd.shape))
+        energies = energies.reshape((crd.size, 2, -1))
+        gradient = (energies[:, 0] - energies[:, 1]) / (2 * self.step)
+        if states is not None:
+            gradient = gradient[:, states]
+        return np.moveaxis(gradient, 0, -1).reshape((-1,) + crd.shape)
+
+    def hessian(self, crd, state=0, from_gradient=True):
+        """hessian of the energy of a single state
+
+           Parameters
+           ----------
+
+               crd: np.ndarray
+                   geometry
+
+               state: int, optional
+                   state of the hessian
+
+               from_gradient: bool, optional
+                   if True, differences of 2*ncrd analytic gradients are used,
+                   else second differences of 1 + 2*ncrd**2 energies
+
+           Returns
+           -------
+               np.ndarray (ncrd, ncrd), symmetric
+        """
+        crd = np.asarray(crd, dtype=np.double)
+        if from_gradient is True:
+            displaced = self.displacements(crd).reshape((-1,) + crd.shape)
+            gradients = self.spp.request_many(displaced, ['gradient'], [state])['gradient']
+            gradients = gradients.reshape((crd.size, 2, crd.size))
+            hessian = (gradients[:, 0] - gradients[:, 1]) / (2 * self.step)
+        else:
+            hessian = self._hessian_from_energies(crd, state)
+        return 0.5 * (hessian + hessian.T)
+
+    def _hessian_from_energies(self, crd, state):
+        ncrd = crd.size
+        eye = np.eye(ncrd) * self.step
+        upper = [(i, j) for i in range(ncrd) for j in range(i + 1, ncrd)]
+        displaced = [np.zeros(ncrd)]
+        displaced += [sign * eye[i] for i in range(ncrd) for sign in (1, -1)]
+        displaced += [si * eye[i] + sj * eye[j] for i, j in upper
+                      for si, sj in ((1, 1), (1, -1), (-1, 1), (-1, -1))]
+        displaced = crd.reshape(-1) + np.array(displaced)
+        energies = self._energies(displaced.reshape((-1,) + crd.shape))[:, state]
+        #
+        center = energies[0]
+        single = energies[1:2*ncrd + 1].reshape((ncrd, 2))
+        double = energies[2*ncrd + 1:].reshape((len(upper), 4))
+        hessian = np.diag((single[:, 0] - 2 * center + single[:, 1]) / self.step**2)
+        for (i, j), (epp, epm, emp, emm) in zip(upper, double):
+            hessian[i, j] = hessian[j, i] = (epp - epm - emp + emm) / (4 * self.step**2)
+        return hessian
+
+    def _energies(self, crds):
+        """energies of all states, (ncrds, nstates)"""
+        energies = self.spp.request_many(crds, ['energy'])['energy']
+        return np.asarray(energies).reshape((len(crds), -1))
+
+    def normal_modes(self, crd, masses, state=0, from_gradient=True, project=True):
+        """frequencies and mass-weighted normal modes
+
+           Parameters
+           ----------
+
+               crd: np.ndarray
+                   geometry, should be a minimum of the state
+
+               masses: np.ndarray
+                   mass of each atom, or of each coordinate for models
+
+               state: int, optional
+                   state of the hessian
+
+               from_gradient: bool, optional
+                   see `hessian`
+
+               project: bool, optional
+                   remove translations and rotations, if crd is a molecule (natoms, 3)
+
+           Returns
+           -------
+               list of `Mode`, imaginary frequencies are negative
+        """
+        crd = np.asarray(crd, dtype=np.double)
+        hessian = self.hessian(crd, state, from_gradient=from_gradient)
+        return normal_modes(hessian, crd, masses, project=project)
+
+
+def normal_modes(hessian, crd, masses, project=True):
+    """frequencies and mass-weighted normal modes of a hessian,
+       see `FiniteDifference.normal_modes`"""
+    crd = np.asarray(crd, dtype=np.double)
+    masses = np.asarray(masses, dtype=np.double)
+    if crd.ndim == 2 and crd.shape[1] == 3:
+        # one mass per atom
+        masses = np.repeat(masses, 3)
+    masses = masses.reshape(-1)
+    inv_sqrt = 1.0 / np.sqrt(masses)
+    mwhessian = hessian * np.outer(inv_sqrt, inv_sqrt)
+    #
+    nremove = 0
+    if project is True and crd.ndim == 2 and crd.shape[1] == 3 and len(crd) > 1:
+        projector, nremove = _internal_projector(crd, masses)
+        mwhessian = projector @ mwhessian @ projector
+    #
+    eigvals, eigvecs = np.linalg.eigh(mwhessian)
+    if nremove != 0:
+        # translations and rotations have the smallest absolute eigenvalues
+        keep = np.sort(np.argsort(np.abs(eigvals))[nremove:])
+        eigvals, eigvecs = eigvals[keep], eigvecs[:, keep]
+    freqs = np.sign(eigvals) * np.sqrt(np.abs(eigvals))
+    return [Mode(freq, eigvecs[:, i].reshape(crd.shape)) for i, freq in enumerate(freqs)]
+
+
+def _internal_projector(crd, masses):
+    """projector on the mass-weighted space orthogonal to translations and rotations"""
+    natoms = len(crd)
+    sqrt_masses = np.sqrt(masses.reshape((natoms, 3))[:, 0])
+    center = np.sum(crd * sqrt_masses[:, None]**2, axis=0) / np.sum(sqrt_masses**2)
+    rel = crd - center
+    vectors = []
+    for axis in np.eye(3):
+        # translations
+        vectors.append((sqrt_masses[:, None] * axis).reshape(-1))
+    for axis in np.eye(3):
+        # rotations
+        vectors.append((sqrt_masses[:, None] * np.cross(axis, rel)).reshape(-1))
+    # orthonormal basis, linear molecules have only two rotations
+    u, s, _ = np.linalg.svd(np.array(vectors).T, full_matrices=False)
+    basis = u[:, s > 1e-8 * s[0]]
+    return np.eye(3 * natoms) - basis @ basis.T, basis.shape[1]
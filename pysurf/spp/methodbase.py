@@ -1,5 +1,7 @@
 from abc import abstractmethod
 #
+import numpy as np
+#
 from .spp import AbinitioFactory, ModelFactory
 # fileparser
 from ..fileparser import read_geom
@@ -37,11 +39,21 @@ class AbinitioBase(AbinitioFactory):
 
 
 class Model(ModelFactory):
-    """Base Class for all Abinitio Implementations"""
+    """Base Class for all Abinitio Implementations
+
+       Models that can evaluate many geometries at once implement
+
+           compute_batch(crds, properties, states) -> {prop: np.ndarray (ngeom, ...)}
+
+       the SurfacePointProvider then answers `request_many` with a single
+       call of it through `get_batch`.
+    """
 
     _register_plugin = False
 
     implemented = []
+    # optional, see class docstring
+    compute_batch = None
 
     @classmethod
     @abstractmethod
@@ -53,3 +65,23 @@ class Model(ModelFactory):
     def get(self, request):
         """get requested info"""
         pass
+
+    @property
+    def get_batch(self):
+        """only available if the model implements `compute_batch`"""
+        if self.compute_batch is None:
+            raise AttributeError(f"{self.__class__.__name__} has no batched evaluation")
+        return self._get_batch
+
+    def _get_batch(self, requests):
+        """fill many requests, requests with the same properties and states are computed together"""
+        groups = {}
+        for request in requests:
+            groups.setdefault((tuple(request), tuple(request.states)), []).append(request)
+        for (properties, states), group in groups.items():
+            results = self.compute_batch(np.array([request.crd for request in group]),
+                                         list(properties), list(states))
+            for i, request in enumerate(group):
+                for prop, values in results.items():
+                    request.set(prop, values[i])
+        return requests
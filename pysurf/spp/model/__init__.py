@@ -1,5 +1,6 @@
 from ..methodbase import Model
+from .vibronic import VibronicCoupling
 from .pyrazine_schneider import PyrazineSchneider
 from .pyrazine_sala import PyrazineSala
 
-plugins = [PyrazineSchneider, PyrazineSala]
+plugins = [VibronicCoupling, PyrazineSchneider, PyrazineSala]
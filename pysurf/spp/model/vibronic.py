@@ -0,0 +1,249 @@
+"""Linear and quadratic vibronic coupling models
+
+The diabatic Hamiltonian in dimensionless normal coordinates q is
+
+    H_ii(q) = E_i + sum_m kappa_im q_m + sum_m (w_m/2 + gamma_im) q_m**2
+    H_ij(q) = sum_m lambda_ijm q_m
+
+All parameters are kept in dense arrays, H(q) and its derivatives are
+built with tensor contractions for one or many geometries. Adiabatic
+energies, gradients and nonadiabatic couplings follow analytically from
+a single diagonalization.
+
+The parameters are read from an ini file:
+
+    [units]
+    energy = eV
+    frequency = cminv
+
+    [modes]
+    # name = frequency, the order defines the coordinates
+    v6a = 593
+
+    [states]
+    energies = 0.0, 3.94, 4.84
+    # optional, diabatic oscillator strengths
+    fosc = 0, 0, 1
+
+    [kappa]
+    # mode = one value per state
+    v6a = 0.0, -0.105, 0.149
+
+    [gamma]
+    # mode = one value per state
+    v6a = 0.0, -0.012, -0.048
+
+    [lambda]
+    # mode state state = value
+    v10a 1 2 = 0.262
+"""
+from configparser import ConfigParser
+import os
+#
+import numpy as np
+from qctools.converter import energy_converter
+#
+from ..methodbase import Model
+from ...system import Mode
+
+
+PARAMETER_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parameters')
+
+
+def _floats(text):
+    return np.array([float(value) for value in text.replace(',', ' ').split()])
+
+
+def _converter(unit):
+    if unit == 'au':
+        return lambda value: value
+    return energy_converter.get_converter(unit, 'au')
+
+
+def read_parameters(filename):
+    """read the parameters of a vibronic coupling model, all returned in atomic units"""
+    parser = ConfigParser(delimiters=('=',), comment_prefixes=('#',),
+                          inline_comment_prefixes=('#',))
+    parser.optionxform = str
+    if not parser.read(filename):
+        raise FileNotFoundError(f"Parameter file '{filename}' not found")
+    units = dict(parser['units']) if parser.has_section('units') else {}
+    conv_energy = _converter(units.get('energy', 'au'))
+    conv_freq = _converter(units.get('frequency', units.get('energy', 'au')))
+    #
+    modes = list(parser['modes'])
+    frequencies = conv_freq(np.array([float(parser['modes'][mode]) for mode in modes]))
+    energies = conv_energy(_floats(parser['states']['energies']))
+    nstates, nmodes = len(energies), len(modes)
+    #
+    parameters = {'energies': energies, 'frequencies': frequencies, 'names': modes}
+    if 'fosc' in parser['states']:
+        parameters['fosc'] = _floats(parser['states']['fosc'])
+    for name in ('kappa', 'gamma'):
+        values = np.zeros((nstates, nmodes))
+        if parser.has_section(name):
+            for mode, text in parser[name].items():
+                values[:, modes.index(mode)] = conv_energy(_floats(text))
+        parameters[name] = values
+    lam = np.zeros((nstates, nstates, nmodes))
+    if parser.has_section('lambda'):
+        for key, text in parser['lambda'].items():
+            mode, state1, state2 = key.split()
+            lam[int(state1), int(state2), modes.index(mode)] = conv_energy(float(text))
+            lam[int(state2), int(state1), modes.index(mode)] = conv_energy(float(text))
+    parameters['lam'] = lam
+    return parameters
+
+
+class VibronicCoupling(Model):
+    """Linear/quadratic vibronic coupling model defined by a parameter file"""
+
+    _user_input = """
+    # ini file with the parameters of the model
+    parameters = :: existing_file
+    """
+
+    implemented = ['energy', 'gradient', 'nacs', 'fosc']
+
+    @classmethod
+    def from_config(cls, config):
+        return cls.from_file(config['parameters'])
+
+    @classmethod
+    def from_file(cls, filename):
+        return cls(**read_parameters(filename))
+
+    def __init__(self, energies, frequencies, kappa=None, gamma=None, lam=None, fosc=None,
+                 names=None):
+        """
+            Parameters
+            ----------
+
+                energies: np.ndarray (nstates)
+                    diabatic energies
+
+                frequencies: np.ndarray (nmodes)
+                    frequencies of the modes
+
+                kappa: np.ndarray (nstates, nmodes), optional
+                    linear intrastate couplings
+
+                gamma: np.ndarray (nstates, nmodes), optional
+                    quadratic intrastate couplings
+
+                lam: np.ndarray (nstates, nstates, nmodes), optional
+                    linear interstate couplings, symmetric in the states
+
+                fosc: np.ndarray (nstates), optional
+                    diabatic oscillator strengths
+
+                names: list, optional
+                    names of the modes
+        """
+        self.energies = np.asarray(energies, dtype=np.double)
+        self.frequencies = np.asarray(frequencies, dtype=np.double)
+        self.nstates = len(self.energies)
+        nmodes = len(self.frequencies)
+        self.kappa = np.zeros((self.nstates, nmodes)) if kappa is None else np.asarray(kappa)
+        self.gamma = np.zeros((self.nstates, nmodes)) if gamma is None else np.asarray(gamma)
+        if lam is None:
+            lam = np.zeros((self.nstates, self.nstates, nmodes))
+        self.lam = np.asarray(lam)
+        self.diab_fosc_vector = np.zeros(self.nstates) if fosc is None else np.asarray(fosc)
+        self.names = names
+        # coefficients of q**2 on the diagonal
+        self._quadratic = 0.5 * self.frequencies + self.gamma
+        self._diagonal = np.arange(self.nstates)
+        #
+        self.masses = np.ones(nmodes) / self.frequencies
+        self.displacements = np.identity(nmodes)
+        self.modes = [Mode(freq, dis) for freq, dis in zip(self.frequencies, self.displacements)]
+        self.crd = np.zeros(nmodes)
+
+    def get(self, request):
+        """the get function returns the adiabatic energies as well as the
+           gradient at the given position crd. Additionally the masses
+           of the normal modes are returned for the kinetic Hamiltonian.
+        """
+        results = self.compute_batch(request.crd[np.newaxis], list(request), request.states)
+        for prop, values in results.items():
+            request.set(prop, values[0])
+        return request
+
+    def compute_batch(self, crds, properties, states):
+        """properties of many geometries, crds (ngeom, nmodes), from one stacked eigh
+
+           Returns
+           -------
+               dict with energy (ngeom, nstates), gradient (ngeom, len(states), nmodes),
+               nacs (ngeom, nstates, nstates, nmodes) and fosc (ngeom, nstates)
+        """
+        crds = np.asarray(crds, dtype=np.double)
+        energies, T, coupling = self.adiabatic(crds, derivatives=('gradient' in properties
+                                                                  or 'nacs' in properties))
+        results = {}
+        if 'energy' in properties:
+            results['energy'] = energies
+        if 'fosc' in properties:
+            results['fosc'] = self.adiab_fosc(crds, T)
+        if 'gradient' in properties:
+            results['gradient'] = coupling[:, states, states]
+        if 'nacs' in properties:
+            results['nacs'] = self.nacs(energies, coupling)
+        return results
+
+    def diab_en(self, crd):
+        """diabatic matrix, crd (..., nmodes) -> (..., nstates, nstates)"""
+        crd = np.asarray(crd, dtype=np.double)
+        diab_en = np.einsum('ijm,...m->...ij', self.lam, crd)
+        diab_en[..., self._diagonal, self._diagonal] += (self.energies + crd @ self.kappa.T
+                                                         + (crd**2) @ self._quadratic.T)
+        return diab_en
+
+    def diab_grad(self, crd):
+        """derivatives of the diabatic matrix,
+           crd (..., nmodes) -> (..., nstates, nstates, nmodes)"""
+        crd = np.asarray(crd, dtype=np.double)
+        diab_grad = np.broadcast_to(self.lam, crd.shape[:-1] + self.lam.shape).copy()
+        diab_grad[..., self._diagonal, self._diagonal, :] += (
+            self.kappa + 2 * self._quadratic * crd[..., None, :])
+        return diab_grad
+
+    def adiabatic(self, crd, derivatives=True):
+        """adiabatic energies, eigenvectors and the derivatives of the Hamiltonian in the
+           adiabatic basis, whose diagonal are the gradients
+
+           Returns
+           -------
+               energies (..., nstates), T (..., nstates, nstates),
+               coupling (..., nstates, nstates, nmodes) or None
+        """
+        energies, T = np.linalg.eigh(self.diab_en(crd))
+        if derivatives is False:
+            return energies, T, None
+        coupling = np.einsum('...ki,...klm,...lj->...ijm', T, self.diab_grad(crd), T, optimize=True)
+        return energies, T, coupling
+
+    def adiab_en(self, crd):
+        """adiabatic energies and eigenvectors at the position crd"""
+        energies, T, _ = self.adiabatic(crd, derivatives=False)
+        return energies, T
+
+    def adiab_grad(self, crd):
+        """analytic adiabatic gradients (Hellmann-Feynman)"""
+        _, _, coupling = self.adiabatic(crd)
+        return {state: coupling[state, state] for state in range(self.nstates)}
+
+    def adiab_fosc(self, crd, T=None):
+        """oscillator strengths of the adiabatic states"""
+        if T is None:
+            _, T = self.adiab_en(crd)
+        return np.abs(np.swapaxes(T, -1, -2) @ self.diab_fosc_vector)
+
+    @staticmethod
+    def nacs(energies, coupling):
+        """nonadiabatic couplings <i|d/dq|j> = <i|dH/dq|j> / (E_j - E_i), zero on the diagonal"""
+        gaps = energies[..., None, :] - energies[..., :, None]
+        idx = np.arange(energies.shape[-1])
+        gaps[..., idx, idx] = np.inf
+        return coupling / gaps[..., None]
@@ -0,0 +1,138 @@
+"""Binary file format for trained interpolators
+
+Layout of a model file:
+
+    magic       8 bytes, b'PYSURFMD'
+    version     uint32, little endian
+    length      uint64, little endian, length of the header in bytes
+    header      json, metadata and table of the arrays
+    arrays      raw C-ordered arrays, each aligned to 64 bytes
+
+The header stores the name of the interpolator, its hyperparameters, the
+settings of the descriptor and the fingerprint of the training set. The
+arrays are loaded as copy-on-write memory maps, so processes on the same
+node share the pages of a model, until one of them modifies its weights.
+"""
+import hashlib
+import json
+import os
+import struct
+#
+import numpy as np
+
+
+MAGIC = b'PYSURFMD'
+VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct('<8sIQ')
+
+
+class ModelFileError(Exception):
+    """Raised if a file is not a valid model file"""
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def save_model(filename, arrays, metadata):
+    """save arrays and metadata to a model file
+
+       Parameters
+       ----------
+           filename: str
+               name of the file
+
+           arrays: dict
+               name and array of all weights
+
+           metadata: dict
+               json serializable metadata
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    table = {}
+    offset = 0
+    for name, array in arrays.items():
+        table[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({'metadata': metadata, 'arrays': table}).encode('utf-8')
+    start = _aligned(_PREAMBLE.size + len(header))
+    # write to a temporary file first, so that other processes never see a partial model
+    tmpfile = f"{filename}.{os.getpid()}.tmp"
+    with open(tmpfile, 'wb') as fhandle:
+        fhandle.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        fhandle.write(header)
+        for name, array in arrays.items():
+            fhandle.seek(start + table[name]['offset'])
+            fhandle.write(array.tobytes())
+        # make sure the file covers the padding of the last array
+        fhandle.truncate(max(start + offset, fhandle.tell()))
+    os.replace(tmpfile, filename)
+
+
+def read_header(filename):
+    """read the header of a model file
+
+       Returns
+       -------
+           header (dict) and start of the array section in bytes
+    """
+    with open(filename, 'rb') as fhandle:
+        preamble = fhandle.read(_PREAMBLE.size)
+        if len(preamble) != _PREAMBLE.size:
+            raise ModelFileError(f"'{filename}' is not a pysurf model file")
+        magic, version, length = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ModelFileError(f"'{filename}' is not a pysurf model file")
+        if version > VERSION:
+            raise ModelFileError(f"Model file version {version} of '{filename}' is not supported, "
+                                 f"newest supported version is {VERSION}")
+        try:
+            header = json.loads(fhandle.read(length).decode('utf-8'))
+        except ValueError:
+            raise ModelFileError(f"Corrupted header in model file '{filename}'") from None
+    return header, _aligned(_PREAMBLE.size + length)
+
+
+def load_model(filename, mmap=True):
+    """load a model file
+
+       Parameters
+       ----------
+           filename: str
+               name of the file
+
+           mmap: bool, optional
+               if True, the arrays are copy-on-write memory maps of the file,
+               else they are read into memory
+
+       Returns
+       -------
+           arrays (dict) and metadata (dict)
+    """
+    header, start = read_header(filename)
+    arrays = {}
+    for name, info in header['arrays'].items():
+        dtype = np.dtype(info['dtype'])
+        shape = tuple(info['shape'])
+        size = int(np.prod(shape))
+        if mmap is True and size > 0:
+            arrays[name] = np.memmap(filename, dtype=dtype, mode='c', offset=start + info['offset'],
+                                     shape=shape)
+        else:
+            arrays[name] = np.fromfile(filename, dtype=dtype, count=size,
+                                       offset=start + info['offset']).reshape(shape)
+    return arrays, header['metadata']
+
+
+def fingerprint(db):
+    """fingerprint of the training set: number of frames, hash of the crds and
+       for partial frames the hash of the masks"""
+    crds = np.ascontiguousarray(np.array(db['crd']), dtype=np.double)
+    out = {'nframes': len(crds), 'crd_hash': hashlib.sha256(crds.tobytes()).hexdigest()}
+    masks = sorted(name for name in db.get_keys() if name.endswith('_mask'))
+    if len(masks) != 0:
+        masks = hashlib.sha256(b''.join(np.ascontiguousarray(np.array(db[name]), dtype=np.int64)
+                                        .tobytes() for name in masks))
+        out['mask_hash'] = masks.hexdigest()
+    return out
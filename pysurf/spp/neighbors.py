@@ -0,0 +1,216 @@
+"""Nearest neighbor search used by the interpolators
+
+Besides the exact search based on a cKDTree, an approximate search based on
+a forest of random projection trees is provided. In the high dimensional
+descriptor spaces of larger molecules the cKDTree degenerates to a brute force
+search, while the random projection trees only compare to the few geometries,
+that end up in the same leaves as the query.
+"""
+from abc import abstractmethod
+#
+import numpy as np
+#
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
+#
+from colt import Colt
+
+
+class NeighborIndex(Colt):
+    """Base class of all nearest neighbor indices"""
+
+    _user_input = ""
+    #
+    name = None
+    exact = True
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    @abstractmethod
+    def build(self, data):
+        """build the index for the data, shape (ndata, ndim)"""
+
+    @abstractmethod
+    def query(self, x, k=1, p=2):
+        """return distances and indices of the k nearest neighbors,
+           same conventions as `scipy.spatial.cKDTree.query`"""
+
+
+class ExactIndex(NeighborIndex):
+    """Exact search based on scipy's cKDTree"""
+
+    name = 'exact'
+
+    def __init__(self):
+        self.tree = None
+
+    def build(self, data):
+        self.tree = cKDTree(_flatten(data))
+        return self
+
+    def query(self, x, k=1, p=2):
+        return self.tree.query(x, k=k, p=p)
+
+
+class RandomProjectionForest(NeighborIndex):
+    """Approximate search in a forest of random projection trees
+
+       Every tree recursively splits the data by random hyperplanes at the
+       median of the projections, until a leaf contains at most `leaf_size`
+       points. The candidates of a query are all points in the leaves it
+       falls into, more trees give a better recall at higher cost. If the
+       leaves hold fewer than k points, all points are searched, so as for
+       `cKDTree` only k larger than the number of points gives missing
+       neighbors.
+    """
+
+    name = 'rpforest'
+    exact = False
+
+    _user_input = """
+        # number of trees, more trees increase the recall and the cost of a query
+        ntrees = 8 :: int
+        # maximum number of points in a leaf
+        leaf_size = 32 :: int
+        seed = 16661 :: int
+    """
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['ntrees'], config['leaf_size'], config['seed'])
+
+    def __init__(self, ntrees=8, leaf_size=32, seed=16661):
+        self.ntrees = ntrees
+        self.leaf_size = leaf_size
+        self.seed = seed
+        self.data = None
+        self.trees = []
+
+    def build(self, data):
+        self.data = _flatten(data)
+        rng = np.random.default_rng(self.seed)
+        self.trees = [self._build_tree(self.data, rng) for _ in range(self.ntrees)]
+        return self
+
+    def _build_tree(self, data, rng):
+        """build a single tree
+
+           Returns
+           -------
+               normals, offsets: hyperplanes of the inner nodes
+               children: (nnodes, 2), negative entries -(i+1) refer to leaf i
+               leaves: list of index arrays
+        """
+        normals, offsets, children, leaves = [], [], [], []
+
+        def add_node(indices):
+            if len(indices) <= max(self.leaf_size, 1):
+                leaves.append(indices)
+                return -len(leaves)
+            # hyperplane between two random points
+            first, second = data[rng.choice(indices, 2, replace=False)]
+            normal = first - second
+            projection = data[indices] @ normal
+            offset = np.median(projection)
+            left = indices[projection <= offset]
+            right = indices[projection > offset]
+            if len(left) == 0 or len(right) == 0:
+                leaves.append(indices)
+                return -len(leaves)
+            inode = len(normals)
+            normals.append(normal)
+            offsets.append(offset)
+            children.append([0, 0])
+            stack.append((inode, 0, left))
+            stack.append((inode, 1, right))
+            return inode
+        #
+        stack = []
+        add_node(np.arange(len(data)))
+        while stack:
+            inode, side, indices = stack.pop()
+            children[inode][side] = add_node(indices)
+        #
+        if len(normals) == 0:
+            return None, None, np.zeros((0, 2), dtype=int), leaves
+        return np.array(normals), np.array(offsets), np.array(children, dtype=int), leaves
+
+    def _leaves(self, tree, x):
+        """leaf of every query point in a single tree"""
+        normals, offsets, children, leaves = tree
+        if len(children) == 0:
+            return np.zeros(len(x), dtype=int)
+        node = np.zeros(len(x), dtype=int)
+        active = node >= 0
+        while np.any(active):
+            inode = node[active]
+            side = np.einsum('ij,ij->i', x[active], normals[inode]) > offsets[inode]
+            node[active] = children[inode, side.astype(int)]
+            active = node >= 0
+        return -node - 1
+
+    def query(self, x, k=1, p=2):
+        x = np.asarray(x, dtype=np.double)
+        single = (x.ndim == 1)
+        x = np.reshape(x, (-1, self.data.shape[1]))
+        #
+        dist = np.full((len(x), k), np.inf)
+        idx = np.full((len(x), k), len(self.data), dtype=int)
+        ileaves = [self._leaves(tree, x) for tree in self.trees]
+        nvalid = min(k, len(self.data))
+        for i, crd in enumerate(x):
+            candidates = np.unique(np.concatenate([tree[3][ileaf[i]]
+                                                   for tree, ileaf in zip(self.trees, ileaves)]))
+            # too few candidates in the leaves, the missing neighbors are searched exactly
+            if len(candidates) < nvalid:
+                candidates = np.arange(len(self.data))
+            cdists = _distances(crd, self.data[candidates], p)
+            order = np.argsort(cdists)[:k]
+            dist[i, :len(order)] = cdists[order]
+            idx[i, :len(order)] = candidates[order]
+        #
+        if k == 1:
+            dist, idx = dist[:, 0], idx[:, 0]
+        if single is True:
+            return dist[0], idx[0]
+        return dist, idx
+
+
+def _flatten(data):
+    """reshape data to (ndata, ndim), single precision data is not converted"""
+    data = np.asarray(data)
+    if not np.issubdtype(data.dtype, np.floating):
+        data = data.astype(np.double)
+    return data.reshape((len(data), int(np.prod(data.shape[1:]))))
+
+
+def _distances(crd, data, p=2):
+    """p-norm distances between crd and all points in data"""
+    if np.isinf(p):
+        return cdist(crd[np.newaxis], data, metric='chebyshev')[0]
+    return cdist(crd[np.newaxis], data, metric='minkowski', p=p)[0]
+
+
+indices = {index.name: index for index in (ExactIndex, RandomProjectionForest)}
+
+
+def get_neighbor_index(nn_index):
+    """get index from a name, a config or a NeighborIndex"""
+    if isinstance(nn_index, NeighborIndex):
+        return nn_index
+    if nn_index is None:
+        return ExactIndex()
+    if isinstance(nn_index, str):
+        return indices[nn_index]()
+    return indices[nn_index.value].from_config(nn_index)
+
+
+def recall(index, data, queries, k=1):
+    """fraction of the exact k nearest neighbors, that are found by the index"""
+    _, ref = ExactIndex().build(data).query(queries, k=k)
+    _, found = index.query(queries, k=k)
+    ref = np.reshape(ref, (len(queries), k))
+    found = np.reshape(found, (len(queries), k))
+    return np.mean([len(np.intersect1d(r, f))/k for r, f in zip(ref, found)])
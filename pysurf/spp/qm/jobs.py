@@ -0,0 +1,284 @@
+"""Run external QM programs in isolated scratch folders
+
+Every call of an interface creates a `Job`, a scratch folder in which
+all input and output files are written, so several calculations can run
+at the same time. The `JobRunner` limits the number of programs running
+at the same time, sets the number of threads per program and removes or
+keeps the scratch folders according to the selected policy.
+
+If `restart` is set, the interfaces store the orbitals of the last
+converged calculation in a restart folder next to the scratch folders
+and use them as initial guess of the next calculation, which needs only
+few SCF iterations, as the geometry barely changes between two steps.
+"""
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+#
+from colt import Colt
+
+
+class JobError(Exception):
+    """Raised if a program of a job could not be run"""
+
+
+class JobRunner(Colt):
+    """Create scratch folders and run programs in them"""
+
+    _user_input = """
+    # folder in which the scratch folders are created, e.g. /dev/shm to use tmpfs,
+    # by default the current folder
+    scratch = :: str, optional
+    # number of programs that run at the same time
+    max_jobs = 1 :: int
+    # number of threads of each program, sets OMP_NUM_THREADS and MKL_NUM_THREADS
+    nthreads = 1 :: int
+    # time limit of a single program in seconds, no limit if not set
+    timeout = :: float, optional
+    # keep the scratch folders: never, on_error or always
+    keep = on_error :: str :: [never, on_error, always]
+    # use the orbitals of the previous calculation as initial guess
+    restart = False :: bool
+    """
+
+    thread_variables = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+    @classmethod
+    def from_config(cls, config, logger=None):
+        return cls(scratch=config['scratch'], max_jobs=config['max_jobs'],
+                   nthreads=config['nthreads'], timeout=config['timeout'], keep=config['keep'],
+                   restart=config['restart'], logger=logger)
+
+    def __init__(self, scratch=None, max_jobs=1, nthreads=1, timeout=None, keep='on_error',
+                 restart=False, logger=None):
+        """
+            Parameters
+            ----------
+
+                scratch: str, optional
+                    folder in which the scratch folders are created, by default the current folder
+
+                max_jobs: int, optional
+                    number of programs that run at the same time
+
+                nthreads: int, optional
+                    number of threads of each program
+
+                timeout: float, optional
+                    time limit of a single program in seconds
+
+                keep: str, optional
+                    policy for the scratch folders: 'never', 'on_error' or 'always'
+
+                restart: bool, optional
+                    use the orbitals of the previous calculation as initial guess
+
+                logger: Logger, optional
+                    logger to report failed jobs
+        """
+        if keep not in ('never', 'on_error', 'always'):
+            raise ValueError(f"Unknown policy keep = '{keep}', use one of never, on_error, always")
+        self.scratch = scratch
+        self.max_jobs = max_jobs
+        self.nthreads = nthreads
+        self.timeout = timeout
+        self.keep = keep
+        self.restart = restart
+        self.logger = logger
+        # number of scf runs and iterations, with and without restart
+        self.scf_statistics = {True: [0, 0], False: [0, 0]}
+        self._slots = threading.BoundedSemaphore(max_jobs)
+        self._restart_lock = threading.Lock()
+
+    @property
+    def env(self):
+        """environment of the programs"""
+        env = dict(os.environ)
+        for name in self.thread_variables:
+            env[name] = str(self.nthreads)
+        return env
+
+    @property
+    def folder(self):
+        """folder in which the scratch folders are created"""
+        return self.scratch if self.scratch is not None else os.getcwd()
+
+    def restart_folder(self, name):
+        return os.path.join(self.folder, f'{name}_restart')
+
+    def load_restart(self, job, name, filenames):
+        """copy the stored restart files and folders into the job
+
+           Returns
+           -------
+               bool, True if any restart file was copied
+        """
+        if self.restart is False:
+            return False
+        folder = self.restart_folder(name)
+        restarted = False
+        with self._restart_lock:
+            for filename in filenames:
+                source = os.path.join(folder, filename)
+                if os.path.isdir(source):
+                    shutil.copytree(source, job.path(filename), dirs_exist_ok=True)
+                elif os.path.isfile(source):
+                    shutil.copy(source, job.path(filename))
+                else:
+                    continue
+                restarted = True
+        return restarted
+
+    def save_restart(self, job, name, filenames):
+        """store the restart files and folders of a converged job for the next calculation"""
+        if self.restart is False:
+            return
+        folder = self.restart_folder(name)
+        with self._restart_lock:
+            os.makedirs(folder, exist_ok=True)
+            for filename in filenames:
+                source = job.path(filename)
+                if os.path.isdir(source):
+                    shutil.rmtree(os.path.join(folder, filename), ignore_errors=True)
+                    shutil.copytree(source, os.path.join(folder, filename))
+                elif os.path.isfile(source):
+                    shutil.copy(source, os.path.join(folder, filename))
+
+    def record_scf(self, name, niterations, restarted):
+        """log the number of scf iterations of a calculation,
+           to measure the saving of the restart"""
+        if niterations is None:
+            return
+        with self._restart_lock:
+            statistics = self.scf_statistics[restarted]
+            statistics[0] += 1
+            statistics[1] += niterations
+        if self.logger is not None:
+            guess = 'previous orbitals' if restarted else 'fresh guess'
+            self.logger.info(f"{name}: scf converged in {niterations} iterations "
+                             f"starting from {guess}")
+
+    @contextmanager
+    def job(self, name, files=None, parent=None):
+        """scratch folder for a calculation
+
+           Parameters
+           ----------
+               name: str
+                   prefix of the scratch folder
+
+               files: list, optional
+                   files of the current folder, that are copied to the scratch
+                   folder, if they exist
+
+               parent: Job, optional
+                   if given, the new job starts from a copy of its folder, e.g.
+                   to share a converged scf between several jobs
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        job = Job(self, tempfile.mkdtemp(prefix=f'{name}_', dir=self.folder))
+        if parent is not None:
+            shutil.copytree(parent.folder, job.folder, dirs_exist_ok=True)
+            job.history = list(parent.history)
+        if files is not None:
+            job.copy_in(*files)
+        failed = False
+        try:
+            yield job
+        except BaseException:
+            failed = True
+            if self.logger is not None:
+                self.logger.warning(f"Job in '{job.folder}' failed")
+            raise
+        finally:
+            if self.keep == 'never' or (self.keep == 'on_error' and failed is False):
+                shutil.rmtree(job.folder, ignore_errors=True)
+
+    def map(self, func, items):
+        """call `func` for all items concurrently, returns the results in order
+
+           As every program holds one of the `max_jobs` slots, at most
+           `max_jobs` items are computed at the same time
+        """
+        items = list(items)
+        if self.max_jobs == 1 or len(items) < 2:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_jobs, len(items))) as pool:
+            return list(pool.map(func, items))
+
+    def run(self, command, folder, stdout=None, stdin=None, env=None):
+        """run a program, at most `max_jobs` programs run at the same time
+
+           Returns
+           -------
+               subprocess.CompletedProcess, stderr is captured as text
+        """
+        if isinstance(command, str):
+            command = shlex.split(command)
+        environment = self.env
+        if env is not None:
+            environment.update(env)
+        with self._slots:
+            try:
+                if stdout is None:
+                    return subprocess.run(command, cwd=folder, input=stdin, env=environment,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                          text=True, timeout=self.timeout)
+                with open(os.path.join(folder, stdout), 'w') as outfile:
+                    return subprocess.run(command, cwd=folder, input=stdin, env=environment,
+                                          stdout=outfile, stderr=subprocess.PIPE,
+                                          text=True, timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                raise JobError(f"'{' '.join(command)}' in '{folder}' exceeded the time limit "
+                               f"of {self.timeout} s") from None
+            except OSError as error:
+                raise JobError(f"Cannot run '{' '.join(command)}': {error}") from None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_slots']
+        del state['_restart_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._slots = threading.BoundedSemaphore(self.max_jobs)
+        self._restart_lock = threading.Lock()
+
+
+class Job:
+    """Scratch folder of a single calculation"""
+
+    def __init__(self, runner, folder):
+        self.runner = runner
+        self.folder = folder
+        # programs that were run in the folder
+        self.history = []
+
+    def path(self, filename):
+        return os.path.join(self.folder, filename)
+
+    def exists(self, filename):
+        return os.path.isfile(self.path(filename))
+
+    def write(self, filename, content):
+        with open(self.path(filename), 'w') as fhandle:
+            fhandle.write(content)
+        return self.path(filename)
+
+    def copy_in(self, *filenames):
+        """copy existing files of the current folder to the scratch folder"""
+        for filename in filenames:
+            if os.path.isfile(filename):
+                shutil.copy(filename, self.path(os.path.basename(filename)))
+
+    def run(self, command, stdout=None, stdin=None, env=None):
+        """run a program in the scratch folder"""
+        result = self.runner.run(command, self.folder, stdout=stdout, stdin=stdin, env=env)
+        self.history.append(command)
+        return result
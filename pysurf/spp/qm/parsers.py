@@ -0,0 +1,195 @@
+"""Single-pass parsers of the output files of the QM programs
+
+Every parser reads its file once, line by line, and collects all needed
+quantities in that scan. Gradients are written directly into
+preallocated arrays.
+"""
+import numpy as np
+
+
+def _float(value):
+    """fortran double, e.g. 0.1D-01"""
+    return float(value.replace('D', 'E'))
+
+
+def _after(line, keyword):
+    """first entry after keyword in line"""
+    return line.split(keyword)[1].split()[0]
+
+
+def read_gradient_file(filename, natoms, out=None):
+    """gradient of the last cycle of a Turbomole/xtb `gradient` file
+
+       $grad
+         cycle =      1    SCF energy =   ...
+         natoms lines of coordinates
+         natoms lines of gradients
+       $end
+    """
+    if out is None:
+        out = np.empty((natoms, 3))
+    found = False
+    with open(filename, 'r') as fhandle:
+        for line in fhandle:
+            if 'cycle' not in line:
+                continue
+            for _ in range(natoms):
+                next(fhandle)
+            for i in range(natoms):
+                out[i] = [_float(value) for value in next(fhandle).split()[:3]]
+            found = True
+    if found is False:
+        raise ValueError(f"No gradient found in '{filename}'")
+    return out
+
+
+def read_hessian_file(filename):
+    """flattened hessian of a xtb `hessian` file"""
+    with open(filename, 'r') as fhandle:
+        return np.array([float(value) for line in fhandle if not line.lstrip().startswith('$')
+                         for value in line.split()])
+
+
+def _read_qchem_gradient(fhandle, natoms):
+    """gradient printed in blocks of up to 6 atoms: a header line, then x, y and z"""
+    gradient = np.empty((natoms, 3))
+    start = 0
+    while start < natoms:
+        next(fhandle)
+        columns = [next(fhandle).split()[1:] for _ in range(3)]
+        end = start + len(columns[0])
+        gradient[start:end] = np.array(columns, dtype=float).T
+        start = end
+    return gradient
+
+
+def parse_qchem_output(filename, natoms=None, nexcited=None):
+    """all results of a QChem output
+
+       Parameters
+       ----------
+           filename: str
+               QChem output
+
+           natoms: int, optional
+               number of atoms, needed to read gradients
+
+           nexcited: int, optional
+               maximum number of excited states read
+
+       Returns
+       -------
+           dict with scf_energy, scf_iterations, excited_energies (total energies),
+           fosc, transmom, scf_gradient and cis_gradient
+    """
+    result = {'scf_energy': None, 'scf_iterations': None, 'excited_energies': [],
+              'fosc': [], 'transmom': [], 'scf_gradient': None, 'cis_gradient': None}
+
+    def add(name, value):
+        if nexcited is None or len(result[name]) < nexcited:
+            result[name].append(value)
+
+    with open(filename, 'r') as fhandle:
+        for line in fhandle:
+            if 'Convergence criterion met' in line:
+                result['scf_iterations'] = int(line.split()[0])
+            elif 'SCF failed to converge' in line:
+                result['scf_iterations'] = None
+            elif 'Total energy in the final basis set =' in line:
+                result['scf_energy'] = float(line.split()[8])
+            elif ': excitation energy (eV) =' in line:
+                add('excited_energies', float(next(fhandle).split()[5]))
+            elif 'Trans. Mom.' in line:
+                words = line.split()
+                add('transmom', [float(words[i]) for i in (2, 4, 6)])
+            elif 'Strength' in line:
+                add('fosc', float(line.split()[2]))
+            elif natoms is not None and 'Gradient of SCF Energy' in line:
+                result['scf_gradient'] = _read_qchem_gradient(fhandle, natoms)
+            elif (natoms is not None
+                  and 'Gradient of the state energy (including CIS Excitation Energy)' in line):
+                result['cis_gradient'] = _read_qchem_gradient(fhandle, natoms)
+    return result
+
+
+def parse_dscf_output(filename):
+    """energy and number of scf iterations of a Turbomole dscf output,
+       the iterations are None if the scf did not converge"""
+    result = {'energy': None, 'scf_iterations': None}
+    with open(filename, 'r') as fhandle:
+        for line in fhandle:
+            if '|  total energy' in line:
+                result['energy'] = float(line.split()[4])
+            elif 'convergence criteria satisfied after' in line:
+                result['scf_iterations'] = int(_after(line, 'after'))
+    return result
+
+
+def parse_escf_output(filename, nmax=None):
+    """total energies, starting with the ground state, and oscillator strengths
+       of a Turbomole escf output"""
+    result = {'energies': [], 'fosc': []}
+    with open(filename, 'r') as fhandle:
+        for line in fhandle:
+            if 'Total energy' in line:
+                if nmax is None or len(result['energies']) < nmax:
+                    result['energies'].append(float(line.split()[2]))
+            elif 'Oscillator strength' in line:
+                next(fhandle)
+                result['fosc'].append(float(next(fhandle).split()[2]))
+    return result
+
+
+def parse_ricc2_output(filename):
+    """MP2 energy and ADC(2) oscillator strengths of a Turbomole ricc2 output"""
+    result = {'mp2_energy': None, 'fosc': []}
+    with open(filename, 'r') as fhandle:
+        for line in fhandle:
+            if 'Final MP2 energy' in line:
+                result['mp2_energy'] = float(line.split()[5])
+            elif 'oscillator strength' in line:
+                result['fosc'].append(float(line.split()[5]))
+    return result
+
+
+def parse_exstates(filename, nstates, natoms):
+    """excitation energies and excited state gradients of a Turbomole `exstates` file
+
+       Returns
+       -------
+           dict with excitation_energies (list) and gradients ({state: array})
+    """
+    result = {'excitation_energies': [], 'gradients': {}}
+    state = None
+    with open(filename, 'r') as fhandle:
+        for line in fhandle:
+            if 'excitation_energies_ADC(2)' in line:
+                result['excitation_energies'] = [_float(next(fhandle).split()[1])
+                                                 for _ in range(nstates)]
+            elif 'exstprop' in line:
+                state = int(line.split('_')[-1])
+            elif state is not None and 'gradient' in line:
+                gradient = np.empty((natoms, 3))
+                for i in range(natoms):
+                    gradient[i] = [_float(value) for value in next(fhandle).split()[:3]]
+                result['gradients'][state] = gradient
+                state = None
+    return result
+
+
+def parse_xtb_output(filename):
+    """energy, dipole and number of scc iterations of a xtb output,
+       the iterations are None if the scc did not converge"""
+    result = {'energy': None, 'dipole': None, 'scf_iterations': None}
+    with open(filename, 'r') as fhandle:
+        for line in fhandle:
+            if 'TOTAL ENERGY' in line:
+                result['energy'] = float(line.split()[3])
+            elif 'molecular dipole:' in line:
+                next(fhandle)
+                next(fhandle)
+                words = next(fhandle).split()
+                result['dipole'] = [float(words[i]) for i in (1, 2, 3)]
+            elif 'convergence criteria satisfied after' in line:
+                result['scf_iterations'] = int(_after(line, 'after'))
+    return result
@@ -1,82 +1,16 @@
 from collections.abc import MutableMapping
-from copy import deepcopy
 import os
+import shutil
 #
 from jinja2 import Template
 import numpy as np
 #
 #
 from . import AbinitioBase
+from .jobs import JobRunner, JobError
+from .parsers import parse_qchem_output
 from ...system import Molecule
-#
-from qctools import generate_filereader, Event
-from qctools.events import join_events
-
-
-qchem = """
-[SCFEnergy]
-grep = Total energy in the final basis set =
-split = 8 :: float
-
-[ExcitedState]
-grep = : excitation energy (eV) = :: 1 :: 1
-split = 5 :: float
-settings = multi=true
-
-[fosc]
-grep = Strength :: 1 :: 0
-split =  2 :: float
-settings = multi=true
-
-[transmom]
-grep = Trans. Mom. :: 1 :: 0
-split = 2, 4, 6 :: float
-settings = multi=true
-"""
-
-
-def length(kwargs):
-    natoms = kwargs['natoms']
-    if natoms % 6 == 0:
-        return (natoms // 6) * 4
-    return ((natoms // 6) + 1) * 4
-
-
-def get_gradient(scftxt):
-    gradient = []
-    for i in range(0, len(scftxt), 4):
-        x = map(float, scftxt[i + 1].split()[1:])
-        y = map(float, scftxt[i + 2].split()[1:])
-        z = map(float, scftxt[i + 3].split()[1:])
-        gradient += [[x1, y1, z1] for x1, y1, z1 in zip(x, y, z)]
-    return gradient
-
-
-SCFGradient = Event('SCFGradient',
-            'xgrep', {'keyword': 'Gradient of SCF Energy',
-                      'ilen': length,
-                      'ishift': 1,},
-            func=get_gradient,
-)
-
-
-CisGradient = Event('CisGradient',
-            'xgrep', {'keyword': 'Gradient of the state energy (including CIS Excitation Energy)',
-                      'ilen': length,
-                      'ishift': 1,},
-            func=get_gradient,
-)
-
-
-# change by hand the events, to clear them up!
-QChemReader = generate_filereader("QChemReader", qchem)
-ex_st = QChemReader._events['ExcitedState']
-osc = QChemReader._events['fosc']
-tm = QChemReader._events['transmom']
-together = join_events(ex_st, tm, osc)
-QChemReader.add_event('ExcitedStateInfo', together)
-QChemReader.add_event("SCFGradient", SCFGradient)
-QChemReader.add_event("CisGradient", CisGradient)
+from ...logger import get_logger
 
 
 tpl = Template("""
@@ -161,8 +95,6 @@ class QChem(AbinitioBase):
 
     tpl = tpl
 
-    reader = QChemReader
-
     settings = {
         'set_iter': 50,
         'exchange': 'pbe0',
@@ -185,16 +117,27 @@ class QChem(AbinitioBase):
     runtime = ['jobtype',]
     #
     implemented = ['energy', 'gradient', 'fosc', 'transmom']
+    # folder in QCSCRATCH with the orbitals, that are reused as guess of the next calculation
+    savedir = 'qchem_save'
+
+    @classmethod
+    def _extend_user_input(cls, questions):
+        questions.generate_block("jobs", JobRunner.colt_user_input)
 
-    def __init__(self, config, atomids, nstates, nghost_states, chg, mult, qchemexe):
+    def __init__(self, config, atomids, nstates, nghost_states, chg, mult, qchemexe, runner=None):
+        self.logger = get_logger('qchem_inter.log', 'qchem_interface')
         self.molecule = Molecule(atomids, None)
+        if runner is None:
+            runner = JobRunner()
+        if runner.logger is None:
+            runner.logger = self.logger
+        self.runner = runner
         self.exe = qchemexe
         self.chg = chg
         self.mult = mult
         self.filename = 'qchem.in'
         self.nstates = nstates
         self.nghost_states = nghost_states
-        self.reader._events['ExcitedStateInfo'].nmax = nstates + nghost_states - 1
         self._update_settings(config)
         self.excited_state_settings['cis_n_roots'] = nstates + nghost_states - 1
 
@@ -203,78 +146,106 @@ class QChem(AbinitioBase):
 
     @classmethod
     def from_config(cls, config, atomids, nstates, nghost_states):
-        return cls(config, atomids, nstates, nghost_states, config['chg'], config['mult'], config['exe'])
+        return cls(config, atomids, nstates, nghost_states, config['chg'], config['mult'], config['exe'],
+                   runner=JobRunner.from_config(config['jobs']))
 
     def get(self, request):
-        # update coordinates
-        self.molecule.crd = request.crd
-        if 'gradient' in request:
-            self._do_gradient(request)
-        if 'energy' in request:
-            self._do_energy(request)
+        # each request is computed in its own scratch folder
+        molecule = Molecule(self.molecule.atomids, request.crd)
+        with self.runner.job('qchem') as job:
+            # the orbitals of the energy calculation are the guess of the gradients
+            if 'energy' in request:
+                self._do_energy(job, molecule, request)
+            if 'gradient' in request:
+                self._do_gradient(job, molecule, request)
         #
         return request
 
-    def _do_gradient(self, request):
-        jobtype = 'FORCE'
-        remsection = deepcopy(self.settings)
-        gradient = {}
-        for state in request.states:
-            if state == 0:
-                gradient[state] = self._do_gs_gradient(request)
-            else:
-                gradient[state] = self._do_ex_gradient(request, state)
-        request.set('gradient', gradient)
-
-    def _do_energy(self, request):
+    def _do_gradient(self, job, molecule, request):
+        """the gradients of the states are computed concurrently in separate scratch folders,
+           all of them start from the orbitals of a single scf in the folder of the job"""
+        if len(request.states) > 1 and not self._has_orbitals(job):
+            settings = UpdatableDict(self.settings)
+            settings['jobtype'] = 'sp'
+            self._run(job, molecule, settings)
+
+        def compute(state):
+            with self.runner.job(f'qchem_state{state}', parent=job) as statejob:
+                if state == 0:
+                    return state, self._do_gs_gradient(statejob, molecule)
+                return state, self._do_ex_gradient(statejob, molecule, state)
+
+        request.set('gradient', dict(self.runner.map(compute, request.states)))
+
+    def _do_energy(self, job, molecule, request):
         settings = UpdatableDict(self.settings, self.excited_state_settings)
         settings['jobtype'] = 'sp'
-        self._write_input(self.filename, settings.items())
-        output = self.submit(self.filename)
-        out = self.reader(output, ['SCFEnergy', 'ExcitedStateInfo'])
-        if not isinstance(out['ExcitedState'], list):
-            outst = [out['ExcitedState']]
-        else:
-            outst = out['ExcitedState']
-        request.set('energy', np.sort(np.array([out['SCFEnergy']] + outst).flatten())[:self.nstates])
+        out = self._run(job, molecule, settings)
+        request.set('energy', np.sort(np.array([out['scf_energy']] + out['excited_energies']))[:self.nstates])
         if 'fosc' in request:
-            if not isinstance(out['fosc'], list):
-                outfosc = [0.] + [value for value in out['fosc']]
-            else:
-                outfosc = [0.] + out['fosc']
-            request.set('fosc', outfosc)
+            request.set('fosc', [0.] + out['fosc'])
         if 'transmom' in request:
-            if not isinstance(out['transmom'], list):
-                outtransmom = [0.] + [out['transmom']]
-            else:
-                outtransmom = [0.] + out['transmom']
-            request.set('transmom', outtransmom)
+            request.set('transmom', [[0., 0., 0.]] + out['transmom'])
 
-    def _do_gs_gradient(self, request):
+    def _do_gs_gradient(self, job, molecule):
         settings = UpdatableDict(self.settings)
         settings['jobtype'] = 'force'
-        self._write_input(self.filename, settings.items())
-        output = self.submit(self.filename)
-        out = self.reader(output, ['SCFGradient'], {'natoms': self.molecule.natoms})
-        return out['SCFGradient']
+        return self._run(job, molecule, settings)['scf_gradient']
 
-    def _do_ex_gradient(self, request, state):
+    def _do_ex_gradient(self, job, molecule, state):
         settings = UpdatableDict(self.settings, self.excited_state_settings)
         settings['jobtype'] = 'force'
         settings['CIS_STATE_DERIV'] = state
-        self._write_input(self.filename, settings.items())
-        output = self.submit(self.filename)
-        out = self.reader(output, ['CisGradient'], {'natoms': self.molecule.natoms})
-        return out['CisGradient']
-
-    def _write_input(self, filename, remsection):
+        return self._run(job, molecule, settings)['cis_gradient']
+
+    def _run(self, job, molecule, settings):
+        """write the input and run qchem, returns the results of the output
+
+           If the job contains orbitals, copied from its parent job, or orbitals
+           of a previous calculation are stored, they are read as guess, if the
+           scf does not converge from them, the calculation is repeated with a
+           fresh guess.
+        """
+        remsection = list(settings.items())
+        if self._has_orbitals(job) or self.runner.load_restart(job, 'qchem', [self.savedir]):
+            self._write_input(job, molecule, self.filename, remsection + [('scf_guess', 'read')])
+            try:
+                out = self._parse(molecule, self.submit(job, self.filename))
+            except JobError:
+                out = None
+            if out is not None and out['scf_iterations'] is not None:
+                return self._converged(job, out, True)
+            self.logger.warning(f"QChem: no scf convergence from the stored orbitals in '{job.folder}', "
+                                "using a fresh guess")
+            shutil.rmtree(job.path(self.savedir), ignore_errors=True)
+        self._write_input(job, molecule, self.filename, remsection)
+        return self._converged(job, self._parse(molecule, self.submit(job, self.filename)), False)
+
+    def _has_orbitals(self, job):
+        return os.path.isdir(job.path(self.savedir))
+
+    def _parse(self, molecule, output):
+        """read all results of the output in a single pass"""
+        return parse_qchem_output(output, natoms=molecule.natoms,
+                                  nexcited=self.nstates + self.nghost_states - 1)
+
+    def _converged(self, job, out, restarted):
+        self.runner.record_scf('QChem', out['scf_iterations'], restarted)
+        self.runner.save_restart(job, 'qchem', [self.savedir])
+        return out
+
+    def _write_input(self, job, molecule, filename, remsection):
         """write input file for qchem"""
-        with open(filename, 'w') as f:
-            f.write(self.tpl.render(chg=self.chg, mult=self.mult, 
-                    mol=self.molecule, remsection=remsection))
-    
-    def submit(self, filename):
+        job.write(filename, self.tpl.render(chg=self.chg, mult=self.mult,
+                                            mol=molecule, remsection=remsection))
+
+    def submit(self, job, filename):
+        """run qchem in the scratch folder of the job, returns the path of the output"""
         output = filename + ".out"
-        cmd = f"{self.exe} {filename} > {output}"
-        os.system(cmd)
-        return output
+        # qchem stores its temporary files in QCSCRATCH, the orbitals are kept in
+        # QCSCRATCH/savedir for the jobs started from this one and the restart
+        run = job.run(f"{self.exe} -save {filename} {output} {self.savedir}",
+                      env={'QCSCRATCH': job.folder})
+        if run.returncode != 0:
+            raise JobError(f"QChem calculation in '{job.folder}' failed: {run.stderr}")
+        return job.path(output)
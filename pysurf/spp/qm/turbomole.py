@@ -1,21 +1,23 @@
 from collections.abc import MutableMapping
+from contextlib import ExitStack
 from copy import deepcopy
 import os
 import shutil
-import subprocess
+import threading
 import numpy as np
 #
 from jinja2 import Template
 #
-from qctools import generate_filereader, Event
-from qctools.events import join_events
-#
 from colt import Colt
 from ...utils import exists_and_isfile
 from ...system import ATOMID_TO_NAME
 from ...logger import Logger, get_logger
+from ...fileparser import read_geom
 #
 from . import AbinitioBase
+from .jobs import JobRunner, JobError
+from .parsers import (parse_dscf_output, parse_escf_output, parse_ricc2_output, parse_exstates,
+                      read_gradient_file)
 from ...system import Molecule
 
 
@@ -30,101 +32,19 @@ class DFTquestions(Colt):
     """
 
 
-turbomole = """
-[MP2Energy]
-grep = Final MP2 energy
-split = 5 :: float
-
-[DSCFEnergy]
-grep = |  total energy
-split = 4 :: float
-
-[ESCFEnergy]
-grep = Total energy
-split = 2 :: float
-settings = multi=True
-
-[ESCFFosc]
-grep = Oscillator strength :: 1 :: 2
-split = 2 :: float
-settings = multi=True
-
-[ADCFosc]
-grep = oscillator strength
-split = 5 :: float
-settings = multi=True
+def state_ranges(states):
+    """turbomole state list, e.g. [1, 2, 3, 5] -> '1-3,5'"""
+    states = sorted(set(states))
+    ranges = []
+    for state in states:
+        if len(ranges) != 0 and state == ranges[-1][1] + 1:
+            ranges[-1][1] = state
+        else:
+            ranges.append([state, state])
+    return ','.join(str(start) if start == end else f'{start}-{end}' for start, end in ranges)
 
-[NStates]
-grep = nstates=
-split = -1 :: int
-"""
 
-# Additional functions for the reader
-def get_ex_energies(txt):
-    ex = []
-    for line in txt:
-        ex += [float(line.split()[1])]
-    return ex
-
-def get_gradient(txt):
-    grad = []
-    for line in txt:
-        line = line.replace('D', 'E')
-        ls = line.split()
-        grad += [[float(ls[0]), float(ls[1]), float(ls[2])]]
-    return grad
-
-def get_state(txt):
-    return int(txt.split('_')[-1])
-
-def get_fosc(txt):
-    txt = txt.replace('D', 'E')
-    txt_sp = txt.split()
-    res = 0
-    for i in [1, 3, 5]:
-        res += float(txt_sp[i].strip('='))
-    return res
-
-# Events for the reader
-ADCExEnergies = Event('ADCExEnergies',
-                    'xgrep', {'keyword': 'excitation_energies_ADC(2)',
-                             'ishift' : 1,
-                             'ilen' : 'nstates'},
-                    func=get_ex_energies)
-
-
-ADCExGradient = Event('ADCExGradient',
-                    'xgrep', {'keyword': 'gradient',
-                             'ishift' : 1,
-                             'ilen' : 'natoms'},
-                    func=get_gradient)
-
-Gradient = Event('Gradient',
-                    'xgrep', {'keyword': 'cycle',
-                             'ishift' : 'shift',
-                             'ilen' : 'natoms'},
-                    func=get_gradient)
-
-ADCExPropState = Event('ADCExPropState',
-                    'grep', {'keyword': 'exstprop',
-                             'ishift' : 0,
-                             'ilen' : 1},
-                    func=get_state)
-
-
-# change by hand the events, to clear them up!
-TurbomoleReader = generate_filereader("TurbomoleReader", turbomole)
-TurbomoleReader.add_event("ADCExGradient", ADCExGradient)
-TurbomoleReader.add_event("ADCExPropState", ADCExPropState)
-grad_ex = TurbomoleReader._events['ADCExGradient']
-prop_st = TurbomoleReader._events['ADCExPropState']
-grad_state = join_events(prop_st, grad_ex)
-TurbomoleReader.add_event("ADCExEnergies", ADCExEnergies)
-TurbomoleReader.add_event("Gradient", Gradient)
-TurbomoleReader.add_event("ADCExGrad", grad_state)
-
-
-tpl_energy = Template(
+tpl_excitations = Template(
 """
 $denconv   0.10000000E-06
 $ricc2
@@ -132,6 +52,9 @@ $ricc2
 $excitations
   irrep=a mult=1 nexc={{states}} npre={{states}} nstart={{states}}
   {{fosc}}
+{%- if gradstates %}
+  xgrad states=(a {{gradstates}})
+{%- endif %}
 """)
 
 tpl_fosc = """
@@ -144,16 +67,6 @@ $ricc2
   geoopt model=mp2
 """
 
-tpl_gradient_ex = Template(
-"""
-$denconv   0.10000000E-06
-$ricc2
-  adc(2)
-$excitations
-  irrep=a mult=1 nexc={{states}} npre={{states}} nstart={{states}}
-  xgrad states=(a {{gradstates}})
-""")
-
 tpl_dft = Template("""
 $dft
   functional {{functional}}
@@ -173,6 +86,9 @@ class Turbomole(AbinitioBase):
 
     basis = cc-pVDZ
     max_scf_cycles = 50 :: int
+    # geometry used to create the reference files with define, if they do not exist,
+    # by default the geometry of the first request
+    refgeom = :: existing_file, optional
     """
 
     _method = {
@@ -188,23 +104,35 @@ class Turbomole(AbinitioBase):
     }
 
 
-    reader = TurbomoleReader
+    # files of the current folder, that are copied to the scratch folders
+    reference_files = ['control_ref', 'basis', 'auxbasis', 'jbasis', 'mos', 'alpha', 'beta']
+    # orbitals, that are reused as guess of the next calculation
+    orbital_files = ['mos', 'alpha', 'beta']
     #
     implemented = ['energy', 'gradient', 'fosc']
 
     @classmethod
     def _extend_user_input(cls, questions):
         questions.generate_cases("method", {name: method.colt_user_input for name, method in cls._method.items()})
+        questions.generate_block("jobs", JobRunner.colt_user_input)
         
-    def __init__(self, config, atomids, nstates, nghost_states):
+    def __init__(self, config, atomids, nstates, nghost_states, runner=None, refgeom=None):
         self.logger = get_logger('tm_inter.log', 'turbomole_interface')
+        if runner is None:
+            runner = JobRunner()
+        if runner.logger is None:
+            runner.logger = self.logger
+        self.runner = runner
         self.molecule = Molecule(atomids, None)
         self.nstates = nstates
         self.nghost_states = nghost_states
         self.atomids = atomids
         self.atomnames = [ATOMID_TO_NAME[idx] for idx in atomids]
         self._update_settings(config, nstates)
-        self.reader._events['ESCFEnergy'].nmax = nstates+nghost_states
+        # the reference files are created once in the current folder
+        self._reference_lock = threading.Lock()
+        if refgeom is not None:
+            self._setup_reference(read_geom(refgeom)[2])
 
     def _update_settings(self, config, nstates):
         self.settings = {key: config[key] for key in self.settings}
@@ -213,160 +141,184 @@ class Turbomole(AbinitioBase):
 
     @classmethod
     def from_config(cls, config, atomids, nstates, nghost_states):
-        return cls(config, atomids, nstates, nghost_states)
+        return cls(config, atomids, nstates, nghost_states,
+                   runner=JobRunner.from_config(config['jobs']), refgeom=config['refgeom'])
 
     def get(self, request):
-        # update coordinates
-        self.same_crd = False
-        self.molecule.crd = request.crd
-        if 'energy' in request:
+        # each request is computed in its own scratch folder,
+        # that only reads the reference files of the current folder
+        self._setup_reference(request.crd)
+        with self.runner.job('turbomole', files=self.reference_files) as job:
+            self._write_coord(request.crd, filename=job.path('coord'))
             if self.settings['method'] == 'ADC(2)':
-                self._do_energy_adc(request)
-                self.same_crd = True
+                self._do_adc(job, request)
             elif self.settings['method'] == 'DFT/TDDFT':
-                self._do_energy_dft(request)
-                self.same_crd = True
-        if 'gradient' in request:
-            self._do_gradient(request)
-        self.same_crd = False
+                if 'energy' in request:
+                    self._do_energy_dft(job, request)
+                if 'gradient' in request:
+                    self._do_gradient(job, request)
         #
         return request
 
-    def _do_gradient(self, request):
+    def _plan_adc(self, request):
+        """merge the request into the smallest number of ricc2 runs
+
+           All excited state gradients are computed in a single run together
+           with the energies and oscillator strengths, only the MP2 ground
+           state gradient needs a run of its own.
+        """
+        runs = []
+        mode = {}
+        if 'energy' in request:
+            mode['energy'] = ''
+            if 'fosc' in request:
+                mode['fosc'] = True
+        if 'gradient' in request:
+            exstates = [state for state in request.states if state != 0]
+            if len(exstates) != 0:
+                mode['gradient'] = exstates
+        if len(mode) != 0:
+            runs.append(mode)
+        if 'gradient' in request and 0 in request.states:
+            runs.append({'gradient': [0]})
+        return runs
+
+    def _do_adc(self, job, request):
+        """run the planned ricc2 runs concurrently, all of them start from the converged scf"""
+        runs = self._plan_adc(request)
+        if len(runs) == 0:
+            return
+        self._prepare_control_adc(job, mode={'energy': ''})
+        self._run_dscf(job)
+        with ExitStack() as stack:
+            jobs = [job] + [stack.enter_context(self.runner.job(f'turbomole_run{i}', parent=job))
+                            for i in range(1, len(runs))]
+            results = self.runner.map(lambda args: self._run_ricc2(*args), zip(jobs, runs))
+        #
+        gradient = {}
+        for result in results:
+            gradient.update(result.pop('gradient', {}))
+            for prop, value in result.items():
+                request.set(prop, value)
+        if 'gradient' in request:
+            request.set('gradient', gradient)
+
+    def _run_ricc2(self, job, mode):
+        """run ricc2 for a single mode of the plan and read all results of the run"""
+        if job.exists('gradient'): os.remove(job.path('gradient'))
+        self._prepare_control_adc(job, mode=mode)
+        ricc2_output = self.submit(job, 'ricc2')
+        if mode.get('gradient') == [0]:
+            return {'gradient': {0: self._read_gradient(job)}}
+        # every file is read only once
+        ricc2 = parse_ricc2_output(ricc2_output)
+        exstates = None
+        if self.nstates > 1 or 'gradient' in mode:
+            exstates = parse_exstates(job.path('exstates'), self.nstates-1+self.nghost_states,
+                                      self.molecule.natoms)
+        result = {}
+        if 'energy' in mode:
+            energies = [ricc2['mp2_energy']]
+            if exstates is not None:
+                energies += [ricc2['mp2_energy'] + ex for ex in exstates['excitation_energies'][:self.nstates-1]]
+            result['energy'] = energies
+        if 'fosc' in mode:
+            result['fosc'] = np.array([0.] + ricc2['fosc'])[:self.nstates]
+        if 'gradient' in mode:
+            result['gradient'] = exstates['gradients']
+        return result
+
+    def _do_gradient(self, job, request):
+        """the gradients of the states are computed concurrently in separate scratch
+           folders, all of them start from the converged scf of the job"""
+        if 'dscf' not in job.history:
+            self._prepare_control(job, mode={'energy': ''})
+            self._run_dscf(job)
+
+        def compute(state):
+            with self.runner.job(f'turbomole_state{state}', parent=job) as statejob:
+                if statejob.exists('gradient'): os.remove(statejob.path('gradient'))
+                if state == 0:
+                    return self._do_gs_gradient_dft(statejob)
+                return self._do_ex_gradient_dft(statejob, state)
+
         grad = {}
-        if 0 in request.states:
-            if exists_and_isfile('gradient'): os.remove('gradient')
-            if self.settings['method'] == 'ADC(2)':
-                grad.update(self._do_gs_gradient_adc(request))
-            elif self.settings['method'] == 'DFT/TDDFT':
-                grad.update(self._do_gs_gradient_dft(request))
-        for state in request.states:
-            if state == 0:
-                continue
-            if self.settings['method'] == 'ADC(2)':
-                grad.update(self._do_ex_gradient_adc(request, state))
-            if self.settings['method'] == 'DFT/TDDFT':
-                grad.update(self._do_ex_gradient_dft(request, state))
+        for result in self.runner.map(compute, request.states):
+            grad.update(result)
         request.set('gradient', grad)
 
-    def _do_energy_adc(self, request):
-        #create coord file
-        coord = self._write_coord(self.molecule.crd, filename='coord')
-        self._check_reffiles(coord)
-        mode = {'energy': ''}
-        if 'fosc' in request:
-            mode['fosc'] = True
-        self._prepare_control_adc(mode=mode)
-        #start calculations
-        if self.same_crd is False:
-            dscf_output = self.submit('dscf')
-        ricc2_output = self.submit('ricc2')
-        #read energies
-        mp2energy = self.reader(ricc2_output, ['MP2Energy'])['MP2Energy']
-        energies = [mp2energy]
-        if self.nstates > 1:
-            exenergies = self.reader('exstates', ['ADCExEnergies'], {'nstates': self.nstates-1+self.nghost_states})['ADCExEnergies']
-            exenergies = exenergies[:self.nstates-1]
-            if isinstance(exenergies, list):
-                for ex in exenergies:
-                    energies += [mp2energy + ex]
-            if isinstance(exenergies, float):
-                energies += [mp2energy + exenergies]
-        request.set('energy', energies)
-        #read oscillator strengths if requested
-        if 'fosc' in request:
-            fosc = [0.]
-            foscres = self.reader(ricc2_output, ['ADCFosc'])['ADCFosc']
-            if isinstance(foscres, list):
-                fosc += foscres
-            elif isinstance(foscres, float):
-                fosc += [foscres]
-            request.set('fosc', np.array(fosc).flatten()[:self.nstates])
-    
-    def _do_energy_dft(self, request):
-        #create coord file
-        coord = self._write_coord(self.molecule.crd, filename='coord')
-        self._check_reffiles(coord)
+    def _prepare_control(self, job, mode):
+        if self.settings['method'] == 'ADC(2)':
+            self._prepare_control_adc(job, mode=mode)
+        else:
+            self._prepare_control_dft(job, mode=mode)
+
+    def _run_dscf(self, job):
+        """the scf is run only once per scratch folder
+
+           If orbitals of a previous calculation are stored, the scf starts
+           from them, if it does not converge, it is repeated starting from
+           the reference orbitals.
+        """
+        if 'dscf' in job.history:
+            return parse_dscf_output(job.path('dscf.out'))
+        restarted = self.runner.load_restart(job, 'turbomole', self.orbital_files)
+        if restarted is True:
+            try:
+                out = parse_dscf_output(self.submit(job, 'dscf'))
+            except JobError:
+                out = {'scf_iterations': None}
+        else:
+            out = parse_dscf_output(self.submit(job, 'dscf'))
+        if restarted is True and out['scf_iterations'] is None:
+            self.logger.warning(f"Turbomole: no scf convergence from the previous orbitals in '{job.folder}', "
+                                "using the reference orbitals")
+            for filename in self.orbital_files + ['dscf_problem']:
+                if job.exists(filename): os.remove(job.path(filename))
+            job.copy_in(*self.orbital_files)
+            restarted = False
+            out = parse_dscf_output(self.submit(job, 'dscf'))
+        if out['scf_iterations'] is not None:
+            self.runner.record_scf('Turbomole', out['scf_iterations'], restarted)
+            self.runner.save_restart(job, 'turbomole', self.orbital_files)
+        return out
+
+    def _do_energy_dft(self, job, request):
         mode = {'energy': ''}
-        self._prepare_control_dft(mode=mode)
+        self._prepare_control_dft(job, mode=mode)
         #start calculations
-        if self.same_crd is False:
-            dscf_output = self.submit('dscf')
-        if self.nstates > 1:
-            escf_output = self.submit('escf')
-        #read energies
-        dscfenergy = self.reader(dscf_output, ['DSCFEnergy'])['DSCFEnergy']
-        energies = [dscfenergy]
+        dscf = self._run_dscf(job)
+        energies = [dscf['energy']]
+        fosc = [0.]
         if self.nstates > 1:
-            exenergies = self.reader(escf_output, ['ESCFEnergy'])['ESCFEnergy']
-            energies = exenergies[:self.nstates]
-        energies = np.array(energies).flatten()
-        request.set('energy', energies)
-        #read oscillator strengths if requested
+            escf = parse_escf_output(self.submit(job, 'escf'), nmax=self.nstates+self.nghost_states)
+            energies = escf['energies']
+            fosc += escf['fosc']
+        request.set('energy', np.array(energies)[:self.nstates])
         if 'fosc' in request:
-            fosc = [0.]
-            if self.nstates > 1:
-                foscread = self.reader(escf_output, ['ESCFFosc'])['ESCFFosc']
-                if isinstance(foscread, list):
-                        fosc += np.array(foscread).flatten()
-                if isinstance(foscread, float):
-                    fosc += [foscread]
-            request.set('fosc', np.array(fosc).flatten()[:self.nstates])
-
-    def _do_ex_gradient_dft(self, request, state):
-        coord = self._write_coord(self.molecule.crd, filename='coord')
-        self._check_reffiles(coord)
+            request.set('fosc', np.array(fosc)[:self.nstates])
+
+    def _read_gradient(self, job):
+        return read_gradient_file(job.path('gradient'), self.molecule.natoms)
+
+    def _do_ex_gradient_dft(self, job, state):
         mode = {'gradient': state}
-        self._prepare_control_dft(mode=mode)
-        if self.same_crd is False:
-            dscf_output = self.submit('dscf')
-        grad_output = self.submit('egrad')
-        return {state: np.array(self.reader('gradient', ['Gradient'], {'natoms': self.molecule.natoms, 'shift': self.molecule.natoms + 1})['Gradient'])}
+        self._prepare_control_dft(job, mode=mode)
+        self._run_dscf(job)
+        self.submit(job, 'egrad')
+        return {state: self._read_gradient(job)}
     
-    def _do_gs_gradient_adc(self, request):
-        coord = self._write_coord(self.molecule.crd, filename='coord')
-        self._check_reffiles(coord)
-        mode = {'gradient': 0}
-        self._prepare_control_adc(mode=mode)
-        if self.same_crd is False:
-            dscf_output = self.submit('dscf')
-        ricc2_output = self.submit('ricc2')
-        return {0: np.array(self.reader('gradient', ['Gradient'], {'natoms': self.molecule.natoms, 'shift': self.molecule.natoms + 1})['Gradient'])}
-
-    def _do_gs_gradient_dft(self, request):
-        coord = self._write_coord(self.molecule.crd, filename='coord')
-        self._check_reffiles(coord)
+    def _do_gs_gradient_dft(self, job):
         mode = {'gradient': 0}
-        self._prepare_control_dft(mode=mode)
-        if self.same_crd is False:
-            dscf_output = self.submit('dscf')
-        grad_output = self.submit('grad')
-        return {0: np.array(self.reader('gradient', ['Gradient'], {'natoms': self.molecule.natoms, 'shift': self.molecule.natoms + 1})['Gradient'])}
-
-    def _do_ex_gradient_adc(self, request, state):
-        coord = self._write_coord(self.molecule.crd, filename='coord')
-        self._check_reffiles(coord)
-        states = ''
-        c=0
-        mode = {'gradient': state}
-        self._prepare_control_adc(mode=mode)
-        if self.same_crd is False:
-            dscf_output = self.submit('dscf')
-        ricc2_output = self.submit('ricc2')
-        #read gradient output
-        res = self.reader('exstates', ['ADCExGrad'], {'natoms': self.molecule.natoms})
-        grad={}
-        if isinstance(res['ADCExPropState'], list):
-            for idx, state in enumerate(res['ADCExPropState']):
-                grad[state] = np.array(res['ADCExGradient'][idx])
-        else:
-            grad[res['ADCExPropState']] = np.array(res['ADCExGradient'])
-        return grad
+        self._prepare_control_dft(job, mode=mode)
+        self._run_dscf(job)
+        self.submit(job, 'grad')
+        return {0: self._read_gradient(job)}
 
-    def _prepare_control_adc(self, mode, reffile='control_ref'):
-        with open(reffile, 'r') as f:
+    def _prepare_control_adc(self, job, mode, reffile='control_ref'):
+        with open(job.path(reffile), 'r') as f:
             template = f.readlines()
-        with open('control', 'w') as f:
+        with open(job.path('control'), 'w') as f:
             for line in template:
                 if '$end' not in line:
                     if '$scfiterlimit' in line:
@@ -375,26 +327,23 @@ class Turbomole(AbinitioBase):
                     f.write(line)
                 else:
                     break
-            #for energies and fosc
-            if ('energy' in mode) or ('fosc' in mode):
+            #ground state gradient
+            if mode.get('gradient') == [0]:
+                f.write(tpl_gradient_gs)
+            #energies, fosc and excited state gradients in a single $excitations block
+            elif len(mode) != 0:
                 if 'fosc' in mode:
                     fosc = tpl_fosc
                 else:
                     fosc = ''
-                f.write(tpl_energy.render(states=self.nstates-1+self.nghost_states, fosc=fosc))
-            #for gradients
-            if 'gradient' in mode:
-                #check ground state gradient calculation
-                if mode['gradient'] == 0:
-                    f.write(tpl_gradient_gs)
-                else: 
-                    f.write(tpl_gradient_ex.render(states=self.nstates-1, gradstates=mode['gradient']))
+                f.write(tpl_excitations.render(states=self.nstates-1+self.nghost_states, fosc=fosc,
+                                               gradstates=state_ranges(mode.get('gradient', []))))
             f.write('\n$end')
     
-    def _prepare_control_dft(self, mode, reffile='control_ref'):
-        with open(reffile, 'r') as f:
+    def _prepare_control_dft(self, job, mode, reffile='control_ref'):
+        with open(job.path(reffile), 'r') as f:
             template = f.readlines()
-        with open('control', 'w') as f:
+        with open(job.path('control'), 'w') as f:
             for line in template:
                 if '$end' not in line:
                     if '$scfiterlimit' in line:
@@ -417,37 +366,25 @@ class Turbomole(AbinitioBase):
                     f.write(f"$exopt {mode['gradient']}")
             f.write('\n$end')
     
-    def _check_reffiles(self, coord, refcontrol=None, reforbitals=None):
-        #Check whether reference control file exists
-        if refcontrol is None:
-            refcontrol = 'control_ref'
-        if exists_and_isfile(refcontrol):
-            ctrl = True
-        else:
-            ctrl = False
-        #Check whether reference orbital file exists:
-        orbs = False
-        if reforbitals is None:
-            if exists_and_isfile('mos'):
-                orbs = True
-            if exists_and_isfile('alpha') and exists_and_isfile('beta'):
-                orbs = True
-        else:
-            if len(reforbitals) >  1:
-                for reffile in reforbitals:
-                    if exists_and_isfile(reffile):
-                        shutil.copy(reffile, './')
-                    else:
-                        self.logger.error('reference orbital files not found')
-            else:
-                if exists_and_isfile(reffile):
-                    shutil.copy(reffile, './')
-                else:
-                    self.logger.error('reference orbital file not found')
-            orbs = True
-        #run turbomole define input script if necessary
-        if (orbs and ctrl) is False:
-            self._run_define(coord, self.settings['basis'])
+    def _has_reference(self):
+        """reference control file and orbitals exist in the current folder"""
+        return exists_and_isfile('control_ref') and (exists_and_isfile('mos')
+                                                     or (exists_and_isfile('alpha')
+                                                         and exists_and_isfile('beta')))
+
+    def _setup_reference(self, crd):
+        """create the reference files in the current folder, if they do not exist,
+           define is run once in a scratch folder"""
+        with self._reference_lock:
+            if self._has_reference():
+                return
+            with self.runner.job('turbomole_define') as job:
+                self._write_coord(crd, filename=job.path('coord'))
+                self._run_define(job, 'coord', self.settings['basis'])
+                shutil.copyfile(job.path('control'), 'control_ref')
+                for filename in self.reference_files[1:]:
+                    if job.exists(filename):
+                        shutil.copyfile(job.path(filename), filename)
 
     def _write_coord(self, crd, filename='coord'):
         with open(filename, 'w') as crdfile:
@@ -457,7 +394,7 @@ class Turbomole(AbinitioBase):
             crdfile.write("$end")
         return filename
     
-    def _run_define(self, coord, basis):
+    def _run_define(self, job, coord, basis):
         self.logger.info('Run turbomole define script')
         define_in = f"""
         
@@ -472,19 +409,23 @@ class Turbomole(AbinitioBase):
         
         q
         """
-        define = subprocess.run('define',
-                                input=define_in.encode('utf-8'),
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE)
-        if not('define ended normally' in define.stderr.decode('utf-8').strip()):
-            self.logger.error('Error in generating the reference control file')
-        shutil.copyfile('control', 'control_ref')
-
-    def submit(self, exe):
+        run = job.run('define', stdin=define_in)
+        if not('define ended normally' in run.stderr):
+            raise JobError(f"Error in generating the reference control file in '{job.folder}': {run.stderr}")
+
+    def submit(self, job, exe):
+        """run a turbomole program in the scratch folder of the job, returns the path of the output"""
         output = exe + ".out"
-        cmd = f"{exe}"
-        with open(output, 'w') as outfile:
-            run = subprocess.run(cmd, stdout=outfile, stderr=subprocess.PIPE)
-        if not('ended normally' in run.stderr.decode('utf-8')):
-            self.logger.error(f"Error in Turbomole calculation: {cmd} with error: {run.stderr.decode('utf-8')}")
-        return output
+        run = job.run(exe, stdout=output)
+        if not('ended normally' in run.stderr):
+            raise JobError(f"Turbomole calculation {exe} in '{job.folder}' failed: {run.stderr}")
+        return job.path(output)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_reference_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reference_lock = threading.Lock()
@@ -1,22 +1,26 @@
 import os
-import subprocess as sp
+import threading
+#
+import numpy as np
 #
 from . import AbinitioBase
-from ...fileparser import  read_geom
-from .xtbhelp import XTBReader
+from .jobs import JobRunner, JobError
+from .parsers import parse_xtb_output, read_gradient_file, read_hessian_file
 from ...system import Molecule
-
-
-def run_interface(script, name):
-    print('############## Run section: ##############\nInterface %s call:' % name)
-    print(script)
-    error=sp.call(script, shell=True)
-    if error==0:
-        print('Finished!')
-    else:
-        print('*** Something went wrong! ***')
-        print("Error count = %d" % error)
-    return
+from ...logger import get_logger
+from ...utils.constants import bohr2angstrom
+#
+try:
+    from tblite.interface import Calculator as TBLiteCalculator
+except ImportError:
+    TBLiteCalculator = None
+#
+try:
+    from xtb.interface import Calculator as XTBCalculator
+    from xtb.libxtb import VERBOSITY_MUTED
+    from xtb.utils import get_method
+except ImportError:
+    XTBCalculator = None
 
 
 def write_content_to_file(fileName, content, options="w"):
@@ -29,6 +33,67 @@ def write_content_to_file(fileName, content, options="w"):
         f.write(content)
 
 
+class InProcessXTB:
+    """xtb calculator, that is kept alive across steps, using the tblite or the xtb python API"""
+
+    def __init__(self, atomids, gfn=2):
+        self.numbers = np.array(atomids, dtype=int)
+        self.method = f'GFN{gfn}-xTB'
+        self._calculator = None
+        self._result = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available():
+        return TBLiteCalculator is not None or XTBCalculator is not None
+
+    def compute(self, crd):
+        """energy and gradient, crd and results in atomic units
+
+           The result of the previous step is the initial guess of the scc,
+           if the scc fails from it, it is repeated from scratch.
+        """
+        crd = np.asarray(crd, dtype=np.double).reshape((len(self.numbers), 3))
+        with self._lock:
+            if self._calculator is None:
+                self._calculator = self._create(crd)
+            else:
+                self._calculator.update(crd)
+            try:
+                self._result = self._calculator.singlepoint(self._result)
+            except Exception:
+                if self._result is None:
+                    raise
+                self._result = self._calculator.singlepoint(None)
+            return self._read(self._result)
+
+    def _create(self, crd):
+        if TBLiteCalculator is not None:
+            calculator = TBLiteCalculator(self.method, self.numbers, crd)
+            calculator.set('verbosity', 0)
+            return calculator
+        calculator = XTBCalculator(get_method(self.method), self.numbers, crd)
+        calculator.set_verbosity(VERBOSITY_MUTED)
+        return calculator
+
+    @staticmethod
+    def _read(result):
+        if hasattr(result, 'get_energy'):
+            # xtb python API
+            return result.get_energy(), np.array(result.get_gradient())
+        return result.get('energy'), np.array(result.get('gradient'))
+
+    def __getstate__(self):
+        # the calculator is recreated after unpickling
+        return {'numbers': self.numbers, 'method': self.method}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._calculator = None
+        self._result = None
+        self._lock = threading.Lock()
+
+
 class XTBInterface(AbinitioBase):
 
     name = "XTB"
@@ -38,73 +103,113 @@ class XTBInterface(AbinitioBase):
     name = xtb calculation
     refgeom = :: existing_file
     filename = xtb_input.xyz
+    # GFN hamiltonian
+    gfn = 2 :: int :: [1, 2]
+    # auto: in-process calculation with tblite/xtb python, if they can be imported,
+    # otherwise run the executable
+    backend = auto :: str :: [auto, api, subprocess]
     """
 
     implemented = ['energy', 'gradient']
 
-    def __init__(self, executable, name, atomids, filename):
+    @classmethod
+    def _extend_user_input(cls, questions):
+        questions.generate_block("jobs", JobRunner.colt_user_input)
+
+    def __init__(self, executable, name, atomids, filename, runner=None, gfn=2, backend='auto'):
+        self.logger = get_logger('xtb_inter.log', 'xtb_interface')
         self.natoms = len(atomids)
         self.molecule = Molecule(atomids, None)
         self.name = name
         self.executable = executable
 #        self.natoms, self.atomnames, self.coords = read_geom(refgeom)
         self.ifile = filename
+        if runner is None:
+            runner = JobRunner()
+        if runner.logger is None:
+            runner.logger = self.logger
+        self.runner = runner
+        self.gfn = gfn
+        #
+        if backend == 'api' and not InProcessXTB.available():
+            raise ValueError("backend = api needs the tblite or xtb python package")
+        if backend != 'subprocess' and InProcessXTB.available():
+            self.api = InProcessXTB(atomids, gfn)
+        else:
+            self.api = None
 
     @classmethod
     def from_config(cls, config, atomids, nstates, nghost):
         assert nghost == 0
         if nstates > 1:
             raise Exception("Only Groundstate calculations possible")
-        return cls(config['executable'], config['name'], atomids, config['filename'])
-    
+        return cls(config['executable'], config['name'], atomids, config['filename'],
+                   runner=JobRunner.from_config(config['jobs']), gfn=config['gfn'],
+                   backend=config['backend'])
+
     def get(self, request):
-        self.molecule.crd = request.crd
-        self._write_general_inputs()
-        (en, dip), grad, _ = self._run_gradient()
+        if self.api is not None:
+            try:
+                en, grad = self.api.compute(request.crd)
+            except Exception as error:
+                self.logger.warning(f"{self.name}: in-process calculation failed ({error}), "
+                                    "running the executable")
+            else:
+                if 'gradient' in request:
+                    request['gradient'][0] = grad
+                request.set('energy', en)
+                return request
+        # each request is computed in its own scratch folder
+        with self.runner.job('xtb') as job:
+            self._write_general_inputs(job, request.crd)
+            (en, dip), grad, _ = self._run_gradient(job)
         if 'gradient' in request:
-            request['gradient'][0] = grad.reshape((self.natoms, 3))
+            request['gradient'][0] = grad
         request.set('energy', en)
         return request
 
-    def _write_general_inputs(self):
-        self.molecule.write_xyz(self.ifile)
-
-    def _run_energy(self):
-        command = "%s %s --sp --copy > output_energy" % (self.executable, self.ifile)
-        run_interface(command, self.name)
-        return (self._read_xtb_energy_and_dipole("output_energy"), None, None)
-
-    def _run_gradient(self):
-        command = "%s %s --grad --copy > output_gradient " % (self.executable,  self.ifile)
-        run_interface(command, self.name)
-        output = (self._read_xtb_energy_and_dipole("output_gradient"), self._read_xtb_gradient("gradient"), None)
-        self.clean_up()
-        return output
-
-    def _run_frequency(self):
-        (_, _), grad, _ = self._run_gradient()
-        command = "%s %s --hess --copy > output_freq" % (self.executable, self.ifile)
-        run_interface(command, self.name)
-        return (self._read_xtb_energy_and_dipole("output_freq"), 
-                grad, 
-                self._read_xtb_hessian("hessian"))
-
-
-    def clean_up(self):
-        os.rename("gradient", "grad_old")
-        return
-
-    def _read_xtb_energy_and_dipole(self, filename):
-        xtb = XTBReader(filename, ["Dipole", "Energy"])
-        return xtb["Energy"], xtb["Dipole"]
-
-    def _read_xtb_gradient(self, filename):
-        xtb = XTBReader(filename, ["Gradient"], {"NAtoms": self.natoms})
-        return xtb["Gradient"]
-
-    def _read_xtb_hessian(self, filename):
-        xtb = XTBReader(filename, ["Hessian"], {"NAtoms": self.natoms})
-        return xtb["Hessian"]
+    def _write_general_inputs(self, job, crd):
+        # crd is given in bohr, xtb reads the xyz file in angstrom
+        crd = np.asarray(crd, dtype=np.double) * bohr2angstrom
+        Molecule(self.molecule.atomids, crd).write_xyz(job.path(self.ifile))
+
+    def _run(self, job, options, output):
+        """run xtb in the scratch folder of the job
+
+           If the restart file of a previous calculation is stored, xtb starts
+           from it, if the scc does not converge, it is repeated from scratch.
+        """
+        command = f"{self.executable} {self.ifile} {options} --gfn {self.gfn} --copy"
+        if self.runner.load_restart(job, 'xtb', ['xtbrestart']) is True:
+            run = job.run(command, stdout=output)
+            if run.returncode == 0:
+                return self._converged(job, parse_xtb_output(job.path(output)), True)
+            self.logger.warning(f"{self.name}: no scc convergence from the restart file in "
+                                f"'{job.folder}', starting from scratch")
+            if job.exists('xtbrestart'): os.remove(job.path('xtbrestart'))
+        run = job.run(command, stdout=output)
+        if run.returncode != 0:
+            raise JobError(f"{self.name} in '{job.folder}' failed: {run.stderr}")
+        return self._converged(job, parse_xtb_output(job.path(output)), False)
+
+    def _converged(self, job, out, restarted):
+        self.runner.record_scf(self.name, out['scf_iterations'], restarted)
+        self.runner.save_restart(job, 'xtb', ['xtbrestart'])
+        return out
+
+    def _run_energy(self, job):
+        out = self._run(job, "--sp", "output_energy")
+        return ((out['energy'], out['dipole']), None, None)
+
+    def _run_gradient(self, job):
+        out = self._run(job, "--grad", "output_gradient")
+        return ((out['energy'], out['dipole']),
+                read_gradient_file(job.path("gradient"), self.natoms), None)
+
+    def _run_frequency(self, job):
+        (_, _), grad, _ = self._run_gradient(job)
+        out = self._run(job, "--hess", "output_freq")
+        return ((out['energy'], out['dipole']), grad, read_hessian_file(job.path("hessian")))
 
     @classmethod
     def get_coordinates(cls, atomid, coords):
@@ -18,41 +18,68 @@ class RequestGenerator:
         else:
             self.request = self._request
 
-    def _request(self, crd, properties, states=None, same_crd=False):
+    def _request(self, crd, properties, states=None, same_crd=False, out=None):
         """add more sanity checks!"""
         properties = properties + self._request_always
         if states is None:
-            return Request(crd, properties, list(range(self.nstates)), same_crd=same_crd)
-        return Request(crd, properties, states, same_crd=same_crd)
+            states = list(range(self.nstates))
+        return self._new(crd, properties, states, same_crd, out)
 
-    def _request_all(self, crd, properties, states=None, same_crd=False):
+    def _request_all(self, crd, properties, states=None, same_crd=False, out=None):
         properties = properties + self._request_always
-        return Request(crd, properties, list(range(self.nstates)), same_crd=same_crd)
+        return self._new(crd, properties, list(range(self.nstates)), same_crd, out)
+
+    @staticmethod
+    def _new(crd, properties, states, same_crd, out):
+        """recycle `out` if it fits the request, else create a new one"""
+        if out is not None and same_crd is False and out.fits(crd, properties, states):
+            return out.reset(crd)
+        return Request(crd, properties, states, same_crd=same_crd)
 
 
 class StateData:
 
+    __slots__ = ('_states', '_index', 'data')
+
     def __init__(self, states, shape):
         self._states = states
+        self._index = {state: i for i, state in enumerate(states)}
         sh = tuple([len(states)] + list(shape))
         self.data = np.empty(sh, dtype=np.double)
 
     def set_data(self, data):
-        """try to set everything"""
+        """try to set everything, data of all states is reduced to the requested states"""
         data = np.asarray(data)
+        if data.ndim == self.data.ndim and data.shape[0] > len(self._states) \
+                and data.shape[1:] == self.data.shape[1:]:
+            data = data[self._states]
         data = data.reshape(self.data.shape)
         self.data[:] = data
 
     def __setitem__(self, istate, value):
-        idx = self._states.index(istate)
+        try:
+            idx = self._index[istate]
+        except KeyError:
+            raise ValueError(f"State {istate} not requested") from None
         self.data[idx] = value
 
     def __getitem__(self, istate):
-        idx = self._states.index(istate)
+        try:
+            idx = self._index[istate]
+        except KeyError:
+            raise ValueError(f"State {istate} not requested") from None
         return self.data[idx]
 
 
 class Request(Mapping):
+    """Properties requested at a single crd
+
+       The buffers of state resolved properties are allocated once, a request
+       can be recycled for a new crd with the same properties and states
+       using `reset`, which avoids all allocations in the propagation loop.
+    """
+
+    __slots__ = ('_properties', 'states', 'crd', 'same_crd')
 
     def __init__(self, crd, properties, states, same_crd=False):
         self._properties = {prop: None for prop in properties if prop != 'crd'}
@@ -63,6 +90,20 @@ class Request(Mapping):
         if 'gradient' in properties:
             self._properties['gradient'] = StateData(states, self.crd.shape)
 
+    def fits(self, crd, properties, states):
+        """check if the request can be recycled for the given request"""
+        return (np.shape(crd) == self.crd.shape and list(states) == list(self.states)
+                and [prop for prop in properties if prop != 'crd'] == list(self._properties))
+
+    def reset(self, crd):
+        """recycle the request for a new crd, buffers are kept"""
+        np.copyto(self.crd, crd)
+        self.same_crd = False
+        for prop, value in self._properties.items():
+            if not isinstance(value, StateData):
+                self._properties[prop] = None
+        return self
+
     def set(self, name, value):
         """Ignore properties that are not requested!"""
         if name not in self._properties:
@@ -101,3 +142,9 @@ class Request(Mapping):
                 prop[state] = value
             except ValueError:
                 pass
+
+
+def stack_requests(requests):
+    """stack the results of a list of requests along a new first axis"""
+    data = [dict(request.iter_data()) for request in requests]
+    return {prop: np.array([values[prop] for values in data]) for prop in data[0]}
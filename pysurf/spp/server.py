@@ -0,0 +1,338 @@
+"""Serve a SurfacePointProvider over a Unix socket
+
+A single server per node owns the interface, the database and the
+interpolator, many trajectories connect to it using `SPPClient`, which
+provides the same `request` method as the `SurfacePointProvider`.
+
+Requests that arrive within a short time window are computed together
+using `SurfacePointProvider.request_batch`, identical requests are
+computed only once. Requests with `same_crd` are answered with the last
+result of the same client, if it fits the request.
+
+Each message is send as
+
+    lengths     two uint32, little endian: length of the meta data and of the array data
+    meta        json, containing the names, dtypes and shapes of the arrays
+    arrays      raw C-ordered arrays
+"""
+import json
+import os
+import socket
+import stat
+import struct
+import threading
+import time
+from queue import Queue, Empty
+#
+import numpy as np
+#
+from .request import Request
+
+
+_LENGTHS = struct.Struct('<II')
+
+
+class SPPServerError(Exception):
+    """Error raised by the server while computing a request"""
+
+
+def encode_message(meta, arrays=None):
+    """encode meta data and arrays into bytes"""
+    if arrays is None:
+        arrays = {}
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    meta = dict(meta, arrays=[[name, array.dtype.str, list(array.shape)]
+                              for name, array in arrays.items()])
+    meta = json.dumps(meta).encode('utf-8')
+    data = b''.join(array.tobytes() for array in arrays.values())
+    return _LENGTHS.pack(len(meta), len(data)) + meta + data
+
+
+def decode_message(meta, data):
+    """decode meta data and array data of a message"""
+    meta = json.loads(meta.decode('utf-8'))
+    arrays = {}
+    offset = 0
+    for name, dtype, shape in meta.pop('arrays'):
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape)
+        offset += count * dtype.itemsize
+    return meta, arrays
+
+
+def send_message(sock, meta, arrays=None):
+    sock.sendall(encode_message(meta, arrays))
+
+
+def recv_message(sock):
+    """receive a message, returns None if the connection was closed"""
+    lengths = _recv_exactly(sock, _LENGTHS.size)
+    if lengths is None:
+        return None
+    nmeta, ndata = _LENGTHS.unpack(lengths)
+    body = _recv_exactly(sock, nmeta + ndata)
+    if body is None:
+        return None
+    return decode_message(body[:nmeta], body[nmeta:])
+
+
+def _recv_exactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        nbytes = sock.recv_into(view[received:])
+        if nbytes == 0:
+            return None
+        received += nbytes
+    return bytes(buffer)
+
+
+def is_server_socket(filename):
+    """check if filename is the socket of a running server"""
+    try:
+        return stat.S_ISSOCK(os.stat(filename).st_mode)
+    except (OSError, TypeError):
+        return False
+
+
+class _Pending:
+    """request waiting to be computed"""
+
+    __slots__ = ('crd', 'properties', 'states', 'result', 'error', 'done')
+
+    def __init__(self, crd, properties, states):
+        self.crd = crd
+        self.properties = properties
+        self.states = states
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    @property
+    def group(self):
+        """requests of the same group are computed in a single batch"""
+        states = None if self.states is None else tuple(self.states)
+        return tuple(self.properties), states
+
+    @property
+    def key(self):
+        """identical requests have the same key"""
+        return self.crd.shape, self.crd.tobytes()
+
+
+class SPPServer:
+    """Answer requests of many clients using a single SurfacePointProvider"""
+
+    def __init__(self, spp, address, batch_window=0.002, logger=None, allow_client_shutdown=False):
+        """
+            Parameters
+            ----------
+
+                spp: SurfacePointProvider
+                    provider used to compute all requests
+
+                address: str
+                    filename of the Unix socket
+
+                batch_window: float, optional
+                    time in seconds, the server waits for further requests
+                    before a batch is computed
+
+                logger: Logger, optional
+                    logger to report the statistics of the server
+
+                allow_client_shutdown: bool, optional
+                    if True, any client can stop the server using
+                    `SPPClient.shutdown_server`, by default only the owner
+                    of the server can stop it by calling `shutdown`
+        """
+        self.spp = spp
+        self.address = address
+        self.batch_window = batch_window
+        self.logger = logger
+        self.allow_client_shutdown = allow_client_shutdown
+        #
+        self.nrequests = 0
+        self.ncomputed = 0
+        self.nbatches = 0
+        #
+        self._queue = Queue()
+        self._running = threading.Event()
+        self._socket = None
+
+    def serve_forever(self):
+        """accept clients until `shutdown` is called"""
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(self.address)
+        self._socket.listen()
+        self._socket.settimeout(0.1)
+        self._running.set()
+        #
+        dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        dispatcher.start()
+        try:
+            while self._running.is_set():
+                try:
+                    conn, _ = self._socket.accept()
+                except socket.timeout:
+                    continue
+                conn.settimeout(None)
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            self._running.clear()
+            dispatcher.join()
+            self._socket.close()
+            if os.path.exists(self.address):
+                os.remove(self.address)
+            self._log_statistics()
+
+    def wait_until_ready(self, timeout=None):
+        return self._running.wait(timeout)
+
+    def shutdown(self):
+        self._running.clear()
+
+    def _handle(self, conn):
+        """answer all requests of a single client"""
+        # last result of the client, reused for requests with same_crd
+        last = None
+        with conn:
+            while True:
+                message = recv_message(conn)
+                if message is None:
+                    return
+                meta, arrays = message
+                if meta['type'] == 'shutdown':
+                    if self.allow_client_shutdown is True:
+                        self._log('warning', "SPP server shut down by a client")
+                        self.shutdown()
+                        send_message(conn, {'type': 'shutdown'})
+                        return
+                    self._log('warning', "Shutdown requested by a client, "
+                                         "but client shutdown is disabled")
+                    send_message(conn, {'type': 'error', 'message':
+                                        'Shutdown by clients is disabled on this server'})
+                    continue
+                crd = np.array(arrays['crd'])
+                if meta.get('same_crd') is True and self._fits(last, crd, meta):
+                    request = last
+                else:
+                    pending = _Pending(crd, meta['properties'], meta['states'])
+                    self._queue.put(pending)
+                    pending.done.wait()
+                    if pending.error is not None:
+                        send_message(conn, {'type': 'error', 'message': pending.error})
+                        continue
+                    request = last = pending.result
+                send_message(conn, {'type': 'result', 'properties': list(request),
+                                    'states': [int(state) for state in request.states]},
+                             {prop: value for prop, value in request.iter_data()
+                              if value is not None})
+
+    @staticmethod
+    def _fits(request, crd, meta):
+        """check if the request answers a request for crd with the properties and states of meta"""
+        if request is None or not np.array_equal(request.crd, crd):
+            return False
+        states = request.states if meta['states'] is None else meta['states']
+        return request.fits(crd, meta['properties'], states)
+
+    def _dispatch(self):
+        """collect requests within the batch window and compute them"""
+        while self._running.is_set() or not self._queue.empty():
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except Empty:
+                continue
+            deadline = time.perf_counter() + self.batch_window
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except Empty:
+                    break
+            self._compute(batch)
+
+    def _compute(self, batch):
+        """compute a batch of requests, identical requests are only computed once"""
+        groups = {}
+        for pending in batch:
+            groups.setdefault(pending.group, {}).setdefault(pending.key, []).append(pending)
+        #
+        for (properties, states), unique in groups.items():
+            crds = [pendings[0].crd for pendings in unique.values()]
+            try:
+                results = self.spp.request_batch(crds, list(properties),
+                                                 None if states is None else list(states))
+            except Exception as error:
+                results = None
+                message = f"{error.__class__.__name__}: {error}"
+            #
+            self.nbatches += 1
+            self.ncomputed += len(crds)
+            self.nrequests += sum(len(pendings) for pendings in unique.values())
+            for i, pendings in enumerate(unique.values()):
+                for pending in pendings:
+                    if results is None:
+                        pending.error = message
+                    else:
+                        pending.result = results[i]
+                    pending.done.set()
+
+    def _log(self, level, message):
+        if self.logger is not None:
+            getattr(self.logger, level)(message)
+
+    def _log_statistics(self):
+        if self.logger is None:
+            return
+        self.logger.info(f"SPP server: {self.nrequests} requests, {self.ncomputed} computed "
+                         f"in {self.nbatches} batches")
+
+
+class SPPClient:
+    """Proxy for a SurfacePointProvider served by `SPPServer`"""
+
+    def __init__(self, address, timeout=None):
+        self.address = address
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(address)
+
+    def request(self, crd, properties, states=None, same_crd=False, out=None):
+        """same as `SurfacePointProvider.request`"""
+        crd = np.asarray(crd, dtype=np.double)
+        if states is not None:
+            states = [int(state) for state in states]
+        send_message(self._socket, {'type': 'request', 'properties': list(properties),
+                                    'states': states, 'same_crd': bool(same_crd)},
+                     {'crd': crd})
+        message = recv_message(self._socket)
+        if message is None:
+            raise SPPServerError(f"Connection to SPP server '{self.address}' closed")
+        meta, arrays = message
+        if meta['type'] == 'error':
+            raise SPPServerError(meta['message'])
+        if out is not None and out.fits(crd, meta['properties'], meta['states']):
+            request = out.reset(crd)
+        else:
+            request = Request(crd, meta['properties'], meta['states'], same_crd=same_crd)
+        for prop, value in arrays.items():
+            request.set(prop, np.array(value))
+        return request
+
+    def shutdown_server(self):
+        """stop the server, only possible if it allows the shutdown by clients"""
+        send_message(self._socket, {'type': 'shutdown'})
+        message = recv_message(self._socket)
+        if message is not None and message[0]['type'] == 'error':
+            raise SPPServerError(message[0]['message'])
+
+    def close(self):
+        self._socket.close()
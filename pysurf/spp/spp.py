@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
 # Numpy
 import numpy as np
 # Database related
@@ -9,7 +10,8 @@ from ..logger import get_logger, Logger
 # Interpolation
 from .dbinter import DataBaseInterpolation
 #
-from .request import RequestGenerator
+from .request import RequestGenerator, stack_requests
+from .cache import ResultCache
 
 """
 TODO:
@@ -62,6 +64,18 @@ class SurfacePointProvider(Colt):
         logging = debug :: str ::
         mode = ab-initio
         use_db = no
+        # executor used for asynchronous requests:
+        # none computes the request directly, thread is suited for interfaces
+        # that run external programs, process for in-process python models
+        executor = none :: str :: [none, thread, process]
+        # number of requests that are computed at the same time, 1 if a database is used
+        max_workers = 1 :: int
+        # number of geometries kept in the result cache, 0 disables the in-memory cache
+        cache_size = 0 :: int
+        # crds are rounded to this number of decimals to find cached results
+        cache_decimals = 8 :: int
+        # folder in which cached results are stored on disk, optional
+        cache_folder = :: folder, optional
         """
     # different modes
     _modes = {'ab-initio': AbinitioFactory,
@@ -123,10 +137,14 @@ class SurfacePointProvider(Colt):
         return cls(config['mode'], config['use_db'],
                    properties, nstates, natoms,
                    nghost_states=nghost_states, atomids=atomids, logger=logger,
-                   logging_level=config['logging'])
+                   logging_level=config['logging'], executor=config['executor'],
+                   max_workers=config['max_workers'], cache_size=config['cache_size'],
+                   cache_decimals=config['cache_decimals'], cache_folder=config['cache_folder'])
 
     def __init__(self, mode_config, use_db, properties, nstates, natoms, *,
-                 nghost_states=0, atomids=None, logger=None, logging_level='debug'):
+                 nghost_states=0, atomids=None, logger=None, logging_level='debug',
+                 executor='none', max_workers=1, cache_size=0, cache_decimals=8,
+                 cache_folder=None):
         """ The inputfile for the SPP has to provide the necessary
             information, how to produce the data at a specific point
             in the coordinate space.
@@ -161,6 +179,21 @@ class SurfacePointProvider(Colt):
 
                 logger: Logger, optional
                     objected used for loggin, if None, a new one will be created
+
+                executor: str, optional
+                    Executor used for `request_async`: 'none', 'thread' or 'process'
+
+                max_workers: int, optional
+                    Number of requests that are computed at the same time
+
+                cache_size: int, optional
+                    Number of geometries kept in the in-memory result cache
+
+                cache_decimals: int, optional
+                    Number of decimals the crds are rounded to, to find cached results
+
+                cache_folder: str, optional
+                    Folder in which cached results are stored on disk
         """
         if logger is None:
             self.logger = get_logger('spp.log', 'SPP', [])
@@ -170,7 +203,9 @@ class SurfacePointProvider(Colt):
         self._request, self._interface = self._select_interface(mode_config, use_db, 
                                                                 properties, natoms, 
                                                                 nstates, nghost_states, 
-                                                                atomids)
+                                                                atomids, cache_size,
+                                                                cache_decimals, cache_folder)
+        self._executor = self._select_executor(executor, max_workers, use_db)
 
     @property
     def interpolator(self):
@@ -179,7 +214,7 @@ class SurfacePointProvider(Colt):
             raise Exception("Interpolator not available")
         return interpolator
 
-    def request(self, crd, properties, states=None, same_crd=False):
+    def request(self, crd, properties, states=None, same_crd=False, out=None):
         """ The get method is the method which should be called by
             external programs, which want to use the SPP. As an
             input it takes the crdinates and gives back the
@@ -187,12 +222,94 @@ class SurfacePointProvider(Colt):
 
             It does not perform any sanity checks anylonger, so insure that all
             possible requested properties are in used!
+
+            A request returned by a previous call can be passed as `out`,
+            it is recycled, if it has the same properties and states.
         """
-        datacontainer = self._request.request(crd, properties, states, same_crd=same_crd)
-        return self._interface.get(datacontainer)
+        return self.request_async(crd, properties, states, same_crd=same_crd, out=out).result()
+
+    def request_async(self, crd, properties, states=None, same_crd=False, out=None):
+        """ Same as `request`, but returns a `concurrent.futures.Future`,
+            so that the caller can continue while the request is computed.
+            Within asyncio, it can be awaited using `asyncio.wrap_future`.
+
+            Requests are computed in the order they are submitted, if only one
+            worker is used.
+        """
+        return self._submit(self._request.request(crd, properties, states, same_crd=same_crd, out=out))
+
+    def request_many(self, crds, properties, states=None):
+        """ Compute the properties for many crdinates at once
+
+            Interfaces that provide a `get_batch` method, e.g. the database
+            interpolation, compute all requests in a single call,
+            else the requests are distributed over the executor.
+
+            Returns
+            -------
+                dict
+                    results of all properties, stacked in the order of the crds
+        """
+        results = self.request_batch(crds, properties, states)
+        if len(results) == 0:
+            return {}
+        return stack_requests(results)
+
+    def request_batch(self, crds, properties, states=None):
+        """ Same as `request_many`, but returns the list of filled requests """
+        requests = [self._request.request(crd, properties, states) for crd in crds]
+        if len(requests) == 0:
+            return []
+        get_batch = getattr(self._interface, 'get_batch', None)
+        if get_batch is not None:
+            return get_batch(requests)
+        return [future.result() for future in [self._submit(request) for request in requests]]
+
+    def _submit(self, request):
+        """compute the request on the executor"""
+        if self._executor is None:
+            future = Future()
+            try:
+                future.set_result(self._interface.get(request))
+            except Exception as error:
+                future.set_exception(error)
+            return future
+        if isinstance(self._executor, ProcessPoolExecutor):
+            return self._executor.submit(_get_from_worker_interface, request)
+        return self._executor.submit(self._interface.get, request)
+
+    def close(self):
+        """shut down the executor"""
+        if self.cache is not None:
+            stats = self.cache.statistics()
+            self.logger.info(f"Result cache: {stats['hits']} hits, {stats['partial_hits']} partial hits, "
+                             f"{stats['misses']} misses, hit rate {stats['hit_rate']:.2%}")
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _select_executor(self, executor, max_workers, use_db):
+        """Setup the executor for asynchronous requests"""
+        if executor == 'none':
+            return None
+        if executor == 'process' and use_db == 'yes':
+            # the database can only be written by a single process
+            self.logger.warning("Database cannot be shared between processes, using threads instead")
+            executor = 'thread'
+        if use_db == 'yes' and max_workers != 1:
+            # frames are appended variable by variable, concurrent requests would mix them
+            self.logger.warning("Database cannot be written by concurrent requests, using a single worker")
+            max_workers = 1
+        if executor == 'thread':
+            return ThreadPoolExecutor(max_workers=max_workers)
+        if executor == 'process':
+            return ProcessPoolExecutor(max_workers=max_workers, initializer=_setup_worker_interface,
+                                       initargs=(self._interface,))
+        raise ValueError(f"Executor '{executor}' unknown, use one of none, thread, process")
 
     def _select_interface(self, mode_config, use_db, properties, natoms, 
-                          nstates, nghost_states, atomids):
+                          nstates, nghost_states, atomids, cache_size=0, cache_decimals=8,
+                          cache_folder=None):
         """Select the correct interface based on the mode"""
         #
         if mode_config == 'model':
@@ -209,14 +326,26 @@ class SurfacePointProvider(Colt):
             self.logger.error("Mode has to be 'model' or 'ab-initio'")
         # check default
         self._check_properties(properties, interface)
+        # cache results of the interface
+        self.cache = None
+        if cache_size > 0 or cache_folder is not None:
+            self.logger.info(f"Caching results of up to {cache_size} geometries in memory"
+                             + ("" if cache_folder is None else f" and in folder '{cache_folder}'"))
+            interface = self.cache = ResultCache(interface, size=cache_size, decimals=cache_decimals,
+                                                 folder=cache_folder)
         # use databse
         if use_db == 'yes':
             self.logger.info("Setting up database...")
             interface = DataBaseInterpolation.from_config(use_db, interface, natoms, nstates, 
-                                              properties, model=(mode_config=='model'))
+                                              properties, model=(mode_config=='model'),
+                                              atomids=atomids)
             if use_db['properties'] is not None:
                 properties += use_db['properties']
-            request = RequestGenerator(nstates, properties, use_db=True)
+            if use_db['partial_frames'] is True:
+                # only the requested properties and states are computed
+                request = RequestGenerator(nstates)
+            else:
+                request = RequestGenerator(nstates, properties, use_db=True)
             self.logger.info("Database ready to use")
         else:
             request = RequestGenerator(nstates)
@@ -233,6 +362,19 @@ Implemented: {interface.implemented}
         self.logger.info(f"Interface {interface} provides all necessary properties")
 
 
+# interface of a worker process of the ProcessPoolExecutor
+_worker_interface = None
+
+
+def _setup_worker_interface(interface):
+    global _worker_interface
+    _worker_interface = interface
+
+
+def _get_from_worker_interface(request):
+    return _worker_interface.get(request)
+
+
 def get_spp(configfile, properties, nstates, natoms, *,
         nghost_states=0, atomids=None, logger=None, checkonly=True):
     """Initialize a Surface point provider from a config file 
@@ -0,0 +1,57 @@
+"""Storage of interpolation weights and descriptors
+
+Weights and descriptors can be kept in single precision, computations
+using them are still done in double precision. Out of core, the weights
+are written to memory mapped files, that are removed as soon as they are
+mapped, so that only the pages in use are held in memory.
+"""
+import os
+from tempfile import mkstemp
+#
+import numpy as np
+
+
+class WeightStorage:
+    """Store arrays in the selected precision, in memory or out of core"""
+
+    dtypes = {'double': np.double, 'single': np.float32}
+
+    def __init__(self, precision='double', folder=None):
+        if precision not in self.dtypes:
+            raise ValueError(f"Precision '{precision}' unknown, use one of {list(self.dtypes)}")
+        self.precision = precision
+        self.dtype = self.dtypes[precision]
+        self.folder = folder
+
+    @property
+    def out_of_core(self):
+        return self.folder is not None
+
+    def store(self, array, dtype=None):
+        """return the array in storage precision, or in dtype if given,
+           memory mapped if out of core"""
+        # memory mapped arrays of model files stay mapped
+        array = np.asanyarray(array)
+        if dtype is None:
+            dtype = self.dtype
+        if self.folder is None:
+            return array.astype(dtype, copy=False)
+        os.makedirs(self.folder, exist_ok=True)
+        fhandle, filename = mkstemp(suffix='.npy', dir=self.folder)
+        os.close(fhandle)
+        mapped = np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=array.shape)
+        # the mapping stays valid after the file is removed
+        os.remove(filename)
+        mapped[...] = array
+        return mapped
+
+
+def nbytes(arrays):
+    """bytes held in memory and bytes memory mapped"""
+    memory, mapped = 0, 0
+    for array in arrays:
+        if isinstance(array, np.memmap):
+            mapped += array.nbytes
+        elif isinstance(array, np.ndarray):
+            memory += array.nbytes
+    return {'memory': memory, 'mapped': mapped}
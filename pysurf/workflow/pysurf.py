@@ -48,11 +48,7 @@ def spp_calc(sppinp: "file", atomids: "ilist", nstates: "int", properties: "list
 
 @engine.register_action
 def get_energies(spp: "spp", crds: "crds") -> "array2D":
-    energies = []
-    for crd in crds:
-        request = spp.request(crd, ['energy'])
-        energies += [request['energy']] 
-    return np.array(energies)
+    return spp.request_many(crds, ['energy'])['energy']
 
 @engine.register_action
 def sampler(samplerinp: "file") -> "sampler":
@@ -0,0 +1,41 @@
+from pytest import fixture
+import numpy as np
+
+from pysurf.database import PySurfDB
+
+
+def harmonic_energy(x, iframe):
+    """energies of two shifted harmonic states"""
+    return [x@x, (x-1)@(x-1)]
+
+
+@fixture
+def make_db(tmp_path):
+    """factory of databases filled with random geometries
+
+       make_db(nframes, seed, properties=None, natoms=None, filename='db.dat')
+
+       properties maps the name of each property to a function of the geometry
+       and the index of the frame, by default the energies of two shifted
+       harmonic states are stored. Without natoms, the geometries are two
+       normal modes of a model.
+    """
+    def make_db(nframes, seed, properties=None, natoms=None, filename='db.dat'):
+        if properties is None:
+            properties = {'energy': harmonic_energy}
+        if natoms is None:
+            dimensions, shape = {'nmodes': 2}, (2,)
+        else:
+            dimensions, shape = {'natoms': natoms}, (natoms, 3)
+        dimensions.update({'nstates': 2, 'nactive': 2})
+        db = PySurfDB.generate_database(str(tmp_path / filename), data=['crd', *properties],
+                                        dimensions=dimensions, model=natoms is None)
+        rng = np.random.default_rng(seed)
+        for iframe in range(nframes):
+            x = rng.normal(size=shape)
+            db.append('crd', x)
+            for prop, compute in properties.items():
+                db.append(prop, compute(x, iframe))
+            db.increase
+        return db
+    return make_db
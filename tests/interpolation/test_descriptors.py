@@ -0,0 +1,61 @@
+from pytest import fixture, raises
+import os
+import numpy as np
+from scipy.spatial.distance import pdist
+
+from pysurf.spp.descriptors import Descriptor, DescriptorStore, get_descriptor
+
+
+def add_frame(db, crd):
+    db.append('crd', crd)
+    db.append('energy', [0.0, 1.0])
+    db.increase
+
+
+@fixture
+def db(make_db):
+    return make_db(10, seed=4, properties={'energy': lambda x, i: [0.0, 1.0]}, natoms=4)
+
+
+def test_distances_agree_with_pdist(db):
+    crds = np.array(db['crd'])
+    assert np.allclose(get_descriptor('internal').compute(crds), [pdist(crd) for crd in crds])
+    assert np.allclose(get_descriptor('inverse').compute(crds), [1.0/pdist(crd) for crd in crds])
+
+
+def test_cutoff_descriptor():
+    crd = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [20.0, 0.0, 0.0]])
+    values = get_descriptor('cutoff')(crd)
+    assert values[0] > 0.0
+    assert values[1] == 0.0 and values[2] == 0.0
+
+
+def test_store_is_persistent_and_incremental(db):
+    store = DescriptorStore(db, get_descriptor('internal'))
+    assert store.update().shape == (10, 6)
+    assert os.path.isfile(store.filename)
+    # frames added later are appended to the stored descriptors
+    add_frame(db, np.arange(12, dtype=float).reshape((4, 3)))
+    store = DescriptorStore(db, get_descriptor('internal'))
+    data = store.update()
+    assert data.shape == (11, 6)
+    assert np.allclose(data[-1], pdist(np.arange(12, dtype=float).reshape((4, 3))))
+
+
+def test_permutation_invariance():
+    atomids = ['O', 'H', 'H', 'C']
+    crd = np.random.default_rng(5).normal(size=(4, 3))
+    swapped = crd[[0, 2, 1, 3]]
+    for name in ('sorted', 'symmetric'):
+        descriptor = get_descriptor(name, atomids)
+        assert np.allclose(descriptor(crd), descriptor(swapped))
+    # the plain distances are not invariant
+    assert not np.allclose(get_descriptor('internal')(crd), get_descriptor('internal')(swapped))
+
+
+def test_incomplete_descriptor_fails_at_instantiation():
+    class Incomplete(Descriptor):
+        name = 'incomplete'
+
+    with raises(TypeError):
+        Incomplete()
@@ -0,0 +1,104 @@
+from pytest import fixture, raises
+import os
+import numpy as np
+
+from pysurf.spp import Interpolator
+from pysurf.spp.request import Request
+from pysurf.spp.modelfile import save_model, load_model, ModelFileError, ALIGNMENT
+from pysurf.logger import get_logger
+
+
+def energy(x):
+    return np.array([x@x, (x-1)@(x-1)])
+
+
+@fixture
+def db(make_db):
+    return make_db(20, seed=9)
+
+
+def test_model_file_roundtrip(tmp_path):
+    filename = str(tmp_path / 'model.bin')
+    arrays = {'a': np.arange(7, dtype=np.double), 'b': np.ones((3, 2), dtype=np.float32),
+              'c': np.arange(5, dtype=np.int64)}
+    save_model(filename, arrays, {'name': 'test'})
+    loaded, metadata = load_model(filename)
+    assert metadata == {'name': 'test'}
+    for name, array in arrays.items():
+        assert isinstance(loaded[name], np.memmap)
+        assert loaded[name].offset % ALIGNMENT == 0
+        assert loaded[name].dtype == array.dtype
+        assert np.all(loaded[name] == array)
+    # modifications are not written back to the file
+    loaded['a'][:] = 0.0
+    assert np.all(load_model(filename)[0]['a'] == arrays['a'])
+
+
+def test_model_file_rejects_other_files(tmp_path):
+    filename = tmp_path / 'weights.nc'
+    filename.write_bytes(b'CDF\x01' + bytes(100))
+    with raises(ModelFileError):
+        load_model(str(filename))
+
+
+def test_weights_are_loaded_from_file(db, tmp_path):
+    weightsfile = str(tmp_path / 'weights.bin')
+    logger = get_logger(None, 'test')
+    reg = Interpolator.plugins['RegInterpolator'](db, ['energy'], logger, weightsfile=weightsfile)
+    crd = np.array([0.2, 0.4])
+    ref, _ = reg.get(Request(crd, ['energy'], [0, 1]))
+    # the second interpolator does not train, but maps the weights of the file
+    loaded = Interpolator.plugins['RegInterpolator'](db, ['energy'], logger, weightsfile=weightsfile)
+    assert isinstance(loaded.interpolators['energy'].weights, np.memmap)
+    request, _ = loaded.get(Request(crd, ['energy'], [0, 1]))
+    assert np.allclose(request['energy'], ref['energy'])
+
+
+def test_outdated_weights_are_retrained(db, tmp_path):
+    weightsfile = str(tmp_path / 'weights.bin')
+    logger = get_logger(None, 'test')
+    Interpolator.plugins['RbfInterpolator'](db, ['energy'], logger, weightsfile=weightsfile)
+    x = np.array([0.5, 0.5])
+    db.append('crd', x)
+    db.append('energy', energy(x))
+    db.increase
+    rbf = Interpolator.plugins['RbfInterpolator'](db, ['energy'], logger, weightsfile=weightsfile)
+    assert not isinstance(rbf.interpolators['energy'].nodes, np.memmap)
+    assert rbf.interpolators['energy'].nodes.shape[0] == 21
+    request, _ = rbf.get(Request(x, ['energy'], [0, 1]))
+    assert np.allclose(request['energy'], energy(x))
+
+
+def test_model_cache(db, tmp_path):
+    cache = str(tmp_path / 'cache')
+    logger = get_logger(None, 'test')
+    reg = Interpolator.plugins['RegInterpolator'](db, ['energy'], logger, model_cache=cache)
+    filename = reg.cached_model_file()
+    assert os.path.isfile(filename)
+    # same training set and hyperparameters: the model is loaded from the cache
+    loaded = Interpolator.plugins['RegInterpolator'](db, ['energy'], logger, model_cache=cache)
+    assert isinstance(loaded.interpolators['energy'].weights, np.memmap)
+    # different hyperparameters or training set give a different model
+    other = Interpolator.plugins['RegInterpolator'](db, ['energy'], logger, model_cache=cache,
+                                                    regularization=1e-6)
+    assert other.cached_model_file() != filename
+    db.append('crd', np.zeros(2))
+    db.append('energy', energy(np.zeros(2)))
+    db.increase
+    assert reg.cached_model_file() != filename
+    assert len(os.listdir(cache)) == 2
+
+
+def test_rbf_epsilon_forces_retrain(db, tmp_path):
+    weightsfile = str(tmp_path / 'weights.bin')
+    cache = str(tmp_path / 'cache')
+    logger = get_logger(None, 'test')
+    first = Interpolator.plugins['RbfInterpolator'](db, ['energy'], logger, weightsfile=weightsfile,
+                                                    epsilon=0.5)
+    cached = Interpolator.plugins['RbfInterpolator'](db, ['energy'], logger, model_cache=cache, epsilon=0.5)
+    for kwargs in ({'weightsfile': weightsfile}, {'model_cache': cache}):
+        rbf = Interpolator.plugins['RbfInterpolator'](db, ['energy'], logger, epsilon=2.0, **kwargs)
+        assert rbf.epsilon == 2.0
+        assert not isinstance(rbf.interpolators['energy'].nodes, np.memmap)
+        assert not np.allclose(rbf.interpolators['energy'].nodes, first.interpolators['energy'].nodes)
+    assert rbf.cached_model_file() != cached.cached_model_file()
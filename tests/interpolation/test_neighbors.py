@@ -0,0 +1,82 @@
+from pytest import raises
+import numpy as np
+
+from pysurf.spp import Interpolator
+from pysurf.spp.request import Request
+from pysurf.spp.neighbors import NeighborIndex, ExactIndex, RandomProjectionForest, recall
+from pysurf.logger import get_logger
+
+
+def test_forest_agrees_with_exact_conventions():
+    data = np.random.default_rng(6).normal(size=(50, 3))
+    # a single leaf contains all points, so the search is exact
+    forest = RandomProjectionForest(ntrees=1, leaf_size=64).build(data)
+    exact = ExactIndex().build(data)
+    for k in (1, 3):
+        for query in (data[0] + 0.01, data[:5] + 0.01):
+            dist, idx = forest.query(query, k=k)
+            ref_dist, ref_idx = exact.query(query, k=k)
+            assert np.shape(idx) == np.shape(ref_idx)
+            assert np.allclose(dist, ref_dist)
+            assert np.all(idx == ref_idx)
+
+
+def test_incomplete_index_fails_at_instantiation():
+    class Incomplete(NeighborIndex):
+        name = 'incomplete'
+
+        def build(self, data):
+            return self
+
+    with raises(TypeError):
+        Incomplete()
+
+
+def test_forest_fills_missing_neighbors():
+    data = np.random.default_rng(5).normal(size=(200, 3))
+    forest = RandomProjectionForest(ntrees=1, leaf_size=4).build(data)
+    dist, idx = forest.query(data[:3] + 0.01, k=50)
+    ref_dist, ref_idx = ExactIndex().build(data).query(data[:3] + 0.01, k=50)
+    assert np.all(idx < len(data)) and np.all(np.isfinite(dist))
+    assert np.allclose(dist, ref_dist)
+
+
+def test_forest_recall():
+    rng = np.random.default_rng(7)
+    data = rng.normal(size=(2000, 20))
+    queries = data[:100] + 0.1*rng.normal(size=(100, 20))
+    few = recall(RandomProjectionForest(ntrees=1, leaf_size=16).build(data), data, queries)
+    many = recall(RandomProjectionForest(ntrees=16, leaf_size=16).build(data), data, queries)
+    assert many >= few
+    assert many > 0.9
+
+
+def test_nearest_neighbor_interpolator_with_forest(make_db):
+    db = make_db(100, seed=8)
+    nn = Interpolator.plugins['NearestNeighborInterpolator'](db, ['energy'], get_logger(None, 'test'),
+                                                             nn_index=RandomProjectionForest(4, 8))
+    request, is_trustworthy = nn.get(Request(np.copy(db['crd'][7]) + 1e-4, ['energy'], [0, 1]))
+    assert is_trustworthy
+    assert np.allclose(request['energy'], db['energy'][7])
+
+
+def test_nearest_neighbor_call_without_index(make_db):
+    db = make_db(20, seed=4)
+    nn = Interpolator.plugins['NearestNeighborInterpolator'](db, ['energy'], get_logger(None, 'test'))
+    crd = np.copy(db['crd'][3]) + 1e-4
+    # the neighbor search is done by the interpolator of the property
+    energy = nn.interpolators['energy'](nn.descriptor(crd), Request(crd, ['energy'], [0, 1]))
+    assert np.allclose(energy, db['energy'][3])
+    assert np.allclose(nn.predict_energy(nn.descriptor.compute(crd[np.newaxis])), [db['energy'][3]])
+
+
+def test_shepard_with_small_leaves(make_db):
+    db = make_db(100, seed=9)
+    logger = get_logger(None, 'test')
+    shepard = Interpolator.plugins['ShepardInterpolator'](db, ['energy'], logger, nneighbors=8,
+                                                          nn_index=RandomProjectionForest(1, 4))
+    ref = Interpolator.plugins['ShepardInterpolator'](db, ['energy'], logger, nneighbors=8)
+    crd = np.array([0.3, -0.2])
+    request, _ = shepard.get(Request(np.copy(crd), ['energy'], [0, 1]))
+    reference, _ = ref.get(Request(np.copy(crd), ['energy'], [0, 1]))
+    assert np.allclose(request['energy'], reference['energy'])
@@ -0,0 +1,115 @@
+from pytest import fixture, mark
+import numpy as np
+
+from pysurf.spp import Interpolator
+from pysurf.spp.request import Request
+from pysurf.spp.spp import SurfacePointProvider
+from pysurf.spp.neighbors import RandomProjectionForest
+from pysurf.database import PySurfDB
+from pysurf.logger import get_logger
+
+
+def alternating_gradient(x, i):
+    gradient = np.zeros((2, 2))
+    gradient[i % 2] = 2*(x - i % 2)
+    return gradient
+
+
+@fixture
+def db(make_db):
+    """gradient of state 0 in the even frames, of state 1 in the odd frames"""
+    return make_db(30, seed=2, properties={'energy': lambda x, i: [x@x, (x-1)@(x-1)],
+                                           'energy_mask': lambda x, i: [1],
+                                           'gradient': alternating_gradient,
+                                           'gradient_mask': lambda x, i: [i % 2 == 0, i % 2 == 1]})
+
+
+@fixture
+def db_state0(make_db):
+    """only the gradient of state 0 is stored"""
+    return make_db(20, seed=3, filename='db0.dat',
+                   properties={'energy': lambda x, i: [x@x, (x-1)@(x-1) + 1],
+                               'energy_mask': lambda x, i: [1],
+                               'gradient': lambda x, i: [2*x, np.zeros(2)],
+                               'gradient_mask': lambda x, i: [1, 0]})
+
+
+def get_interpolator(name, db, **kwargs):
+    return Interpolator.plugins[name](db, ['energy', 'gradient'], get_logger(None, 'test'), **kwargs)
+
+
+def test_column_groups(db):
+    interpolator = get_interpolator('ShepardInterpolator', db)
+    assert interpolator.property_mask('energy') is None
+    groups = interpolator.column_groups('gradient')
+    assert len(groups) == 2
+    for frames, columns in groups:
+        assert frames.sum() == 15
+        assert len(columns) == 2
+
+
+def test_rbf_partial_frames(db):
+    rbf = get_interpolator('RbfInterpolator', db)
+    # the rbf is exact at the frames that store the gradient of a state
+    for i in (4, 7):
+        state = i % 2
+        request, _ = rbf.get(Request(np.copy(db['crd'][i]), ['energy', 'gradient'], [0, 1]))
+        assert np.allclose(request['gradient'][state], db['gradient'][i][state])
+        assert np.allclose(request['energy'], db['energy'][i])
+
+
+def test_shepard_partial_frames(db):
+    shepard = get_interpolator('ShepardInterpolator', db, nneighbors=1)
+    crd = np.copy(db['crd'][4])
+    request, is_trustworthy = shepard.get(Request(crd, ['energy', 'gradient'], [0]))
+    assert is_trustworthy
+    assert np.allclose(request['gradient'][0], db['gradient'][4][0])
+    # the closest frame does not store the gradient of state 1
+    _, is_trustworthy = shepard.get(Request(crd, ['energy', 'gradient'], [1]))
+    assert not is_trustworthy
+
+
+@mark.parametrize('nn_index', [None, RandomProjectionForest(ntrees=2, leaf_size=4)])
+def test_nearest_neighbor_partial_frames(db, nn_index):
+    nn = get_interpolator('NearestNeighborInterpolator', db, nn_index=nn_index)
+    crd = np.copy(db['crd'][4])
+    request, _ = nn.get(Request(crd, ['energy', 'gradient'], [0, 1]))
+    odd = np.array(db['crd'])[1::2]
+    closest = 2*np.argmin(np.linalg.norm(odd - crd, axis=1)) + 1
+    assert np.allclose(request['gradient'][0], db['gradient'][4][0])
+    assert np.allclose(request['gradient'][1], db['gradient'][closest][1])
+
+
+@mark.parametrize('name', ['RbfInterpolator', 'NearestNeighborInterpolator', 'RegInterpolator'])
+def test_uncovered_entries_not_trustworthy(db_state0, name):
+    interpolator = get_interpolator(name, db_state0)
+    crd = np.copy(db_state0['crd'][5]) + 1e-3
+    _, is_trustworthy = interpolator.get(Request(np.copy(crd), ['energy', 'gradient'], [0]))
+    assert is_trustworthy
+    # no frame stores the gradient of state 1
+    _, is_trustworthy = interpolator.get(Request(np.copy(crd), ['energy', 'gradient'], [1]))
+    assert not is_trustworthy
+
+
+def test_database_stores_partial_frames(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    filename = tmp_path / 'spp.inp'
+    filename.write_text("""
+mode = model
+use_db = yes
+
+[mode(model)]
+model = PyrazineSchneider
+
+[use_db(yes)]
+write_only = yes
+partial_frames = True
+database = db.dat
+""")
+    spp = SurfacePointProvider.from_questions(['energy', 'gradient'], 3, 3, config=str(filename),
+                                              check_only=True)
+    spp.request(np.array([0.1, 0.2, 0.3]), ['energy', 'gradient'], states=[1])
+    db = PySurfDB.load_database('db.dat', read_only=True)
+    assert np.array_equal(db['gradient_mask'][0], [0, 1, 0])
+    assert np.array_equal(db['energy_mask'][0], [1])
+    assert np.allclose(db['gradient'][0][0], 0.0)
@@ -0,0 +1,106 @@
+from pytest import fixture
+import numpy as np
+
+from pysurf.spp import Interpolator
+from pysurf.spp.request import Request
+from pysurf.logger import get_logger
+from pysurf.spp.storage import WeightStorage
+
+
+def energy(x):
+    return np.array([x@x + x[0]*x[1], (x-1)@(x-1)])
+
+
+@fixture
+def db(make_db):
+    return make_db(15, seed=2, properties={'energy': lambda x, i: energy(x)})
+
+
+def get_regression(db, **kwargs):
+    return Interpolator.plugins['RegInterpolator'](db, ['energy'], get_logger(None, 'test'), **kwargs)
+
+
+def test_regression_exact_quadratic(db):
+    reg = get_regression(db, order=2)
+    assert reg.features.nfeatures == 6
+    crd = np.array([0.3, -0.7])
+    request, _ = reg.get(Request(crd, ['energy'], [0, 1]))
+    assert np.allclose(request['energy'], energy(crd))
+
+
+def test_regression_cross_order(db):
+    reg = get_regression(db, order=3, cross_order=1)
+    # constant + 3 powers of each of the two coordinates
+    assert reg.features.nfeatures == 7
+
+
+def test_regression_recursive_update(db):
+    reg = get_regression(db, order=2)
+    rng = np.random.default_rng(3)
+    for _ in range(5):
+        crd = rng.normal(size=2)
+        request = Request(crd, ['energy'], [0, 1])
+        request.set('energy', energy(crd) + 0.01*rng.normal(size=2))
+        db.append('crd', crd)
+        db.append('energy', request['energy'])
+        db.increase
+        reg.append(request)
+    weights = np.copy(reg.interpolators['energy'].weights)
+    reg.train()
+    assert np.allclose(weights, reg.interpolators['energy'].weights)
+
+
+def test_finite_difference_gradient(db):
+    reg = get_regression(db, order=2, energy_only=True)
+    crd = np.array([0.3, -0.7])
+    request = Request(np.copy(crd), ['energy', 'gradient'], [0, 1])
+    request, _ = reg.get(request)
+    # central differences are exact for quadratic functions
+    ref = np.array([2*crd + crd[::-1], 2*(crd-1)])
+    assert np.allclose(request['gradient'].data, ref)
+    assert np.all(request.crd == crd)
+
+
+def test_single_precision_recursive_update(db, tmp_path):
+    storage = WeightStorage('single', str(tmp_path / 'weights'))
+    weightsfile = str(tmp_path / 'weights.bin')
+    reg = get_regression(db, order=2, storage=storage, weightsfile=weightsfile)
+    regression = reg.interpolators['energy']
+    assert regression.weights.dtype == np.float32
+    assert regression.coefficients.dtype == np.double and regression.inverse.dtype == np.double
+    rng = np.random.default_rng(4)
+    for _ in range(20):
+        # coordinates representable in single precision, as the stored descriptors
+        crd = rng.normal(size=2).astype(np.float32).astype(np.double)
+        request = Request(crd, ['energy'], [0, 1])
+        request.set('energy', energy(crd) + 0.01*rng.normal(size=2))
+        db.append('crd', crd)
+        db.append('energy', request['energy'])
+        db.increase
+        reg.append(request)
+    # the recursive least squares updates are done in double precision
+    features = reg.features(reg.crds.astype(np.double))
+    ref = type(regression)(reg.features, (2,))
+    ref.train(features, np.array(db['energy']))
+    assert np.allclose(regression.coefficients, ref.coefficients, rtol=1e-9, atol=1e-9)
+    assert np.allclose(regression.weights, regression.coefficients, rtol=1e-6)
+    # the arrays of the model file are stored out of core in the selected precision
+    loaded = get_regression(db, order=2, storage=storage, weightsfile=weightsfile).interpolators['energy']
+    assert isinstance(loaded.weights, np.memmap) and loaded.weights.dtype == np.float32
+    assert isinstance(loaded.inverse, np.memmap) and loaded.inverse.dtype == np.double
+
+
+def test_append_grows_crds_in_storage_precision(db):
+    reg = get_regression(db, order=2, storage=WeightStorage('single'))
+    rng = np.random.default_rng(5)
+    buffers = set()
+    for _ in range(8):
+        request = Request(rng.normal(size=2), ['energy'], [0, 1])
+        request.set('energy', energy(request.crd))
+        reg.append(request)
+        buffers.add(id(reg.crds.base))
+    assert reg.size == len(reg.crds) == 23
+    assert reg.crds.dtype == np.float32
+    assert np.allclose(reg.crds[-1], request.crd, rtol=1e-6)
+    # the buffer is only reallocated when it is full
+    assert len(buffers) < 4
@@ -0,0 +1,71 @@
+from pytest import fixture
+import numpy as np
+
+from pysurf.spp import Interpolator
+from pysurf.spp.request import Request
+from pysurf.spp.storage import WeightStorage
+from pysurf.logger import get_logger
+
+
+@fixture
+def db(make_db):
+    return make_db(30, seed=1, properties={'energy': lambda x, i: [x@x, (x-1)@(x-1)],
+                                           'gradient': lambda x, i: [2*x, 2*(x-1)]})
+
+
+@fixture
+def shepard(db):
+    return Interpolator.plugins['ShepardInterpolator'](db, ['energy', 'gradient'], get_logger(None, 'test'),
+                                                       nneighbors=4)
+
+
+def test_shepard_exact_agreement(shepard, db):
+    request, is_trustworthy = shepard.get(Request(np.copy(db['crd'][5]), ['energy'], [0, 1]))
+    assert is_trustworthy
+    assert np.allclose(request['energy'], db['energy'][5])
+
+
+def test_shepard_nearest_neighbors(shepard, db):
+    crd = np.array([0.3, -0.2])
+    request, _ = shepard.get(Request(crd, ['energy', 'gradient'], [0, 1]))
+    #
+    dist = np.linalg.norm(np.array(db['crd']) - crd, axis=1)
+    idx = np.argsort(dist)[:4]
+    weights = 1.0/dist[idx]**2
+    ref = weights @ np.array(db['energy'])[idx] / np.sum(weights)
+    assert np.allclose(request['energy'], ref)
+
+
+def test_shepard_batch(shepard):
+    crds = np.array([[0.3, -0.2], [1.0, 0.5], [-0.4, 0.1]])
+    values, _ = shepard.interpolate(crds, ['energy', 'gradient'])
+    assert values['gradient'].shape == (3, 2, 2)
+    for crd, energy in zip(crds, values['energy']):
+        request, _ = shepard.get(Request(crd, ['energy'], [0, 1]))
+        assert np.allclose(request['energy'], energy)
+
+
+def test_shepard_energy_only(db):
+    shepard = Interpolator.plugins['ShepardInterpolator'](db, ['energy', 'gradient'], get_logger(None, 'test'),
+                                                          nneighbors=4, energy_only=True)
+    crd = np.array([0.3, -0.2])
+    request, _ = shepard.get(Request(crd, ['energy', 'gradient'], [0, 1]))
+    dq = 0.01
+    values, _ = shepard.interpolate(crd + dq*np.identity(2), ['energy'])
+    minus, _ = shepard.interpolate(crd - dq*np.identity(2), ['energy'])
+    assert np.allclose(request['gradient'].data, ((values['energy'] - minus['energy'])/(2*dq)).T)
+
+
+def test_shepard_single_precision_out_of_core(db, tmp_path):
+    storage = WeightStorage('single', str(tmp_path / 'weights'))
+    shepard = Interpolator.plugins['ShepardInterpolator'](db, ['energy', 'gradient'], get_logger(None, 'test'),
+                                                          nneighbors=4, storage=storage)
+    assert shepard.crds.dtype == np.float32
+    assert shepard.memory_usage()['mapped'] == 30*(2 + 4)*4
+    ref = Interpolator.plugins['ShepardInterpolator'](db, ['energy', 'gradient'], get_logger(None, 'test'),
+                                                      nneighbors=4)
+    crd = np.array([0.3, -0.2])
+    request, _ = shepard.get(Request(crd, ['energy'], [0, 1]))
+    reference, _ = ref.get(Request(crd, ['energy'], [0, 1]))
+    assert request['energy'].dtype == np.double
+    assert np.allclose(request['energy'], reference['energy'], rtol=1e-5)
@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+
+from pysurf.spp.qm.parsers import parse_qchem_output, read_gradient_file, parse_xtb_output
+
+
+def test_qchem_output():
+    filename = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'qchem', 'qchem.out')
+    out = parse_qchem_output(filename, natoms=10)
+    assert np.isclose(out['scf_energy'], -262.6990400773)
+    # the last scf of the file
+    assert out['scf_iterations'] == 2
+
+
+def test_gradient_file(tmp_path):
+    filename = tmp_path / 'gradient'
+    filename.write_text("""$grad          cartesian gradients
+  cycle =      1    SCF energy =     -5.0705444406   |dE/xyz| =  0.000000
+   -0.00000000000000      0.00000000000000     -0.73158349621108      O
+    1.43153295691011      0.00000000000000      0.36579174810554      H
+   -0.0000000000000D+00   0.0000000000000D+00   0.1234500000000D-01
+   0.2000000000000D-01   0.0000000000000D+00  -0.6172500000000D-02
+$end
+""")
+    gradient = read_gradient_file(str(filename), 2)
+    assert np.allclose(gradient, [[0.0, 0.0, 0.012345], [0.02, 0.0, -0.0061725]])
+
+
+def test_xtb_output(tmp_path):
+    filename = tmp_path / 'output'
+    filename.write_text("""
+   *** convergence criteria satisfied after 9 iterations ***
+
+molecular dipole:
+                 x           y           z       tot (Debye)
+ q only:        0.000      -0.000       0.623
+   full:        0.000      -0.000       0.964       2.451
+           -------------------------------------------------
+          | TOTAL ENERGY               -5.070544440612 Eh   |
+""")
+    out = parse_xtb_output(str(filename))
+    assert out['scf_iterations'] == 9
+    assert np.isclose(out['energy'], -5.070544440612)
+    assert np.allclose(out['dipole'], [0.0, 0.0, 0.964])
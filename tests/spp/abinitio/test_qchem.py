@@ -0,0 +1,65 @@
+import stat
+import sys
+import json
+
+import numpy as np
+from pytest import fixture
+
+from pysurf.spp.request import Request
+from pysurf.spp.qm.qchem import QChem
+from pysurf.spp.qm.jobs import JobRunner
+
+
+FAKE_QCHEM = """
+import json, os, sys
+_, _, filename, output, savedir = sys.argv
+text = open(filename).read().lower()
+savedir = os.path.join(os.environ['QCSCRATCH'], savedir)
+guess = 'scf_guess read' in text
+with open({calls!r}, 'a') as fhandle:
+    fhandle.write(json.dumps({{'force': 'jobtype force' in text, 'guess': guess,
+                               'orbitals': os.path.isdir(savedir)}}) + '\\n')
+os.makedirs(savedir, exist_ok=True)
+open(os.path.join(savedir, '53.0'), 'w').close()
+gradient = ['', '  1  2  3', ' 1  0.1  0.2  0.3', ' 2  0.4  0.5  0.6', ' 3  0.7  0.8  0.9']
+with open(output, 'w') as fhandle:
+    fhandle.write(' 10  -1.0  1e-9  Convergence criterion met\\n')
+    fhandle.write(' Total energy in the final basis set =     -1.00000000\\n')
+    fhandle.write(' Gradient of SCF Energy' + '\\n'.join(gradient) + '\\n')
+    fhandle.write(' Gradient of the state energy (including CIS Excitation Energy)'
+                  + '\\n'.join(gradient) + '\\n')
+"""
+
+
+@fixture
+def qchem(tmp_path):
+    exe = tmp_path / 'qchem'
+    exe.write_text(f"#!{sys.executable}\n" + FAKE_QCHEM.format(calls=str(tmp_path / 'calls')))
+    exe.chmod(exe.stat().st_mode | stat.S_IEXEC)
+    config = dict(QChem.settings)
+    return QChem(config, [8, 1, 1], 3, 0, 0, 1, str(exe),
+                 runner=JobRunner(scratch=str(tmp_path / 'scratch'), max_jobs=3))
+
+
+def read_calls(tmp_path):
+    with open(tmp_path / 'calls') as fhandle:
+        return [json.loads(line) for line in fhandle]
+
+
+def test_gradients_share_the_scf(qchem, tmp_path):
+    request = qchem.get(Request(np.zeros((3, 3)), ['gradient'], [0, 1, 2]))
+    assert np.allclose(request['gradient'][2][1], [0.2, 0.5, 0.8])
+    calls = read_calls(tmp_path)
+    # a single scf from scratch, the force jobs start from its orbitals
+    assert calls[0] == {'force': False, 'guess': False, 'orbitals': False}
+    assert len(calls) == 4
+    assert all(call['force'] and call['guess'] and call['orbitals'] for call in calls[1:])
+
+
+def test_energy_orbitals_are_reused(qchem, tmp_path):
+    qchem.get(Request(np.zeros((3, 3)), ['energy', 'gradient'], [1, 2]))
+    calls = read_calls(tmp_path)
+    # the energy calculation is the shared scf
+    assert len(calls) == 3
+    assert not calls[0]['force'] and not calls[0]['guess']
+    assert all(call['force'] and call['guess'] for call in calls[1:])
@@ -0,0 +1,78 @@
+import numpy as np
+
+from pysurf.spp.request import Request
+from pysurf.spp.qm import xtb
+from pysurf.fileparser import read_geom
+
+
+class FakeResult:
+
+    def __init__(self, crd):
+        self.crd = crd
+
+    def get(self, name):
+        if name == 'energy':
+            return float(np.sum(self.crd**2))
+        return 2 * self.crd
+
+
+class FakeCalculator:
+
+    created = 0
+
+    def __init__(self, method, numbers, crd):
+        FakeCalculator.created += 1
+        self.crd = crd
+        self.guesses = []
+
+    def set(self, key, value):
+        pass
+
+    def update(self, crd):
+        self.crd = crd
+
+    def singlepoint(self, result=None):
+        self.guesses.append(result)
+        return FakeResult(self.crd.copy())
+
+
+def test_in_process_backend(monkeypatch):
+    monkeypatch.setattr(xtb, 'TBLiteCalculator', FakeCalculator)
+    FakeCalculator.created = 0
+    interface = xtb.XTBInterface('xtb', 'xtb', [8, 1, 1], 'xtb_input.xyz')
+    assert interface.api is not None
+    for step in range(3):
+        crd = np.full((3, 3), 0.1 * step)
+        request = interface.get(Request(crd, ['energy', 'gradient'], [0]))
+        assert np.isclose(request['energy'], np.sum(crd**2))
+        assert np.allclose(request['gradient'][0], 2 * crd)
+    # the calculator is kept alive, the previous result is the guess
+    assert FakeCalculator.created == 1
+    assert interface.api._calculator.guesses[0] is None
+    assert interface.api._calculator.guesses[-1] is not None
+
+
+def test_subprocess_fallback(monkeypatch):
+    monkeypatch.setattr(xtb, 'TBLiteCalculator', None)
+    monkeypatch.setattr(xtb, 'XTBCalculator', None)
+    assert xtb.XTBInterface('xtb', 'xtb', [8, 1, 1], 'xtb_input.xyz').api is None
+
+
+def test_backends_use_the_same_geometry(monkeypatch):
+    monkeypatch.setattr(xtb, 'TBLiteCalculator', FakeCalculator)
+    crd = np.array([[0.0, 0.0, 0.2], [1.4, 0.0, -0.9], [-1.4, 0.0, -0.9]])
+    api = xtb.XTBInterface('xtb', 'xtb', [8, 1, 1], 'xtb_input.xyz', backend='api')
+    api.get(Request(crd, ['energy'], [0]))
+    #
+    written = []
+
+    def run_gradient(job):
+        written.append(np.array(read_geom(job.path('xtb_input.xyz'))[2]))
+        return (0.0, None), np.zeros((3, 3)), None
+
+    subprocess = xtb.XTBInterface('xtb', 'xtb', [8, 1, 1], 'xtb_input.xyz', backend='subprocess')
+    monkeypatch.setattr(subprocess, '_run_gradient', run_gradient)
+    subprocess.get(Request(crd, ['energy'], [0]))
+    # the xyz file is written in angstrom and read back in bohr
+    assert np.allclose(api.api._calculator.crd, crd)
+    assert np.allclose(written[0], crd, atol=1e-6)
@@ -0,0 +1,25 @@
+import numpy as np
+
+from pysurf.spp.request import Request
+from pysurf.spp.qm.turbomole import Turbomole, state_ranges
+
+
+def plan(properties, states):
+    turbomole = Turbomole.__new__(Turbomole)
+    return turbomole._plan_adc(Request(np.zeros((2, 3)), properties, states))
+
+
+def test_state_ranges():
+    assert state_ranges([1]) == '1'
+    assert state_ranges([3, 1, 2, 5]) == '1-3,5'
+
+
+def test_excited_gradients_in_single_run():
+    assert plan(['energy', 'gradient', 'fosc'], [1, 2, 3]) == [
+        {'energy': '', 'fosc': True, 'gradient': [1, 2, 3]}]
+
+
+def test_ground_state_gradient_separate_run():
+    assert plan(['energy', 'gradient'], [0, 2]) == [{'energy': '', 'gradient': [2]},
+                                                    {'gradient': [0]}]
+    assert plan(['gradient'], [0]) == [{'gradient': [0]}]
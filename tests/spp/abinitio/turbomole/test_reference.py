@@ -0,0 +1,68 @@
+import os
+import stat
+import sys
+
+import numpy as np
+from pytest import fixture, raises
+
+from pysurf.spp.qm.turbomole import Turbomole
+from pysurf.spp.qm.jobs import JobRunner, JobError
+
+
+FAKE_DEFINE = """
+import sys
+sys.stdin.read()
+with open({calls!r}, 'a') as fhandle:
+    fhandle.write('define\\n')
+for filename in ('control', 'basis', 'mos'):
+    open(filename, 'w').close()
+sys.stderr.write('define ended normally\\n')
+"""
+
+FAKE_DSCF = """
+import sys
+sys.stderr.write('dscf ended abnormally\\n')
+"""
+
+
+def write_program(folder, name, text):
+    exe = folder / name
+    exe.write_text(f"#!{sys.executable}\n" + text)
+    exe.chmod(exe.stat().st_mode | stat.S_IEXEC)
+
+
+@fixture
+def turbomole(tmp_path, monkeypatch):
+    bindir = tmp_path / 'bin'
+    bindir.mkdir()
+    write_program(bindir, 'define', FAKE_DEFINE.format(calls=str(tmp_path / 'calls')))
+    write_program(bindir, 'dscf', FAKE_DSCF)
+    monkeypatch.setenv('PATH', f"{bindir}{os.pathsep}{os.environ['PATH']}")
+    config = {'method': {}, 'basis': 'cc-pVDZ', 'max_scf_cycles': 50}
+    return Turbomole(config, [8, 1, 1], 2, 0,
+                     runner=JobRunner(scratch=str(tmp_path / 'scratch')))
+
+
+def test_reference_created_once(turbomole, tmp_path):
+    turbomole._setup_reference(np.zeros((3, 3)))
+    turbomole._setup_reference(np.ones((3, 3)))
+    assert (tmp_path / 'calls').read_text().split() == ['define']
+    assert (tmp_path / 'control_ref').exists() and (tmp_path / 'mos').exists()
+    # nothing is written to the current folder apart from the reference files
+    assert not (tmp_path / 'coord').exists()
+
+
+def test_reference_from_refgeom(turbomole, tmp_path):
+    (tmp_path / 'ref.xyz').write_text("3\n\nO 0.0 0.0 0.0\nH 0.0 0.0 1.0\nH 0.0 1.0 0.0\n")
+    Turbomole({'method': {}, 'basis': 'cc-pVDZ', 'max_scf_cycles': 50}, [8, 1, 1], 2, 0,
+              runner=turbomole.runner, refgeom=str(tmp_path / 'ref.xyz'))
+    assert (tmp_path / 'calls').read_text().split() == ['define']
+    assert (tmp_path / 'control_ref').exists()
+
+
+def test_failed_program_raises(turbomole, tmp_path):
+    with raises(JobError):
+        with turbomole.runner.job('turbomole') as job:
+            turbomole.submit(job, 'dscf')
+    # the folder of the failed job is kept for inspection
+    assert len(os.listdir(tmp_path / 'scratch')) == 1
@@ -0,0 +1,7 @@
+from pytest import fixture
+
+
+@fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """run every test in its own folder, log and scratch files are written to the current folder"""
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,59 @@
+import numpy as np
+
+from pysurf.spp.spp import SurfacePointProvider, ModelFactory
+from pysurf.spp.request import Request
+from pysurf.spp.model import PyrazineSala
+
+
+def test_batch_equals_single_requests():
+    model = PyrazineSala({'n_states': 5})
+    crds = np.random.default_rng(1).normal(size=(20, len(model.crd)))
+    properties = ['energy', 'gradient', 'nacs', 'fosc']
+    batch = model.get_batch([Request(crd, properties, [1, 3]) for crd in crds])
+    for crd, result in zip(crds, batch):
+        ref = model.get(Request(crd, properties, [1, 3]))
+        assert np.allclose(result['energy'], ref['energy'])
+        assert np.allclose(result['gradient'].data, ref['gradient'].data)
+        assert np.allclose(result['nacs'], ref['nacs'])
+        assert np.allclose(result['fosc'], ref['fosc'])
+
+
+def test_harmonic_oscillator():
+    model = ModelFactory._models['HarmonicOscillator1D'](0.0, 1.0, 0.0, 2, {'e1': 1.0, 'w1': 2.0, 'x1': 1.0})
+    crds = np.linspace(-1, 1, 7)[:, np.newaxis]
+    requests = [Request(crd, ['energy', 'gradient'], [0, 1]) for crd in crds]
+    # requests for other states are grouped separately
+    requests += [Request(crds[0], ['gradient'], [1])]
+    batch = model.get_batch(requests)
+    for crd, result in zip(crds, batch):
+        assert np.allclose(result['energy'], model._energy(crd))
+        assert np.allclose(result['gradient'].data, [model._gradient(crd)[0], model._gradient(crd)[1]])
+    assert np.allclose(batch[-1]['gradient'][1], model._gradient(crds[0])[1])
+
+
+def test_optional_protocol():
+    model = PyrazineSala({'n_states': 3})
+    assert hasattr(model, 'get_batch')
+    model.compute_batch = None
+    assert not hasattr(model, 'get_batch')
+
+
+def test_spp_request_many(tmp_path):
+    filename = tmp_path / 'spp.inp'
+    filename.write_text("""
+mode = model
+use_db = no
+
+[mode(model)]
+model = PyrazineSchneider
+""")
+    spp = SurfacePointProvider.from_questions(['energy', 'gradient'], 3, 3, config=str(filename),
+                                              check_only=True)
+    crds = np.random.default_rng(2).normal(size=(10, 3))
+    results = spp.request_many(crds, ['energy', 'gradient'])
+    assert results['energy'].shape == (10, 3)
+    assert results['gradient'].shape == (10, 3, 3)
+    for crd, energy, gradient in zip(crds, results['energy'], results['gradient']):
+        ref = spp.request(crd, ['energy', 'gradient'])
+        assert np.allclose(energy, ref['energy'])
+        assert np.allclose(gradient, ref['gradient'].data)
@@ -0,0 +1,93 @@
+from pytest import fixture
+import numpy as np
+
+from pysurf.spp.spp import SurfacePointProvider
+from pysurf.spp.model.vibronic import VibronicCoupling, read_parameters
+from pysurf.spp.model import PyrazineSchneider, PyrazineSala
+
+
+@fixture
+def parameters(tmp_path):
+    filename = tmp_path / 'model.ini'
+    filename.write_text("""
+[units]
+energy = au
+
+[modes]
+q1 = 0.01
+q2 = 0.02
+
+[states]
+energies = 0.0, 0.1, 0.12
+fosc = 0, 0, 1
+
+[kappa]
+q1 = 0.0, 0.01, -0.01
+
+[gamma]
+q2 = 0.0, -0.002, 0.003
+
+[lambda]
+q2 1 2 = 0.02
+""")
+    return str(filename)
+
+
+def finite_difference(func, crd, step=1e-5):
+    return np.array([(func(crd + dq) - func(crd - dq)) / (2 * step)
+                     for dq in np.eye(len(crd)) * step]).T
+
+
+def test_read_parameters(parameters):
+    params = read_parameters(parameters)
+    assert np.allclose(params['energies'], [0.0, 0.1, 0.12])
+    assert np.allclose(params['kappa'], [[0.0, 0.0], [0.01, 0.0], [-0.01, 0.0]])
+    assert params['lam'][1, 2, 1] == params['lam'][2, 1, 1] == 0.02
+    assert params['names'] == ['q1', 'q2']
+
+
+def test_energies_at_reference():
+    model = PyrazineSchneider()
+    energies, _ = model.adiab_en(np.zeros(3))
+    assert np.allclose(energies, [0.0, 0.14479228, 0.17786665], atol=1e-6)
+
+
+def test_analytic_gradients_and_nacs(parameters):
+    model = VibronicCoupling.from_file(parameters)
+    crd = np.array([0.4, -0.3])
+    energies, _, coupling = model.adiabatic(crd)
+    numeric = finite_difference(lambda q: model.adiab_en(q)[0], crd)
+    for state in range(3):
+        assert np.allclose(coupling[state, state], numeric[state], atol=1e-8)
+    nacs = model.nacs(energies, coupling)
+    assert np.allclose(nacs, -np.swapaxes(nacs, 0, 1))
+    assert np.allclose(nacs[[0, 1, 2], [0, 1, 2]], 0.0)
+
+
+def test_batched_hamiltonian():
+    model = PyrazineSala({'n_states': 4})
+    crds = np.random.default_rng(0).normal(size=(5, len(model.crd)))
+    energies, _, coupling = model.adiabatic(crds)
+    for crd, en, grad in zip(crds, energies, coupling):
+        assert np.allclose(model.adiab_en(crd)[0], en)
+        assert np.allclose(model.adiabatic(crd)[2].diagonal(axis1=0, axis2=1).T,
+                           grad.diagonal(axis1=0, axis2=1).T)
+
+
+def test_spp(tmp_path, parameters):
+    filename = tmp_path / 'spp.inp'
+    filename.write_text(f"""
+mode = model
+use_db = no
+
+[mode(model)]
+model = VibronicCoupling
+
+[mode(model)::model(VibronicCoupling)]
+parameters = {parameters}
+""")
+    spp = SurfacePointProvider.from_questions(['energy', 'gradient', 'nacs', 'fosc'], 3, 2,
+                                              config=str(filename), check_only=True)
+    result = spp.request(np.array([0.4, -0.3]), ['energy', 'gradient', 'nacs', 'fosc'])
+    assert result['energy'].shape == (3,)
+    assert np.allclose(np.sum(result['fosc']**2), 1.0)
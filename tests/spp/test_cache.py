@@ -0,0 +1,95 @@
+import numpy as np
+
+from pysurf.spp.cache import ResultCache
+from pysurf.spp.request import Request, StateData
+from pysurf.spp.spp import SurfacePointProvider
+
+
+class CountingInterface:
+    """computes energies and gradients of three states, counts the calls"""
+
+    implemented = ['energy', 'gradient']
+
+    def __init__(self):
+        self.ncalls = 0
+        self.requested = []
+
+    def get(self, request):
+        self.ncalls += 1
+        self.requested.append((list(request), list(request.states)))
+        if 'energy' in request:
+            request.set('energy', np.sum(request.crd) + np.arange(3))
+        if 'gradient' in request:
+            request.set('gradient', {state: request.crd * (state + 1) for state in request.states})
+        return request
+
+
+def test_full_and_partial_hits():
+    interface = CountingInterface()
+    cache = ResultCache(interface, size=10)
+    crd = np.array([0.1, 0.2, 0.3])
+    first = cache.get(Request(crd, ['energy'], [0, 1, 2]))
+    # same geometry within the rounding
+    second = cache.get(Request(crd + 1e-12, ['energy'], [0, 1, 2]))
+    assert interface.ncalls == 1
+    assert np.allclose(first['energy'], second['energy'])
+    # energy is cached, only the gradient of state 1 is computed
+    result = cache.get(Request(crd, ['energy', 'gradient'], [1]))
+    assert interface.requested[-1] == (['gradient'], [1])
+    assert np.allclose(result['gradient'][1], 2*crd)
+    assert np.allclose(result['energy'], first['energy'])
+    assert cache.statistics() == {'hits': 1, 'partial_hits': 1, 'misses': 1, 'hit_rate': 1/3}
+
+
+def test_hits_do_not_share_the_cached_arrays():
+    cache = ResultCache(CountingInterface(), size=10)
+    crd = np.array([0.1, 0.2, 0.3])
+    reference = np.copy(cache.get(Request(crd, ['energy'], [0, 1, 2]))['energy'])
+    hit = cache.get(Request(crd, ['energy'], [0, 1, 2]))
+    hit['energy'][:] = 0.0
+    assert np.allclose(cache.get(Request(crd, ['energy'], [0, 1, 2]))['energy'], reference)
+
+
+def test_missing_states_of_several_properties():
+    cache = ResultCache(CountingInterface(), size=10)
+    crd = np.array([0.1, 0.2, 0.3])
+    request = Request(crd, ['gradient', 'dipole'], [0, 1, 2])
+    # a second state resolved property
+    request._properties['dipole'] = StateData([0, 1, 2], (3,))
+    entry = {'gradient': {0: crd, 1: crd}, 'dipole': {0: crd, 2: crd}}
+    missing = cache._missing(request, entry)
+    assert list(missing) == ['gradient', 'dipole']
+    assert missing.states == [1, 2]
+
+
+def test_lru_and_disk(tmp_path):
+    interface = CountingInterface()
+    cache = ResultCache(interface, size=1, folder=str(tmp_path / 'cache'))
+    crds = np.eye(3)
+    for crd in crds:
+        cache.get(Request(crd, ['energy', 'gradient'], [0, 2]))
+    assert len(cache._entries) == 1
+    # entries evicted from memory are read from disk, also by a new cache
+    cache = ResultCache(interface, size=1, folder=str(tmp_path / 'cache'))
+    result = cache.get(Request(crds[0], ['energy', 'gradient'], [2]))
+    assert interface.ncalls == 3
+    assert np.allclose(result['gradient'][2], 3*crds[0])
+
+
+def test_spp_with_cache(tmp_path):
+    filename = tmp_path / 'spp.inp'
+    filename.write_text("""
+mode = model
+cache_size = 10
+
+[mode(model)]
+model = PyrazineSchneider
+""")
+    spp = SurfacePointProvider.from_questions(['energy', 'gradient'], 3, 3, config=str(filename),
+                                              check_only=True)
+    crd = np.array([0.1, 0.2, 0.3])
+    first = spp.request(crd, ['energy', 'gradient'])
+    second = spp.request(crd, ['energy', 'gradient'])
+    assert spp.cache.hits == 1
+    assert np.allclose(first['gradient'].data, second['gradient'].data)
+    spp.close()
@@ -0,0 +1,64 @@
+from pytest import fixture
+import numpy as np
+
+from pysurf.spp.spp import SurfacePointProvider
+from pysurf.spp.finite_difference import FiniteDifference, normal_modes
+from pysurf.spp.model.pyrazine_schneider import PyrazineSchneider
+
+
+@fixture
+def spp(tmp_path):
+    filename = tmp_path / 'spp.inp'
+    filename.write_text("""
+mode = model
+use_db = no
+executor = thread
+max_workers = 2
+
+[mode(model)]
+model = PyrazineSchneider
+""")
+    spp = SurfacePointProvider.from_questions(['energy', 'gradient'], 3, 3, config=str(filename),
+                                              check_only=True)
+    yield spp
+    spp.close()
+
+
+def test_gradient(spp):
+    crd = np.array([0.3, -0.2, 0.1])
+    gradient = FiniteDifference(spp, step=1e-4).gradient(crd)
+    ref = spp.request(crd, ['gradient'])['gradient'].data
+    assert gradient.shape == (3, 3)
+    assert np.allclose(gradient, ref, atol=1e-7)
+    assert np.allclose(FiniteDifference(spp, step=1e-4).gradient(crd, states=[2]), ref[[2]], atol=1e-7)
+
+
+def test_hessian_and_modes(spp):
+    fd = FiniteDifference(spp, step=1e-3)
+    crd = np.zeros(3)
+    hessian = fd.hessian(crd)
+    assert np.allclose(hessian, fd.hessian(crd, from_gradient=False), atol=1e-6)
+    model = PyrazineSchneider()
+    modes = fd.normal_modes(crd, model.masses)
+    assert np.allclose(sorted(mode.freq for mode in modes), sorted(model.frequencies))
+
+
+def test_molecule_projection():
+    # diatomic with a single bond, three translations and two rotations are removed
+    crd = np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 2.0]])
+    masses = np.array([1.0, 1.0])
+    hessian = np.zeros((6, 6))
+    hessian[2, 2] = hessian[5, 5] = 0.5
+    hessian[2, 5] = hessian[5, 2] = -0.5
+    modes = normal_modes(hessian, crd, masses)
+    assert len(modes) == 1
+    assert np.isclose(modes[0].freq, 1.0)
+    assert modes[0].displacements.shape == (2, 3)
+
+
+def test_wigner_from_spp(spp):
+    from pysurf.sampling.wigner import Wigner
+    model = PyrazineSchneider()
+    wigner = Wigner.from_spp(spp, model)
+    assert np.allclose(sorted(mode.freq for mode in wigner.modes), sorted(model.frequencies))
+    assert wigner.get_condition().crd.shape == (3,)
@@ -0,0 +1,108 @@
+import os
+import sys
+import threading
+import time
+
+from pytest import raises
+
+from pysurf.spp.qm.jobs import JobRunner, JobError
+
+
+def python(code):
+    return [sys.executable, '-c', code]
+
+
+def test_job_runs_in_scratch_folder(tmp_path):
+    runner = JobRunner(scratch=str(tmp_path), nthreads=3)
+    with runner.job('test') as job:
+        job.write('input', 'data')
+        run = job.run(python("import os; print(os.environ['OMP_NUM_THREADS'], open('input').read())"),
+                      stdout='output')
+        assert run.returncode == 0
+        with open(job.path('output')) as fhandle:
+            assert fhandle.read().split() == ['3', 'data']
+        folder = job.folder
+    assert os.path.dirname(folder) == str(tmp_path)
+    # removed after success
+    assert not os.path.exists(folder)
+
+
+def test_keep_folder_on_error(tmp_path):
+    runner = JobRunner(scratch=str(tmp_path), timeout=0.5)
+    with raises(JobError):
+        with runner.job('test') as job:
+            job.run(python("import time; time.sleep(10)"))
+    assert os.path.isdir(job.folder)
+
+
+def test_max_jobs(tmp_path):
+    runner = JobRunner(scratch=str(tmp_path), max_jobs=2)
+    running = []
+    lock = threading.Lock()
+
+    def run():
+        with runner.job('test') as job:
+            job.run(python("import time; time.sleep(0.3)"))
+            with lock:
+                running.append(time.perf_counter())
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # two batches of two jobs
+    assert max(running) - start > 0.55
+    assert len(os.listdir(tmp_path)) == 0
+
+
+def test_parent_job_is_copied(tmp_path):
+    runner = JobRunner(scratch=str(tmp_path))
+    with runner.job('parent') as parent:
+        parent.write('mos', 'orbitals')
+        parent.run(python("pass"))
+        with runner.job('child', parent=parent) as child:
+            assert child.folder != parent.folder
+            with open(child.path('mos')) as fhandle:
+                assert fhandle.read() == 'orbitals'
+            assert len(child.history) == 1
+            child.write('gradient', 'data')
+        assert not parent.exists('gradient')
+
+
+def test_map_runs_concurrently(tmp_path):
+    runner = JobRunner(scratch=str(tmp_path), max_jobs=3)
+
+    def compute(state):
+        with runner.job(f'state{state}') as job:
+            job.run(python("import time; time.sleep(0.3)"))
+        return state
+
+    start = time.perf_counter()
+    assert runner.map(compute, [0, 1, 2]) == [0, 1, 2]
+    assert time.perf_counter() - start < 0.8
+
+
+def test_restart_files(tmp_path):
+    runner = JobRunner(scratch=str(tmp_path), restart=True)
+    with runner.job('first') as job:
+        assert runner.load_restart(job, 'test', ['mos', 'save']) is False
+        job.write('mos', 'orbitals')
+        os.makedirs(job.path('save'))
+        job.write(os.path.join('save', '53.0'), 'coefficients')
+        runner.save_restart(job, 'test', ['mos', 'save'])
+        runner.record_scf('test', 20, False)
+    with runner.job('second') as job:
+        assert runner.load_restart(job, 'test', ['mos', 'save']) is True
+        assert job.exists('mos')
+        assert job.exists(os.path.join('save', '53.0'))
+        runner.record_scf('test', 5, True)
+    assert runner.scf_statistics == {True: [1, 5], False: [1, 20]}
+    # without restart nothing is stored
+    runner = JobRunner(scratch=str(tmp_path / 'norestart'))
+    with runner.job('first') as job:
+        job.write('mos', 'orbitals')
+        runner.save_restart(job, 'test', ['mos'])
+        assert runner.load_restart(job, 'test', ['mos']) is False
+    assert os.listdir(tmp_path / 'norestart') == []
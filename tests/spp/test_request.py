@@ -0,0 +1,33 @@
+import pickle
+
+import numpy as np
+
+from pysurf.spp.request import Request, RequestGenerator
+
+
+def test_state_data():
+    request = Request(np.zeros(3), ['energy', 'gradient'], [1, 2])
+    request.set('gradient', {1: np.ones(3), 2: 2*np.ones(3), 0: np.zeros(3)})
+    assert np.allclose(request['gradient'][2], 2)
+    assert request['gradient'].data.shape == (2, 3)
+    # requests are send to worker processes
+    copy = pickle.loads(pickle.dumps(request))
+    assert np.allclose(copy['gradient'].data, request['gradient'].data)
+
+
+def test_recycle_request():
+    generator = RequestGenerator(3)
+    first = generator.request(np.zeros(3), ['energy', 'gradient'], [1])
+    buffer = first['gradient'].data
+    first.set('energy', np.arange(3))
+    second = generator.request(np.ones(3), ['energy', 'gradient'], [1], out=first)
+    assert second is first
+    assert second['gradient'].data is buffer
+    assert second['energy'] is None
+    assert np.allclose(second.crd, 1)
+    # requests with different states are not recycled
+    third = generator.request(np.ones(3), ['energy', 'gradient'], [0], out=first)
+    assert third is not first
+    # same_crd requests return the previous result of the interface
+    fourth = generator.request(np.ones(3), ['energy', 'gradient'], [1], same_crd=True, out=first)
+    assert fourth is not first
@@ -0,0 +1,68 @@
+from pytest import mark
+import numpy as np
+
+from pysurf.spp.spp import SurfacePointProvider
+
+
+def get_spp(tmp_path, executor, use_db='no'):
+    filename = tmp_path / 'spp.inp'
+    filename.write_text(f"""
+mode = model
+use_db = {use_db}
+executor = {executor}
+max_workers = 2
+
+[mode(model)]
+model = PyrazineSchneider
+
+[use_db(yes)]
+write_only = yes
+database = {tmp_path / 'db.dat'}
+""")
+    return SurfacePointProvider.from_questions(['energy', 'gradient'], 3, 3, config=str(filename),
+                                               check_only=True)
+
+
+@mark.parametrize('executor', ['none', 'thread', 'process'])
+def test_request_async(tmp_path, executor):
+    spp = get_spp(tmp_path, executor)
+    crds = np.random.default_rng(10).normal(size=(4, 3))
+    futures = [spp.request_async(crd, ['energy', 'gradient']) for crd in crds]
+    for crd, future in zip(crds, futures):
+        ref = spp.request(crd, ['energy', 'gradient'])
+        assert np.allclose(future.result()['energy'], ref['energy'])
+        assert np.allclose(future.result()['gradient'].data, ref['gradient'].data)
+    spp.close()
+
+
+def test_process_executor_with_database(tmp_path):
+    # the database is only written by a single process, so threads are used
+    spp = get_spp(tmp_path, 'process', use_db='yes')
+    # frames are appended by a single worker
+    assert spp._executor._max_workers == 1
+    result = spp.request_async(np.zeros(3), ['energy']).result()
+    assert len(result['energy']) == 3
+    spp.close()
+
+
+@mark.parametrize('executor', ['none', 'thread'])
+def test_request_many(tmp_path, executor):
+    spp = get_spp(tmp_path, executor)
+    crds = np.random.default_rng(11).normal(size=(5, 3))
+    results = spp.request_many(crds, ['energy', 'gradient'])
+    assert results['energy'].shape == (5, 3)
+    assert results['gradient'].shape == (5, 3, 3)
+    for i, crd in enumerate(crds):
+        ref = spp.request(crd, ['energy', 'gradient'])
+        assert np.allclose(results['energy'][i], ref['energy'])
+        assert np.allclose(results['gradient'][i], ref['gradient'].data)
+    spp.close()
+
+
+def test_request_many_database(tmp_path):
+    spp = get_spp(tmp_path, 'none', use_db='yes')
+    crds = np.random.default_rng(12).normal(size=(5, 3))
+    results = spp.request_many(crds, ['energy'])
+    # all results are written to the database in order
+    assert np.allclose(spp._interface._db['crd'], crds)
+    assert np.allclose(spp._interface._db['energy'], results['energy'])
@@ -0,0 +1,106 @@
+import threading
+
+from pytest import fixture, raises
+import numpy as np
+
+from pysurf.spp.spp import SurfacePointProvider
+from pysurf.spp.server import SPPServer, SPPClient, SPPServerError, is_server_socket
+
+
+def get_spp(tmp_path):
+    filename = tmp_path / 'spp.inp'
+    filename.write_text("""
+mode = model
+
+[mode(model)]
+model = PyrazineSchneider
+""")
+    return SurfacePointProvider.from_questions(['energy', 'gradient'], 3, 3, config=str(filename),
+                                               check_only=True)
+
+
+@fixture
+def server(tmp_path):
+    spp = get_spp(tmp_path)
+    server = SPPServer(spp, str(tmp_path / 'spp.sock'), batch_window=0.2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    assert server.wait_until_ready(5)
+    yield server
+    server.shutdown()
+    thread.join()
+
+
+def test_client_request(server):
+    assert is_server_socket(server.address)
+    client = SPPClient(server.address)
+    crd = np.random.default_rng(12).normal(size=3)
+    result = client.request(crd, ['energy', 'gradient'])
+    ref = server.spp.request(crd, ['energy', 'gradient'])
+    assert np.allclose(result['energy'], ref['energy'])
+    assert np.allclose(result['gradient'].data, ref['gradient'].data)
+    client.close()
+
+
+def test_identical_requests_computed_once(server):
+    crd = np.random.default_rng(13).normal(size=3)
+    clients = [SPPClient(server.address) for _ in range(4)]
+    results = [None]*len(clients)
+
+    def run(i):
+        results[i] = clients[i].request(crd, ['energy'])
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(clients))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.nrequests == 4
+    assert server.ncomputed < server.nrequests
+    for result in results:
+        assert np.allclose(result['energy'], results[0]['energy'])
+    for client in clients:
+        client.close()
+
+
+def test_same_crd_reuses_the_last_result(server):
+    client = SPPClient(server.address)
+    crd = np.random.default_rng(14).normal(size=3)
+    first = client.request(crd, ['energy', 'gradient'], states=[1])
+    second = client.request(crd, ['energy', 'gradient'], states=[1], same_crd=True)
+    assert server.nrequests == 1
+    assert np.allclose(second['gradient'][1], first['gradient'][1])
+    # the last result does not fit, so the request is computed
+    third = client.request(crd, ['energy', 'gradient'], states=[2], same_crd=True)
+    assert server.nrequests == 2
+    assert np.allclose(third['energy'], first['energy'])
+    client.close()
+
+
+def test_error_is_send_to_client(server, monkeypatch):
+
+    def fail(crds, properties, states=None):
+        raise ValueError("wrong crd")
+
+    monkeypatch.setattr(server.spp, 'request_batch', fail)
+    client = SPPClient(server.address)
+    with raises(SPPServerError, match='wrong crd'):
+        client.request(np.zeros(3), ['energy'])
+    client.close()
+
+
+def test_client_shutdown_is_disabled(server):
+    client = SPPClient(server.address)
+    with raises(SPPServerError, match='disabled'):
+        client.shutdown_server()
+    # the server still answers requests
+    assert np.shape(client.request(np.zeros(3), ['energy'])['energy']) == (3,)
+    client.close()
+
+
+def test_client_shutdown(server):
+    server.allow_client_shutdown = True
+    client = SPPClient(server.address)
+    client.shutdown_server()
+    assert not server._running.is_set()
+    client.close()